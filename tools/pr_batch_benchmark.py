@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+pr_batch_benchmark - Hermetic scaling benchmark for pr_batch_big_picture
+
+Builds a local git repository with N synthetic pull request branches,
+serves `gh` calls from a stand-in executable with injectable latency, and
+runs the full pr_batch_big_picture pipeline against it. Wall time,
+subprocess count, `gh` call count, peak RSS and bytes written are
+reported for every N, so scaling regressions can be caught offline.
+
+Example:
+    python tools/pr_batch_benchmark.py --sizes 10,50,200 --latency-ms 50 \\
+        -- --checkout-free --jobs 8
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+DEFAULT_SIZES = "10,50,200"
+BENCH_OWNER = "bench"
+BENCH_REPO = "synthetic"
+RUN_ID_BASE = 1000
+
+FAKE_GH_SOURCE = r'''
+import json
+import os
+import re
+import sys
+import time
+
+fixture = json.load(open(os.environ["PR_BATCH_BENCH_FIXTURE"], encoding="utf-8"))
+time.sleep(float(os.environ.get("PR_BATCH_BENCH_LATENCY_MS", "0")) / 1000)
+call_log = os.environ.get("PR_BATCH_BENCH_CALL_LOG")
+if call_log:
+    with open(call_log, "a", encoding="utf-8") as log:
+        log.write(" ".join(sys.argv[1:3]) + "\n")
+
+args = sys.argv[1:]
+prs = fixture["prs"]
+
+
+def check(pr):
+    return {
+        "__typename": "CheckRun",
+        "name": "build",
+        "status": "COMPLETED",
+        "conclusion": "FAILURE",
+        "detailsUrl": f"https://github.com/{fixture['owner']}/{fixture['name']}"
+        f"/actions/runs/{pr['run_id']}/job/1",
+        "title": "",
+        "summary": "",
+        "text": "",
+    }
+
+
+def comment(number):
+    return {
+        "author": {"login": "reviewer"},
+        "createdAt": "2024-01-02T00:00:00Z",
+        "url": f"https://example.invalid/pull/{number}#comment",
+        "body": f"Review note for PR {number}",
+    }
+
+
+def info(number, pr):
+    return {
+        "number": int(number),
+        "headRefName": pr["branch"],
+        "title": f"Synthetic PR {number}",
+        "baseRefName": "main",
+        "body": f"Synthetic change set {number}",
+        "author": {"login": "bench"},
+        "createdAt": "2024-01-01T00:00:00Z",
+        "url": f"https://example.invalid/pull/{number}",
+    }
+
+
+def page(nodes):
+    return {"pageInfo": {"hasNextPage": False, "endCursor": None}, "nodes": nodes}
+
+
+def graphql_node(number, pr):
+    node = info(number, pr)
+    node.update(
+        updatedAt="2024-01-03T00:00:00Z",
+        headRefOid=pr["head"],
+        files=page([{"path": path} for path in pr["files"]]),
+        comments=page([comment(number)]),
+        reviewThreads=page([]),
+        commits={
+            "nodes": [
+                {"commit": {"statusCheckRollup": {"state": "FAILURE", "contexts": page([check(pr)])}}}
+            ]
+        },
+    )
+    return node
+
+
+if args[:2] == ["pr", "view"]:
+    pr = prs.get(args[2])
+    if pr is None:
+        sys.stderr.write(f"no pull request found for {args[2]}\n")
+        sys.exit(1)
+    data = info(args[2], pr)
+    data.update(
+        files=[{"path": path} for path in pr["files"]],
+        comments=[comment(args[2])],
+        reviewThreads=[],
+        statusCheckRollup=[check(pr)],
+    )
+    print(json.dumps(data))
+elif args[:2] == ["run", "view"]:
+    sys.stdout.write("".join(
+        f"build\tstep {line}\tsynthetic log line {line} for run {args[2]}\n"
+        for line in range(fixture["log_lines"])
+    ))
+elif args[:2] == ["repo", "view"]:
+    print(json.dumps({"owner": {"login": fixture["owner"]}, "name": fixture["name"]}))
+elif args[:2] == ["api", "rate_limit"]:
+    quota = {"remaining": 5000, "reset": int(time.time()) + 3600}
+    print(json.dumps({"resources": {"core": quota, "graphql": quota}}))
+elif args[:2] == ["api", "graphql"] and "pullRequests(" in args[args.index("-f") + 1]:
+    query = args[args.index("-f") + 1]
+    first = int(re.search(r"first: (\d+)", query).group(1))
+    after = re.search(r'after: "(\d+)"', query)
+    start = int(after.group(1)) if after else 0
+    numbers = sorted((int(number) for number in prs), reverse="DESC" in query)
+    nodes = [
+        {"number": number, "state": "OPEN", "createdAt": "2024-01-01T00:00:00Z",
+         "author": {"login": "bench"}}
+        for number in numbers[start:start + first]
+    ]
+    has_next = start + first < len(numbers)
+    cursor = str(start + first) if has_next else None
+    connection = {
+        "pageInfo": {"hasNextPage": has_next, "endCursor": cursor},
+        "nodes": nodes,
+    }
+    print(json.dumps({"data": {"repository": {"pullRequests": connection}}}))
+elif args[:2] == ["api", "graphql"]:
+    query = args[args.index("-f") + 1]
+    repository = {}
+    errors = []
+    for alias, number in re.findall(r"(pr\d+): pullRequest\(number: (\d+)\)", query):
+        pr = prs.get(number)
+        repository[alias] = graphql_node(number, pr) if pr else None
+        if pr is None:
+            errors.append({"type": "NOT_FOUND", "path": ["repository", alias]})
+    payload = {"data": {"repository": repository}}
+    if errors:
+        payload["errors"] = errors
+    print(json.dumps(payload))
+else:
+    sys.stderr.write(f"unsupported gh invocation: {' '.join(args)}\n")
+    sys.exit(1)
+'''
+
+
+def _git(*args: str, cwd: Path, input_bytes: bytes | None = None) -> str:
+    result = subprocess.run(
+        ["git", *args], cwd=cwd, input=input_bytes, check=True, capture_output=True
+    )
+    return result.stdout.decode("utf-8").strip()
+
+
+def _file_lines(label: str, count: int) -> bytes:
+    return "".join(f"{label} line {line}\n" for line in range(count)).encode("utf-8")
+
+
+def build_synthetic_repo(
+    root: Path,
+    pr_count: int,
+    files_per_pr: int = 4,
+    lines_per_file: int = 200,
+    overlap: float = 0.25,
+    shared_files: int = 40,
+    log_lines: int = 500,
+) -> Dict[str, object]:
+    """Create an origin repository with `pr_count` PR branches and a clone of it.
+
+    Every PR rewrites `files_per_pr` files of `lines_per_file` lines each.
+    The `overlap` fraction of them comes from a pool of `shared_files` files
+    on main, so PRs collide on shared paths. The rest are new files unique
+    to the PR. All commits are written with one `git fast-import` call.
+    Branches are published as ``pr-<n>`` and as ``refs/pull/<n>/head``.
+    Returns the fixture the fake `gh` serves.
+    """
+    origin = root / "origin"
+    origin.mkdir(parents=True)
+    _git("init", "-q", "-b", "main", cwd=origin)
+
+    stamp = "bench <bench@example.invalid> 1700000000 +0000"
+    stream: List[bytes] = []
+
+    def commit(ref: str, mark: int, message: str, files: Dict[str, bytes], parent: int | None) -> None:
+        stream.append(f"commit {ref}\nmark :{mark}\ncommitter {stamp}\n".encode())
+        stream.append(f"data {len(message)}\n{message}\n".encode())
+        if parent is not None:
+            stream.append(f"from :{parent}\n".encode())
+        for path, content in files.items():
+            stream.append(f"M 100644 inline {path}\ndata {len(content)}\n".encode())
+            stream.append(content + b"\n")
+
+    shared_paths = [f"shared/module_{index:03d}.txt" for index in range(shared_files)]
+    commit(
+        "refs/heads/main",
+        1,
+        "Synthetic base",
+        {path: _file_lines(path, lines_per_file) for path in shared_paths},
+        None,
+    )
+
+    shared_per_pr = min(round(files_per_pr * overlap), shared_files)
+    prs: Dict[str, Dict[str, object]] = {}
+    for number in range(1, pr_count + 1):
+        touched = [
+            shared_paths[(number * 7 + offset) % shared_files] for offset in range(shared_per_pr)
+        ]
+        touched += [f"pr-{number}/file_{index}.txt" for index in range(files_per_pr - shared_per_pr)]
+        commit(
+            f"refs/heads/pr-{number}",
+            number + 1,
+            f"Synthetic PR {number}",
+            {path: _file_lines(f"pr {number} {path}", lines_per_file) for path in touched},
+            1,
+        )
+        stream.append(f"reset refs/pull/{number}/head\nfrom :{number + 1}\n\n".encode())
+        prs[str(number)] = {
+            "branch": f"pr-{number}",
+            "files": sorted(set(touched)),
+            "run_id": RUN_ID_BASE + number,
+        }
+
+    _git("fast-import", "--quiet", cwd=origin, input_bytes=b"".join(stream))
+    _git("checkout", "-q", "-f", "main", cwd=origin)
+    for number, pr in prs.items():
+        pr["head"] = _git("rev-parse", f"refs/pull/{number}/head", cwd=origin)
+
+    _git("clone", "-q", str(origin), str(root / "clone"), cwd=root)
+    return {"owner": BENCH_OWNER, "name": BENCH_REPO, "prs": prs, "log_lines": log_lines}
+
+
+def install_fake_gh(bin_dir: Path) -> Path:
+    """Write the stand-in `gh` executable into `bin_dir`."""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    gh_path = bin_dir / "gh"
+    gh_path.write_text(f"#!{sys.executable}\n{FAKE_GH_SOURCE}", encoding="utf-8")
+    gh_path.chmod(0o755)
+    return gh_path
+
+
+def _peak_rss_bytes() -> int:
+    """Peak RSS of this interpreter; git and gh children are not included."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _directory_bytes(path: Path) -> int:
+    return sum(entry.stat().st_size for entry in path.rglob("*") if entry.is_file())
+
+
+def run_scenario(spec: Dict[str, object]) -> Dict[str, object]:
+    """Run pr_batch_big_picture.main() in this process and measure it.
+
+    Meant to run in a fresh interpreter per scenario so peak RSS is not
+    inherited from earlier runs.
+    """
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import pr_batch_big_picture
+
+    os.environ["PATH"] = f"{spec['bin_dir']}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ["PR_BATCH_BENCH_FIXTURE"] = str(spec["fixture"])
+    os.environ["PR_BATCH_BENCH_LATENCY_MS"] = str(spec["latency_ms"])
+    os.environ["PR_BATCH_BENCH_CALL_LOG"] = str(spec["call_log"])
+    os.chdir(str(spec["clone"]))
+
+    lock = threading.Lock()
+    spawned = [0]
+    base_popen = subprocess.Popen
+
+    class CountingPopen(base_popen):  # type: ignore[misc, valid-type]
+        def __init__(self, *args: object, **kwargs: object) -> None:
+            with lock:
+                spawned[0] += 1
+            super().__init__(*args, **kwargs)
+
+    subprocess.Popen = CountingPopen  # type: ignore[misc]
+    output_dir = Path(str(spec["output_dir"]))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    sys.argv = [
+        "pr_batch_big_picture.py",
+        f"1-{spec['pr_count']}",
+        "--output-dir",
+        str(output_dir),
+        # The stand-in gh never rate-limits; pacing would only add sleeps.
+        # Later pipeline arguments can still override it.
+        "--api-rate",
+        "0",
+        *spec["pipeline_args"],
+    ]
+    exit_code = 0
+    start = time.perf_counter()
+    try:
+        pr_batch_big_picture.main()
+    except SystemExit as exc:
+        exit_code = exc.code if isinstance(exc.code, int) else 1
+    finally:
+        wall = time.perf_counter() - start
+        subprocess.Popen = base_popen  # type: ignore[misc]
+
+    call_log = Path(str(spec["call_log"]))
+    gh_calls = len(call_log.read_text().splitlines()) if call_log.exists() else 0
+    return {
+        "prs": spec["pr_count"],
+        "exit_code": exit_code,
+        "wall_seconds": round(wall, 3),
+        "subprocesses": spawned[0],
+        "gh_calls": gh_calls,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "bytes_written": _directory_bytes(output_dir),
+    }
+
+
+def run_benchmark(
+    sizes: List[int],
+    workdir: Path,
+    files_per_pr: int = 4,
+    lines_per_file: int = 200,
+    overlap: float = 0.25,
+    shared_files: int = 40,
+    log_lines: int = 500,
+    latency_ms: float = 20.0,
+    pipeline_args: List[str] | None = None,
+) -> List[Dict[str, object]]:
+    """Build a repository per size, run the pipeline in a child interpreter and collect results."""
+    bin_dir = workdir / "bin"
+    install_fake_gh(bin_dir)
+    results: List[Dict[str, object]] = []
+    for size in sizes:
+        scenario_dir = workdir / f"n{size}"
+        print(f"Building synthetic repository with {size} PR(s)...", file=sys.stderr)
+        fixture = build_synthetic_repo(
+            scenario_dir, size, files_per_pr, lines_per_file, overlap, shared_files, log_lines
+        )
+        fixture_path = scenario_dir / "fixture.json"
+        fixture_path.write_text(json.dumps(fixture), encoding="utf-8")
+        spec = {
+            "pr_count": size,
+            "clone": str(scenario_dir / "clone"),
+            "bin_dir": str(bin_dir),
+            "fixture": str(fixture_path),
+            "call_log": str(scenario_dir / "gh-calls.log"),
+            "output_dir": str(scenario_dir / "out"),
+            "latency_ms": latency_ms,
+            "pipeline_args": list(pipeline_args or []),
+        }
+        print(f"Running pipeline for {size} PR(s)...", file=sys.stderr)
+        completed = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--scenario", json.dumps(spec)],
+            capture_output=True,
+            text=True,
+        )
+        (scenario_dir / "pipeline.log").write_text(completed.stdout + completed.stderr)
+        if completed.returncode != 0 or not completed.stdout.strip():
+            raise RuntimeError(
+                f"Benchmark scenario for {size} PR(s) failed; see {scenario_dir / 'pipeline.log'}"
+            )
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def format_results(results: List[Dict[str, object]]) -> List[str]:
+    mib = 1024 * 1024
+    lines = [
+        f"{'PRs':>5} {'wall s':>8} {'procs':>7} {'gh':>6} {'RSS MiB':>8} "
+        f"{'out MiB':>8} {'exit':>5}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result['prs']:>5} {result['wall_seconds']:>8.2f} {result['subprocesses']:>7} "
+            f"{result['gh_calls']:>6} {result['peak_rss_bytes'] / mib:>8.1f} "
+            f"{result['bytes_written'] / mib:>8.2f} {result['exit_code']:>5}"
+        )
+    return lines
+
+
+def main() -> None:
+    if len(sys.argv) == 3 and sys.argv[1] == "--scenario":
+        result = run_scenario(json.loads(sys.argv[2]))
+        sys.stdout.flush()
+        print(json.dumps(result))
+        return
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark pr_batch_big_picture against a synthetic repository",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="Arguments after '--' are passed to pr_batch_big_picture.py unchanged.",
+    )
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"PR counts to run (default: {DEFAULT_SIZES})")
+    parser.add_argument("--files-per-pr", type=int, default=4, help="Files changed per PR (default: 4)")
+    parser.add_argument("--lines-per-file", type=int, default=200, help="Lines per changed file (default: 200)")
+    parser.add_argument(
+        "--overlap",
+        type=float,
+        default=0.25,
+        help="Fraction of each PR's files taken from the shared pool (default: 0.25)",
+    )
+    parser.add_argument("--shared-files", type=int, default=40, help="Size of the shared file pool (default: 40)")
+    parser.add_argument("--log-lines", type=int, default=500, help="Lines per fake Actions run log (default: 500)")
+    parser.add_argument(
+        "--latency-ms", type=float, default=20.0, help="Delay added to every fake gh call (default: 20)"
+    )
+    parser.add_argument("--workdir", help="Directory for repositories and outputs (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    parser.add_argument("--json", dest="json_output", help="Also write the results as JSON to this file")
+    parser.add_argument("pipeline_args", nargs=argparse.REMAINDER)
+
+    args = parser.parse_args()
+    try:
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    except ValueError:
+        parser.error("--sizes must be a comma-separated list of integers.")
+    if not sizes or min(sizes) < 1:
+        parser.error("--sizes must list positive integers.")
+    if args.files_per_pr < 1 or args.lines_per_file < 1 or args.shared_files < 1:
+        parser.error("--files-per-pr, --lines-per-file and --shared-files must be positive.")
+    if not 0 <= args.overlap <= 1:
+        parser.error("--overlap must be between 0 and 1.")
+    pipeline_args = args.pipeline_args
+    if pipeline_args[:1] == ["--"]:
+        pipeline_args = pipeline_args[1:]
+
+    if args.workdir:
+        workdir = Path(args.workdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        cleanup = None
+    else:
+        cleanup = tempfile.TemporaryDirectory(prefix="pr-batch-bench-")
+        workdir = Path(cleanup.name)
+
+    try:
+        results = run_benchmark(
+            sizes,
+            workdir,
+            files_per_pr=args.files_per_pr,
+            lines_per_file=args.lines_per_file,
+            overlap=args.overlap,
+            shared_files=args.shared_files,
+            log_lines=args.log_lines,
+            latency_ms=args.latency_ms,
+            pipeline_args=pipeline_args,
+        )
+    finally:
+        if cleanup is not None and not args.keep:
+            cleanup.cleanup()
+        elif cleanup is not None:
+            print(f"Kept benchmark work directory: {workdir}", file=sys.stderr)
+
+    for line in format_results(results):
+        print(line)
+    if args.json_output:
+        Path(args.json_output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,35 +8,701 @@ all comments made on the pull requests.
 """
 
 import argparse
+import codecs
+import fnmatch
+import functools
 import hashlib
+import io
 import json
+import mmap
 import os
+import queue
+import random
 import re
 import shlex
+import shutil
 import subprocess
 import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from itertools import combinations
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import IO, Callable, Dict, Iterator, List, Set, Tuple, TypeVar
+
+try:
+    import numpy as np
+except ImportError:  # optional: the similarity stage falls back to pure Python
+    np = None
+
+try:
+    import zstandard
+except ImportError:  # optional: .tar.zst archives fall back to .tar.gz
+    zstandard = None
+
+T = TypeVar("T")
+R = TypeVar("R")
 
 
 class SelectionParseError(ValueError):
     """Raised when a PR selection string cannot be parsed."""
 
 
-def run_command(cmd: str, check: bool = True, capture_output: bool = True) -> str:
+TRACE_SUMMARY_TOP = 10
+
+
+class Tracer:
+    """Collects timed spans and exports them as Chrome trace-event JSON.
+
+    Spans are recorded as complete (``"ph": "X"``) events per thread, which
+    Perfetto and chrome://tracing render as nested slices.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self.events: List[Dict[str, object]] = []
+        self._threads: Dict[int, str] = {}
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args: object) -> Iterator[Dict[str, object]]:
+        """Time the enclosed block; callers may add result details to the yielded dict."""
+        start = time.perf_counter()
+        try:
+            yield args
+        except BaseException as exc:
+            args.setdefault("error", type(exc).__name__)
+            raise
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self._origin) * 1_000_000, 1),
+                "dur": round((end - start) * 1_000_000, 1),
+                "pid": self._pid,
+                "tid": thread.ident,
+                "args": args,
+            }
+            with self._lock:
+                self.events.append(event)
+                self._threads.setdefault(thread.ident, thread.name)
+
+    def write(self, path: str) -> None:
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, trace_file)
+
+    def summary_lines(self, top: int = TRACE_SUMMARY_TOP) -> List[str]:
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event["dur"], reverse=True)[:top]
+        lines = []
+        for event in events:
+            detail = event["args"].get("command") or ""
+            if len(detail) > 80:
+                detail = detail[:77] + "..."
+            lines.append(
+                f"  {event['dur'] / 1_000_000:8.2f}s  [{event['cat']}] {event['name']}"
+                + (f": {detail}" if detail else "")
+            )
+        return lines
+
+
+_TRACER: Tracer | None = None
+
+
+def enable_tracing() -> Tracer:
+    """Start recording spans for run_command, stream_command and pipeline stages."""
+    global _TRACER
+    _TRACER = Tracer()
+    return _TRACER
+
+
+def disable_tracing() -> None:
+    global _TRACER
+    _TRACER = None
+
+
+@contextmanager
+def trace_span(name: str, category: str = "stage", **args: object) -> Iterator[Dict[str, object]]:
+    """Record a span on the active tracer; a no-op when tracing is off."""
+    tracer = _TRACER
+    if tracer is None:
+        yield args
+        return
+    with tracer.span(name, category, **args) as span_args:
+        yield span_args
+
+
+def _command_span_name(cmd: str) -> str:
+    """Name a command span by its program and subcommand words, e.g. ``gh pr view``."""
+    words: List[str] = []
+    for word in cmd.split()[:3]:
+        if words and not re.fullmatch(r"[a-z][a-z-]*", word):
+            break
+        words.append(word)
+    return " ".join(words) or "command"
+
+
+CASSETTE_COMMAND_PREFIXES = ("gh ", "git fetch ")
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in replay mode for a network command that was never recorded."""
+
+
+class CommandCassette:
+    """Record or replay the commands that talk to GitHub.
+
+    Every ``gh`` and ``git fetch`` command is stored under
+    ``DIR/<sha256 of command>.json`` (command, exit status, stderr), with its
+    stdout in a sibling ``.out`` file. In replay mode those files are served
+    back without running anything, so replaying assumes the git objects
+    fetched while recording are still in the local repository.
+    """
+
+    def __init__(self, directory: str, replay: bool = False) -> None:
+        self.directory = Path(directory)
+        self.replay = replay
+        self.stats = {"recorded": 0, "replayed": 0}
+        self._lock = threading.Lock()
+        if not replay:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def covers(self, cmd: str) -> bool:
+        return cmd.startswith(CASSETTE_COMMAND_PREFIXES)
+
+    def _paths(self, cmd: str) -> Tuple[Path, Path]:
+        key = hashlib.sha256(cmd.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.out"
+
+    def _record(self, cmd: str, meta_path: Path, out_path: Path) -> Tuple[int, str]:
+        fd, tmp_out = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as stdout_file:
+                result = subprocess.run(
+                    cmd, shell=True, stdout=stdout_file, stderr=subprocess.PIPE
+                )
+            stderr = result.stderr.decode("utf-8", "replace")
+            os.replace(tmp_out, out_path)
+        except BaseException:
+            Path(tmp_out).unlink(missing_ok=True)
+            raise
+        fd, tmp_meta = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump({"command": cmd, "exit_status": result.returncode, "stderr": stderr}, handle)
+        os.replace(tmp_meta, meta_path)
+        with self._lock:
+            self.stats["recorded"] += 1
+        return result.returncode, stderr
+
+    def run(self, cmd: str) -> Tuple[int, Path, str]:
+        """Run (or replay) `cmd`; returns its exit status, stdout file and stderr."""
+        meta_path, out_path = self._paths(cmd)
+        if not self.replay:
+            returncode, stderr = self._record(cmd, meta_path, out_path)
+            return returncode, out_path, stderr
+        try:
+            with open(meta_path, encoding="utf-8") as handle:
+                meta = json.load(handle)
+        except FileNotFoundError:
+            raise CassetteMissError(
+                f"No recording in {self.directory} for command: {cmd}"
+            ) from None
+        with self._lock:
+            self.stats["replayed"] += 1
+        return meta["exit_status"], out_path, meta["stderr"]
+
+
+_CASSETTE: CommandCassette | None = None
+
+
+def configure_cassette(cassette: CommandCassette | None) -> CommandCassette | None:
+    """Install the cassette that run_command and stream_command record to or replay from."""
+    global _CASSETTE
+    _CASSETTE = cassette
+    return cassette
+
+
+def _cassette_for(cmd: str) -> CommandCassette | None:
+    cassette = _CASSETTE
+    return cassette if cassette is not None and cassette.covers(cmd) else None
+
+
+def run_command(
+    cmd: str, check: bool = True, capture_output: bool = True, input_text: str | None = None
+) -> str:
     """Run a shell command and return the result."""
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        check=check,
-        capture_output=capture_output,
-        text=True,
-    )
+    with trace_span(_command_span_name(cmd), "command", command=cmd) as span:
+        cassette = _cassette_for(cmd)
+        if cassette is not None:
+            returncode, out_path, stderr = cassette.run(cmd)
+            stdout = out_path.read_text(encoding="utf-8", errors="replace")
+            span["exit_status"] = returncode
+            span["cassette"] = "replay" if cassette.replay else "record"
+            if check and returncode:
+                raise subprocess.CalledProcessError(returncode, cmd, output=stdout, stderr=stderr)
+            return stdout.strip() if capture_output else ""
+        try:
+            result = subprocess.run(
+                cmd,
+                shell=True,
+                check=check,
+                capture_output=capture_output,
+                text=True,
+                input=input_text,
+            )
+        except subprocess.CalledProcessError as exc:
+            span["exit_status"] = exc.returncode
+            raise
+        span["exit_status"] = result.returncode
+        if capture_output and _TRACER is not None:
+            span["output_bytes"] = len(result.stdout.encode("utf-8"))
     return result.stdout.strip() if capture_output else ""
 
 
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def write_indented(source: IO[str], dest: IO[str], indent: str = "") -> int:
+    """Copy text from `source` to `dest` in chunks, prefixing every line with `indent`.
+
+    The final line is always newline-terminated. Returns the number of
+    characters read from `source`.
+    """
+    total = 0
+    at_line_start = True
+    for chunk in iter(lambda: source.read(STREAM_CHUNK_SIZE), ""):
+        total += len(chunk)
+        if not indent:
+            dest.write(chunk)
+            at_line_start = chunk.endswith("\n")
+            continue
+        if at_line_start:
+            dest.write(indent)
+        ends_with_newline = chunk.endswith("\n")
+        body = chunk[:-1] if ends_with_newline else chunk
+        dest.write(body.replace("\n", "\n" + indent))
+        if ends_with_newline:
+            dest.write("\n")
+        at_line_start = ends_with_newline
+    if total and not at_line_start:
+        dest.write("\n")
+    return total
+
+
+def stream_command(cmd: str, dest: IO[str], indent: str = "") -> int:
+    """Run a shell command and stream its stdout into `dest` without buffering it whole.
+
+    Lines are prefixed with `indent` on the fly. Returns the number of
+    characters streamed and raises CalledProcessError on a non-zero exit,
+    like run_command with ``check=True``.
+    """
+    cassette = _cassette_for(cmd)
+    if cassette is not None:
+        with trace_span(_command_span_name(cmd), "command", command=cmd) as span:
+            returncode, out_path, stderr = cassette.run(cmd)
+            with open(out_path, encoding="utf-8", errors="replace") as source:
+                total = write_indented(source, dest, indent)
+            span["exit_status"] = returncode
+            span["output_chars"] = total
+            span["cassette"] = "replay" if cassette.replay else "record"
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+        return total
+
+    with tempfile.TemporaryFile() as stderr_file, \
+            trace_span(_command_span_name(cmd), "command", command=cmd) as span:
+        process = subprocess.Popen(
+            cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+        try:
+            total = write_indented(process.stdout, dest, indent)
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        span["exit_status"] = returncode
+        span["output_chars"] = total
+        if returncode:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(
+                returncode, cmd, stderr=stderr_file.read().decode("utf-8", "replace")
+            )
+    return total
+
+
+def run_parallel(func: Callable[[T], R], items: List[T], jobs: int = 1) -> List[R]:
+    """Apply func to every item using up to `jobs` threads, preserving input order."""
+    if jobs <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(jobs, len(items))) as executor:
+        return list(executor.map(func, items))
+
+
+class PipelineStage:
+    """One stage of run_pipeline: `workers` threads applying `func` to queued items.
+
+    When `batch_size` is set, `func` takes and returns a list: a worker
+    takes everything already waiting, up to about `batch_size` items, so
+    batched calls such as one `git fetch` for many PRs keep their batching
+    while overlapping with the stages around them. With `fixed_batches`,
+    batches are instead the input positions cut into runs of `batch_size`,
+    each handed on once all of its items have arrived, so every run issues
+    the same batched commands. Item counts, busy time and the queue depth
+    seen by each take are tallied for summary_line.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        workers: int = 1,
+        batch_size: int | None = None,
+        fixed_batches: bool = False,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size) if batch_size is not None else None
+        self.fixed_batches = fixed_batches and self.batch_size is not None
+        self.items = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._first_start: float | None = None
+        self._last_end = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, count: int, depth: int, start: float, end: float) -> None:
+        with self._lock:
+            self.items += count
+            self.batches += 1
+            self.busy_seconds += end - start
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            if self._first_start is None or start < self._first_start:
+                self._first_start = start
+            self._last_end = max(self._last_end, end)
+
+    def summary_line(self) -> str:
+        with self._lock:
+            active = self._last_end - self._first_start if self._first_start is not None else 0.0
+            mean_depth = self._depth_total / self.batches if self.batches else 0.0
+            throughput = self.items / active if active > 0 else 0.0
+            return (
+                f"  {self.name}: {self.items} item(s) in {self.batches} batch(es) on "
+                f"{self.workers} worker(s), busy {self.busy_seconds:.2f}s, "
+                f"{throughput:.1f} item(s)/s; queue depth max {self.max_depth}, "
+                f"mean {mean_depth:.1f}"
+            )
+
+
+_PIPELINE_DONE = object()
+
+
+def run_pipeline(items: List[T], stages: List[PipelineStage]) -> List[object]:
+    """Stream `items` through `stages`, with every stage running concurrently.
+
+    Each stage reads from its own queue and feeds the next one, so early
+    items reach the last stage while later ones are still upstream. The
+    last stage's results are returned in input order. The first exception
+    raised by a stage stops further work and is re-raised here.
+    """
+    queues: List[queue.Queue] = [queue.Queue() for _ in stages]
+    waiting = [0] * len(stages)
+    waiting_lock = threading.Lock()
+    held: List[Dict[int, object]] = [{} for _ in stages]
+    results: Dict[int, object] = {}
+    errors: List[BaseException] = []
+
+    def put(index: int, entries: List[Tuple[int, object]]) -> None:
+        with waiting_lock:
+            if index == len(stages):
+                results.update(entries)
+                return
+            waiting[index] += len(entries)
+            if stages[index].fixed_batches:
+                size = stages[index].batch_size
+                held[index].update(entries)
+                complete = []
+                for chunk in sorted({position // size for position, _ in entries}):
+                    positions = range(chunk * size, min((chunk + 1) * size, len(items)))
+                    if all(position in held[index] for position in positions):
+                        complete.append(
+                            [(position, held[index].pop(position)) for position in positions]
+                        )
+        if stages[index].fixed_batches:
+            for chunk_entries in complete:
+                queues[index].put(chunk_entries)
+        # Batched stages get a finished batch as one entry so it is not split up.
+        elif stages[index].batch_size:
+            queues[index].put(entries)
+        else:
+            for entry in entries:
+                queues[index].put([entry])
+
+    def work(index: int) -> None:
+        stage = stages[index]
+        source = queues[index]
+        finished = False
+        while not finished:
+            entry = source.get()
+            if entry is _PIPELINE_DONE:
+                return
+            batch = list(entry)
+            while (
+                stage.batch_size and not stage.fixed_batches and len(batch) < stage.batch_size
+            ):
+                try:
+                    entry = source.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _PIPELINE_DONE:
+                    finished = True
+                    break
+                batch.extend(entry)
+            with waiting_lock:
+                depth = waiting[index]
+                waiting[index] -= len(batch)
+            if errors:
+                continue
+            values = [value for _, value in batch]
+            start = time.perf_counter()
+            try:
+                with trace_span(stage.name, "pipeline", items=len(batch)):
+                    if stage.batch_size:
+                        outputs = stage.func(values)
+                    else:
+                        outputs = [stage.func(values[0])]
+            except BaseException as exc:
+                errors.append(exc)
+                continue
+            stage.record(len(batch), depth, start, time.perf_counter())
+            put(index + 1, [(position, output) for (position, _), output in zip(batch, outputs)])
+
+    # Queue every input before starting so the first batch is not taken short.
+    for entry in enumerate(items):
+        put(0, [entry])
+    threads = [
+        [
+            threading.Thread(target=work, args=(index,), name=f"{stage.name}-{number}", daemon=True)
+            for number in range(stage.workers)
+        ]
+        for index, stage in enumerate(stages)
+    ]
+    for stage_threads in threads:
+        for thread in stage_threads:
+            thread.start()
+    for index, stage in enumerate(stages):
+        for _ in range(stage.workers):
+            queues[index].put(_PIPELINE_DONE)
+        for thread in threads[index]:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return [results[position] for position in range(len(items))]
+
+
+DEFAULT_API_RATE = 10.0
+DEFAULT_API_CONCURRENCY = 8
+DEFAULT_API_RETRIES = 4
+API_BACKOFF_BASE = 1.0
+API_BACKOFF_MAX = 60.0
+API_QUOTA_RESERVE = 50
+API_QUOTA_REFRESH_CALLS = 200
+API_QUOTA_PACE_BELOW = 1000
+TRANSIENT_API_ERROR = re.compile(
+    r"rate limit|abuse detection|HTTP 5\d\d|bad gateway|service unavailable|timed? ?out|"
+    r"timeout|connection (?:reset|refused)|unexpected EOF|TLS handshake|temporarily unavailable",
+    re.IGNORECASE,
+)
+
+
+class TransientApiError(RuntimeError):
+    """Raised by API calls whose failure is worth retrying, such as RATE_LIMITED."""
+
+
+def read_api_quota() -> Tuple[int, float] | None:
+    """Return the lowest ``(remaining, reset_epoch)`` across the REST and GraphQL quotas."""
+    try:
+        data = json.loads(run_command("gh api rate_limit"))
+        resources = data["resources"]
+        quotas = [
+            (int(resources[name]["remaining"]), float(resources[name]["reset"]))
+            for name in ("core", "graphql")
+            if name in resources
+        ]
+    except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return None
+    return min(quotas) if quotas else None
+
+
+class ApiScheduler:
+    """Central gate for GitHub API calls.
+
+    Calls draw from a token bucket refilled at `rate` per second (0 means
+    unpaced) and at most `concurrency` run at once. When a `quota_reader`
+    is given, the remaining quota is checked every API_QUOTA_REFRESH_CALLS
+    calls and after a rate-limit error. Once fewer than API_QUOTA_PACE_BELOW
+    calls remain, the bucket rate is lowered to spread what is left until
+    the reset, and calls wait for the reset once only API_QUOTA_RESERVE
+    calls remain. Failures that look transient are
+    retried up to `retries` times with exponential backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        concurrency: int = DEFAULT_API_CONCURRENCY,
+        retries: int = DEFAULT_API_RETRIES,
+        quota_reader: Callable[[], Tuple[int, float] | None] | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.retries = retries
+        self._quota_reader = quota_reader
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._tokens = max(rate, 1.0)
+        self._paced_rate = rate
+        self._last_refill = clock()
+        self._resume_at = 0.0
+        self._calls_since_quota = API_QUOTA_REFRESH_CALLS if quota_reader else 0
+        self.stats = {"calls": 0, "retries": 0, "waited_seconds": 0.0}
+
+    def _refresh_quota(self) -> None:
+        with self._lock:
+            if not self._quota_reader or self._calls_since_quota < API_QUOTA_REFRESH_CALLS:
+                return
+            self._calls_since_quota = 0
+        quota = self._quota_reader()
+        if quota is None:
+            return
+        remaining, reset_at = quota
+        seconds_left = max(reset_at - time.time(), 1.0)
+        usable = remaining - API_QUOTA_RESERVE
+        if usable <= 0:
+            print(
+                f"API quota nearly exhausted ({remaining} left); "
+                f"pausing {seconds_left:.0f}s until it resets"
+            )
+            with self._lock:
+                self._resume_at = self._clock() + seconds_left
+                # Re-read the quota once the pause is over.
+                self._calls_since_quota = API_QUOTA_REFRESH_CALLS
+            return
+        with self._lock:
+            if usable >= API_QUOTA_PACE_BELOW:
+                # Plenty left: spreading it over the reset window would only slow small runs.
+                self._paced_rate = self.rate
+                return
+            quota_rate = usable / seconds_left
+            self._paced_rate = min(self.rate, quota_rate) if self.rate else quota_rate
+
+    def _acquire(self) -> None:
+        """Wait for a token from the bucket (and for any quota pause to end)."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                wait = self._resume_at - now
+                if wait <= 0:
+                    rate = self._paced_rate
+                    if not rate:
+                        return
+                    burst = max(rate, 1.0)
+                    self._tokens = min(burst, self._tokens + (now - self._last_refill) * rate)
+                    self._last_refill = now
+                    # Tolerate rounding so a refill never stalls a hair short of a token.
+                    if self._tokens >= 1 - 1e-9:
+                        self._tokens = max(self._tokens - 1, 0.0)
+                        return
+                    wait = (1 - self._tokens) / rate
+                self.stats["waited_seconds"] += wait
+            self._sleep(wait)
+
+    def backoff_delay(self, attempt: int) -> float:
+        ceiling = min(API_BACKOFF_MAX, API_BACKOFF_BASE * 2 ** attempt)
+        return random.uniform(ceiling / 2, ceiling)
+
+    def call(self, func: Callable[[], R], description: str = "API call") -> R:
+        """Run `func` under the bucket and concurrency cap, retrying transient failures."""
+        attempt = 0
+        while True:
+            self._refresh_quota()
+            self._acquire()
+            with self._slots:
+                with self._lock:
+                    self.stats["calls"] += 1
+                    self._calls_since_quota += 1
+                try:
+                    return func()
+                except subprocess.CalledProcessError as exc:
+                    reason = f"{exc.stderr or ''} {exc.output or ''}"
+                    if attempt >= self.retries or not TRANSIENT_API_ERROR.search(reason):
+                        raise
+                except TransientApiError as exc:
+                    if attempt >= self.retries:
+                        raise
+                    reason = str(exc)
+            if "rate limit" in reason.lower() or "rate_limited" in reason.lower():
+                with self._lock:
+                    self._calls_since_quota = API_QUOTA_REFRESH_CALLS
+            delay = self.backoff_delay(attempt)
+            attempt += 1
+            with self._lock:
+                self.stats["retries"] += 1
+            first_line = reason.strip().splitlines()[0][:120] if reason.strip() else "error"
+            print(
+                f"Warning: {description} failed ({first_line}); "
+                f"retry {attempt}/{self.retries} in {delay:.1f}s"
+            )
+            self._sleep(delay)
+
+
+_API_SCHEDULER = ApiScheduler()
+
+
+def configure_api_scheduler(scheduler: ApiScheduler) -> ApiScheduler:
+    """Route every subsequent GitHub API call through `scheduler`."""
+    global _API_SCHEDULER
+    _API_SCHEDULER = scheduler
+    return scheduler
+
+
+def api_scheduler() -> ApiScheduler:
+    return _API_SCHEDULER
+
+
+def run_api_command(cmd: str, check: bool = True) -> str:
+    """run_command for `gh` calls, paced and retried by the API scheduler."""
+    return _API_SCHEDULER.call(lambda: run_command(cmd, check=check), _command_span_name(cmd))
+
+
 def parse_pr_selection(selection: str) -> List[int]:
     """Parse a selection string into a sorted list of unique PR numbers."""
     original = selection
@@ -197,22 +863,27 @@ def checkout_base_branch(base_branch: str) -> None:
     print(f"✓ Checked out {base_branch} branch")
 
 
-def fetch_remote_branches(remote: str) -> None:
+def fetch_remote_branches(remote: str, partial: bool = False) -> None:
     """Fetch latest remote branches."""
     print(f"Fetching remote branches from {remote}...")
-    run_command(f"git fetch {shlex.quote(remote)} --prune --tags")
+    filter_arg = " --filter=blob:none" if partial else ""
+    run_command(f"git fetch{filter_arg} {shlex.quote(remote)} --prune --tags")
     print("✓ Fetched remote branches")
 
 
 def get_pr_info(pr_number: int) -> Dict[str, str]:
     """Get branch name, title, and metadata for a specific PR."""
-    pr_info = run_command(
+    pr_info = run_api_command(
         "gh pr view "
         f"{pr_number} "
         "--json headRefName,title,baseRefName,body,author,createdAt,url"
     )
     data = json.loads(pr_info)
+    return normalize_pr_info(pr_number, data)
+
 
+def normalize_pr_info(pr_number: int, data: Dict[str, object]) -> Dict[str, str]:
+    """Normalize PR metadata from `gh pr view` or GraphQL to a consistent shape."""
     return {
         "number": pr_number,
         "branch": data["headRefName"],
@@ -227,7 +898,7 @@ def get_pr_info(pr_number: int) -> Dict[str, str]:
 
 def get_pr_changed_files(pr_number: int) -> List[str]:
     """Get list of changed files for a specific PR."""
-    files_json = run_command(f"gh pr view {pr_number} --json files")
+    files_json = run_api_command(f"gh pr view {pr_number} --json files")
     data = json.loads(files_json)
     return [file_info["path"] for file_info in data.get("files", [])]
 
@@ -246,16 +917,22 @@ def normalize_comment_entry(comment: Dict[str, str], comment_type: str) -> Dict[
 
 def get_pr_comments(pr_number: int) -> List[Dict[str, str]]:
     """Get all comments (issue + review threads) for a specific PR."""
-    comments_json = run_command(
+    comments_json = run_api_command(
         f"gh pr view {pr_number} --json comments,reviewThreads"
     )
     data = json.loads(comments_json)
+    return normalize_comments(data.get("comments", []), data.get("reviewThreads", []))
 
+
+def normalize_comments(
+    issue_comments: List[Dict[str, str]], review_threads: List[Dict[str, object]]
+) -> List[Dict[str, str]]:
+    """Merge issue comments and review thread comments into one sorted list."""
     normalized: List[Dict[str, str]] = []
-    for comment in data.get("comments", []):
+    for comment in issue_comments:
         normalized.append(normalize_comment_entry(comment, "issue"))
 
-    for thread in data.get("reviewThreads", []):
+    for thread in review_threads:
         for review_comment in thread.get("comments", []):
             normalized.append(normalize_comment_entry(review_comment, "review"))
 
@@ -265,34 +942,556 @@ def get_pr_comments(pr_number: int) -> List[Dict[str, str]]:
 
 def get_pr_checks(pr_number: int) -> List[Dict[str, str]]:
     """Get status check results for a specific PR."""
-    checks_json = run_command(
+    checks_json = run_api_command(
         f"gh pr view {pr_number} --json statusCheckRollup"
     )
     data = json.loads(checks_json)
+    return [normalize_check_entry(check) for check in data.get("statusCheckRollup") or []]
 
-    checks: List[Dict[str, str]] = []
-    for check in data.get("statusCheckRollup") or []:
-        checks.append(
-            {
-                "name": check.get("name")
-                or check.get("context")
-                or check.get("title")
-                or "unknown check",
-                "status": check.get("status")
-                or check.get("state")
-                or "unknown",
-                "conclusion": check.get("conclusion")
-                or check.get("state")
-                or "unknown",
-                "detailsUrl": check.get("detailsUrl")
-                or check.get("targetUrl")
-                or "",
-                "title": check.get("title") or "",
-                "summary": check.get("summary") or check.get("text") or "",
+
+def normalize_check_entry(check: Dict[str, str]) -> Dict[str, str]:
+    """Normalize a check run or commit status context to a consistent shape."""
+    return {
+        "name": check.get("name")
+        or check.get("context")
+        or check.get("title")
+        or "unknown check",
+        "status": check.get("status")
+        or check.get("state")
+        or "unknown",
+        "conclusion": check.get("conclusion")
+        or check.get("state")
+        or "unknown",
+        "detailsUrl": check.get("detailsUrl")
+        or check.get("targetUrl")
+        or "",
+        "title": check.get("title") or "",
+        "summary": check.get("summary") or check.get("text") or "",
+    }
+
+
+GRAPHQL_PAGE_SIZE = 100
+DEFAULT_GRAPHQL_BATCH_SIZE = 20
+
+_GRAPHQL_PAGE_INFO = "pageInfo { hasNextPage endCursor }"
+_GRAPHQL_COMMENT_FIELDS = "author { login } createdAt url body"
+_GRAPHQL_CHECK_FIELDS = (
+    "__typename "
+    "... on CheckRun { name status conclusion detailsUrl title summary text } "
+    "... on StatusContext { context state targetUrl }"
+)
+_GRAPHQL_PR_FIELDS = "number headRefName title baseRefName body author { login } createdAt url"
+_PR_CONNECTION_FIELDS = ("files", "comments", "reviewThreads", "checks")
+
+
+class GraphQLError(RuntimeError):
+    """Raised when a GraphQL request returns no usable data."""
+
+
+def run_graphql_query(query: str) -> Dict[str, object]:
+    """Run a GraphQL query through `gh api graphql` and return the full payload.
+
+    Partial errors (such as NOT_FOUND for an aliased PR) are returned in the
+    payload's ``errors`` list; a payload without ``data`` raises GraphQLError.
+    RATE_LIMITED errors, secondary rate limits, gateway errors, HTML error
+    pages and failed calls without output raise TransientApiError inside the
+    scheduler, so they are retried with backoff.
+    """
+    cmd = f"gh api graphql -f query={shlex.quote(query)}"
+
+    def attempt() -> Dict[str, object]:
+        failure: subprocess.CalledProcessError | None = None
+        try:
+            output = run_command(cmd)
+        except subprocess.CalledProcessError as exc:
+            # gh exits non-zero on partial errors too, so the body is still parsed.
+            failure = exc
+            output = (exc.output or "").strip()
+        stderr = (failure.stderr or "").strip() if failure else ""
+        if not output:
+            if failure:
+                raise TransientApiError(
+                    f"gh api graphql exited {failure.returncode} without output: {stderr}"
+                )
+            raise GraphQLError("empty response from gh api graphql")
+        try:
+            payload = json.loads(output)
+        except json.JSONDecodeError as exc:
+            if failure or output.startswith("<") or TRANSIENT_API_ERROR.search(output[:1000]):
+                raise TransientApiError(
+                    f"non-JSON GraphQL response: {stderr or output[:200]}"
+                ) from exc
+            raise GraphQLError(f"invalid JSON from gh api graphql: {exc}") from exc
+        if not isinstance(payload, dict):
+            raise GraphQLError("unexpected GraphQL response")
+        errors = payload.get("errors") or []
+        if any(error.get("type") == "RATE_LIMITED" for error in errors):
+            raise TransientApiError("GraphQL RATE_LIMITED")
+        if payload.get("data") is None:
+            messages = [error.get("message", "unknown error") for error in errors]
+            if payload.get("message"):
+                messages.append(str(payload["message"]))
+            reason = "; ".join(messages)
+            if TRANSIENT_API_ERROR.search(f"{reason} {stderr}"):
+                raise TransientApiError(reason or stderr)
+            raise GraphQLError(reason or "no data in GraphQL response")
+        return payload
+
+    try:
+        return api_scheduler().call(attempt, "gh api graphql")
+    except TransientApiError as exc:
+        raise GraphQLError(str(exc)) from exc
+
+
+def get_repo_owner_and_name() -> Tuple[str, str]:
+    """Resolve the owner and name of the repository gh is operating on."""
+    data = json.loads(run_api_command("gh repo view --json owner,name"))
+    return data["owner"]["login"], data["name"]
+
+
+def _graphql_connection(field: str, nodes: str, after: str | None = None) -> str:
+    cursor = f", after: {json.dumps(after)}" if after else ""
+    return (
+        f"{field}(first: {GRAPHQL_PAGE_SIZE}{cursor}) "
+        f"{{ {_GRAPHQL_PAGE_INFO} nodes {{ {nodes} }} }}"
+    )
+
+
+def _pr_connection_selection(field: str, after: str | None = None) -> str:
+    """Build the selection for one paginated PR connection."""
+    if field == "files":
+        return _graphql_connection("files", "path", after)
+    if field == "comments":
+        return _graphql_connection("comments", _GRAPHQL_COMMENT_FIELDS, after)
+    if field == "reviewThreads":
+        thread_fields = "id " + _graphql_connection("comments", _GRAPHQL_COMMENT_FIELDS)
+        return _graphql_connection("reviewThreads", thread_fields, after)
+    if field == "checks":
+        contexts = _graphql_connection("contexts", _GRAPHQL_CHECK_FIELDS, after)
+        return f"commits(last: 1) {{ nodes {{ commit {{ statusCheckRollup {{ {contexts} }} }} }} }}"
+    raise ValueError(f"Unknown PR connection field '{field}'")
+
+
+def _pr_connection(pr_node: Dict[str, object], field: str) -> Dict[str, object]:
+    """Extract one paginated connection from a pullRequest node."""
+    if field == "checks":
+        commits = (pr_node.get("commits") or {}).get("nodes") or []
+        if not commits:
+            return {}
+        rollup = (commits[-1].get("commit") or {}).get("statusCheckRollup") or {}
+        return rollup.get("contexts") or {}
+    return pr_node.get(field) or {}
+
+
+def _repository_query(owner: str, name: str, selection: str) -> str:
+    return (
+        f"query {{ repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) "
+        f"{{ {selection} }} }}"
+    )
+
+
+def build_bulk_pr_query(owner: str, name: str, pr_numbers: List[int]) -> str:
+    """Build one aliased GraphQL query that fetches every field for many PRs."""
+    connections = " ".join(_pr_connection_selection(field) for field in _PR_CONNECTION_FIELDS)
+    selections = " ".join(
+        f"pr{number}: pullRequest(number: {number}) {{ {_GRAPHQL_PR_FIELDS} {connections} }}"
+        for number in pr_numbers
+    )
+    return _repository_query(owner, name, selections)
+
+
+def _drain_connection(
+    connection: Dict[str, object], fetch_page: Callable[[str], Dict[str, object]]
+) -> List[Dict[str, object]]:
+    """Collect all nodes of a connection, following cursors while pages remain."""
+    nodes = list(connection.get("nodes") or [])
+    page_info = connection.get("pageInfo") or {}
+    while page_info.get("hasNextPage") and page_info.get("endCursor"):
+        connection = fetch_page(page_info["endCursor"]) or {}
+        nodes.extend(connection.get("nodes") or [])
+        page_info = connection.get("pageInfo") or {}
+    return nodes
+
+
+def normalize_pr_bundle(owner: str, name: str, pr_node: Dict[str, object]) -> Dict[str, object]:
+    """Normalize a GraphQL pullRequest node into info, files, comments and checks.
+
+    Connections that did not fit in the first page are paginated with
+    follow-up queries so the result matches the per-PR `gh pr view` helpers.
+    """
+    number = pr_node["number"]
+
+    def pr_page(field: str) -> Callable[[str], Dict[str, object]]:
+        def fetch(cursor: str) -> Dict[str, object]:
+            selection = (
+                f"pullRequest(number: {number}) {{ {_pr_connection_selection(field, cursor)} }}"
+            )
+            data = run_graphql_query(_repository_query(owner, name, selection))["data"]
+            return _pr_connection((data.get("repository") or {}).get("pullRequest") or {}, field)
+
+        return fetch
+
+    def thread_page(thread_id: str) -> Callable[[str], Dict[str, object]]:
+        def fetch(cursor: str) -> Dict[str, object]:
+            comments = _graphql_connection("comments", _GRAPHQL_COMMENT_FIELDS, cursor)
+            query = (
+                f"query {{ node(id: {json.dumps(thread_id)}) "
+                f"{{ ... on PullRequestReviewThread {{ {comments} }} }} }}"
+            )
+            data = run_graphql_query(query)["data"]
+            return (data.get("node") or {}).get("comments") or {}
+
+        return fetch
+
+    nodes = {
+        field: _drain_connection(_pr_connection(pr_node, field), pr_page(field))
+        for field in _PR_CONNECTION_FIELDS
+    }
+    review_threads = [
+        {
+            "comments": _drain_connection(
+                thread.get("comments") or {}, thread_page(thread.get("id") or "")
+            )
+        }
+        for thread in nodes["reviewThreads"]
+    ]
+
+    return {
+        "info": normalize_pr_info(number, pr_node),
+        "files": [file_node["path"] for file_node in nodes["files"]],
+        "comments": normalize_comments(nodes["comments"], review_threads),
+        "checks": [normalize_check_entry(check) for check in nodes["checks"]],
+    }
+
+
+def fetch_pr_data_bulk(
+    pr_numbers: List[int],
+    batch_size: int = DEFAULT_GRAPHQL_BATCH_SIZE,
+    jobs: int = 1,
+    repo: Tuple[str, str] | None = None,
+) -> Dict[int, Dict[str, object] | None]:
+    """Fetch info, files, comments and checks for many PRs with aliased GraphQL queries.
+
+    Returns a mapping of PR number to a bundle with ``info``, ``files``,
+    ``comments`` and ``checks`` keys. PRs that GitHub reports as not found map
+    to ``None``. PRs whose batch failed for any other reason are left out so
+    the caller can fall back to the per-PR helpers. Up to ``jobs`` batches are
+    requested concurrently. Passing `repo` as (owner, name) skips looking it up.
+    """
+    if repo:
+        owner, name = repo
+    else:
+        try:
+            owner, name = get_repo_owner_and_name()
+        except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
+            print(f"Warning: Could not resolve repository for bulk fetch: {exc}")
+            return {}
+
+    def fetch_batch(batch: List[int]) -> Dict[int, Dict[str, object] | None]:
+        print(f"Fetching PR data via GraphQL for {format_pr_selection(batch)}...")
+        try:
+            payload = run_graphql_query(build_bulk_pr_query(owner, name, batch))
+            not_found = {
+                str(error["path"][-1])
+                for error in payload.get("errors") or []
+                if error.get("type") == "NOT_FOUND" and error.get("path")
             }
+            repository = payload["data"].get("repository") or {}
+            batch_results: Dict[int, Dict[str, object] | None] = {}
+            for number in batch:
+                alias = f"pr{number}"
+                pr_node = repository.get(alias)
+                if pr_node:
+                    batch_results[number] = normalize_pr_bundle(owner, name, pr_node)
+                elif alias in not_found:
+                    batch_results[number] = None
+        except (
+            subprocess.CalledProcessError,
+            json.JSONDecodeError,
+            KeyError,
+            GraphQLError,
+            CassetteMissError,
+        ) as exc:
+            print(f"Warning: GraphQL fetch failed for {format_pr_selection(batch)}: {exc}")
+            return {}
+        return batch_results
+
+    batches = [
+        pr_numbers[start : start + batch_size] for start in range(0, len(pr_numbers), batch_size)
+    ]
+    results: Dict[int, Dict[str, object] | None] = {}
+    for batch_results in run_parallel(fetch_batch, batches, jobs):
+        results.update(batch_results)
+    return results
+
+
+PR_STATE_FILTERS = ("open", "closed", "merged")
+PR_LIST_AUTO_MIN = 25
+SEARCH_RESULT_LIMIT = 1000
+_PR_LIST_NODE_FIELDS = "number state createdAt author { login }"
+_LATEST_PR_SELECTION = (
+    "pullRequests(first: 1, orderBy: {field: CREATED_AT, direction: DESC}) { nodes { number } }"
+)
+
+
+def should_list_selection(pr_numbers: List[int]) -> bool:
+    """Return whether resolving a selection by listing beats probing each number.
+
+    Listing pays off for selections of at least PR_LIST_AUTO_MIN numbers that
+    cover a good part of their window; sparse picks like ``12,40000`` are
+    cheaper to probe.
+    """
+    if len(pr_numbers) < PR_LIST_AUTO_MIN:
+        return False
+    return len(pr_numbers) * 4 >= max(pr_numbers) - min(pr_numbers) + 1
+
+
+def build_pr_list_query(
+    owner: str,
+    name: str,
+    direction: str,
+    after: str | None = None,
+    state: str | None = None,
+    labels: List[str] | None = None,
+    author: str | None = None,
+    created_since: str | None = None,
+    created_until: str | None = None,
+) -> str:
+    """Build one page of a PR listing in creation order, filtered on the server.
+
+    State and labels (any of) are arguments of the ``pullRequests``
+    connection. Author and creation dates are only available through
+    search, so those filters switch the query to a ``search`` for PRs.
+    """
+    cursor = f", after: {json.dumps(after)}" if after else ""
+    if author or created_since or created_until:
+        terms = [f"repo:{owner}/{name}", "is:pr", f"sort:created-{direction.lower()}"]
+        if state == "closed":
+            terms += ["is:closed", "is:unmerged"]
+        elif state:
+            terms.append(f"is:{state}")
+        if labels:
+            terms.append("label:" + ",".join(json.dumps(label) for label in labels))
+        if author:
+            terms.append(f"author:{author}")
+        if created_since or created_until:
+            terms.append(f"created:{created_since or '*'}..{created_until or '*'}")
+        return (
+            f"query {{ search(query: {json.dumps(' '.join(terms))}, type: ISSUE, "
+            f"first: {GRAPHQL_PAGE_SIZE}{cursor}) {{ {_GRAPHQL_PAGE_INFO} "
+            f"nodes {{ ... on PullRequest {{ {_PR_LIST_NODE_FIELDS} }} }} }} }}"
+        )
+    arguments = (
+        f"first: {GRAPHQL_PAGE_SIZE}{cursor}, "
+        f"orderBy: {{field: CREATED_AT, direction: {direction}}}"
+    )
+    if state:
+        arguments += f", states: [{state.upper()}]"
+    if labels:
+        arguments += f", labels: {json.dumps(labels)}"
+    return _repository_query(
+        owner,
+        name,
+        f"pullRequests({arguments}) {{ {_GRAPHQL_PAGE_INFO} nodes {{ {_PR_LIST_NODE_FIELDS} }} }}",
+    )
+
+
+def list_pull_requests(
+    low: int,
+    high: int,
+    state: str | None = None,
+    labels: List[str] | None = None,
+    author: str | None = None,
+    created_since: str | None = None,
+    created_until: str | None = None,
+    repo: Tuple[str, str] | None = None,
+) -> List[Dict[str, object]]:
+    """List the pull requests numbered `low` to `high` that match the filters.
+
+    PR numbers grow with creation time, so pages are walked in creation
+    order from whichever end of the repository's history is nearer the
+    window, and the walk stops once it has passed the window. Returns the
+    matching nodes (``number``, ``state``, ``createdAt``, ``author``) sorted
+    by number. Errors from gh or GraphQL propagate to the caller.
+    """
+    owner, name = repo or get_repo_owner_and_name()
+    latest = run_graphql_query(_repository_query(owner, name, _LATEST_PR_SELECTION))
+    latest_nodes = latest["data"]["repository"]["pullRequests"]["nodes"]
+    if not latest_nodes:
+        return []
+    newest = latest_nodes[0]["number"]
+    direction = "DESC" if newest - high <= low - 1 else "ASC"
+
+    found: List[Dict[str, object]] = []
+    seen = 0
+    after: str | None = None
+    while True:
+        data = run_graphql_query(
+            build_pr_list_query(
+                owner, name, direction, after, state, labels, author,
+                created_since, created_until,
+            )
+        )["data"]
+        searching = "search" in data
+        connection = data["search"] if searching else data["repository"]["pullRequests"]
+        numbers = [node["number"] for node in connection.get("nodes") or [] if node]
+        seen += len(numbers)
+        found += [
+            node for node in connection.get("nodes") or []
+            if node and low <= node["number"] <= high
+        ]
+        passed = bool(numbers) and (
+            min(numbers) < low if direction == "DESC" else max(numbers) > high
         )
+        page_info = connection.get("pageInfo") or {}
+        if passed or not page_info.get("hasNextPage") or not page_info.get("endCursor"):
+            break
+        after = page_info["endCursor"]
+    if searching and not passed and seen >= SEARCH_RESULT_LIMIT:
+        print(
+            f"Warning: GitHub search stops after {SEARCH_RESULT_LIMIT} results; "
+            "narrow the author or date filters to see the rest of the window"
+        )
+    return sorted(found, key=lambda node: node["number"])
+
+
+DEFAULT_CACHE_MAX_MB = 512
+FINGERPRINT_BATCH_SIZE = 100
+
+
+class PrMetadataCache:
+    """On-disk cache of normalized PR bundles and Actions run logs.
+
+    PR bundles (info, files, comments and checks) live in ``prs/<number>.json``
+    alongside the fingerprint they were fetched under and are only returned
+    when the caller's current fingerprint matches. Logs of completed Actions
+    runs never change, so ``runs/<run_id>.log`` entries are never revalidated.
+    Both kinds of entry share one size budget and are evicted least recently
+    used first, using file modification times as the access clock.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.root = Path(cache_dir)
+        self.max_bytes = max_bytes
+        (self.root / "prs").mkdir(parents=True, exist_ok=True)
+        (self.root / "runs").mkdir(parents=True, exist_ok=True)
+
+    def _pr_path(self, pr_number: int) -> Path:
+        return self.root / "prs" / f"{pr_number}.json"
+
+    def run_log_path(self, run_id: str) -> Path:
+        return self.root / "runs" / f"{run_id}.log"
+
+    @staticmethod
+    def _write_atomic(path: Path, text: str) -> None:
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get_pr(self, pr_number: int, fingerprint: str | None) -> Dict[str, object] | None:
+        """Return the cached bundle for a PR if it was stored under `fingerprint`."""
+        if not fingerprint:
+            return None
+        path = self._pr_path(pr_number)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if entry.get("fingerprint") != fingerprint:
+            return None
+        self._touch(path)
+        return entry.get("bundle")
+
+    def put_pr(self, pr_number: int, fingerprint: str | None, bundle: Dict[str, object]) -> None:
+        if not fingerprint:
+            return
+        entry = {"fingerprint": fingerprint, "bundle": bundle}
+        self._write_atomic(self._pr_path(pr_number), json.dumps(entry))
+
+    def touch_run_log(self, run_id: str) -> bool:
+        """Mark a cached run log as used; returns False when it is not cached."""
+        path = self.run_log_path(run_id)
+        if not path.exists():
+            return False
+        self._touch(path)
+        return True
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits its budget."""
+        entries: List[Tuple[float, int, Path]] = []
+        total = 0
+        for subdir in ("prs", "runs"):
+            for path in (self.root / subdir).iterdir():
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def build_fingerprint_query(owner: str, name: str, pr_numbers: List[int]) -> str:
+    """Build a light aliased query for the fields that change when a PR changes."""
+    fields = (
+        "updatedAt headRefOid "
+        "commits(last: 1) { nodes { commit { statusCheckRollup { state } } } }"
+    )
+    selections = " ".join(
+        f"pr{number}: pullRequest(number: {number}) {{ {fields} }}" for number in pr_numbers
+    )
+    return _repository_query(owner, name, selections)
 
-    return checks
+
+def fetch_pr_fingerprints(
+    pr_numbers: List[int], batch_size: int = FINGERPRINT_BATCH_SIZE
+) -> Dict[int, str]:
+    """Return a revalidation fingerprint per PR from `updatedAt`, `headRefOid` and check state.
+
+    PRs that cannot be resolved are left out, which makes them cache misses.
+    """
+    try:
+        owner, name = get_repo_owner_and_name()
+    except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
+        print(f"Warning: Could not resolve repository for cache revalidation: {exc}")
+        return {}
+
+    fingerprints: Dict[int, str] = {}
+    for start in range(0, len(pr_numbers), batch_size):
+        batch = pr_numbers[start : start + batch_size]
+        try:
+            payload = run_graphql_query(build_fingerprint_query(owner, name, batch))
+        except (subprocess.CalledProcessError, json.JSONDecodeError, GraphQLError) as exc:
+            print(f"Warning: Cache revalidation failed for {format_pr_selection(batch)}: {exc}")
+            continue
+        repository = payload["data"].get("repository") or {}
+        for number in batch:
+            pr_node = repository.get(f"pr{number}")
+            if not pr_node:
+                continue
+            commits = (pr_node.get("commits") or {}).get("nodes") or []
+            rollup = (commits[-1].get("commit") or {}).get("statusCheckRollup") if commits else None
+            state = (rollup or {}).get("state") or "NONE"
+            fingerprints[number] = f"{pr_node.get('updatedAt')}|{pr_node.get('headRefOid')}|{state}"
+    return fingerprints
 
 
 def extract_actions_run_id(details_url: str | None) -> str | None:
@@ -303,25 +1502,176 @@ def extract_actions_run_id(details_url: str | None) -> str | None:
     return match.group(1) if match else None
 
 
-def get_failed_check_logs(check: Dict[str, str]) -> str | None:
-    """Retrieve raw logs for failed GitHub Actions checks."""
+def failed_check_run_id(check: Dict[str, str]) -> str | None:
+    """Return the Actions run ID of a check that did not pass, or None."""
     conclusion = (check.get("conclusion") or "").lower()
     if conclusion in {"success", "neutral", "skipped"}:
         return None
+    return extract_actions_run_id(check.get("detailsUrl") or "")
+
+
+def _run_log_commands(run_id: str) -> List[str]:
+    """`gh run view` invocations to try for a run, failed-jobs-only log first."""
+    quoted = shlex.quote(run_id)
+    return [f"gh run view {quoted} --log-failed", f"gh run view {quoted} --log"]
 
-    run_id = extract_actions_run_id(check.get("detailsUrl") or "")
-    if not run_id:
-        return None
 
+_SPOOL_LOCKS: Dict[str, threading.Lock] = {}
+_SPOOL_LOCKS_GUARD = threading.Lock()
+
+
+def _spool_lock(path: Path) -> threading.Lock:
+    with _SPOOL_LOCKS_GUARD:
+        return _SPOOL_LOCKS.setdefault(str(path), threading.Lock())
+
+
+def spool_run_log(
+    run_id: str,
+    spool_dir: str,
+    cache: PrMetadataCache | None = None,
+    completed: bool = False,
+) -> str | None:
+    """Stream the log of Actions run `run_id` to a file and return its path.
+
+    The failed-jobs-only log is preferred; the full log is fetched when it is
+    unavailable or empty. Logs of `completed` runs are written straight into
+    the cache when one is given; everything else goes to `spool_dir`. A run
+    whose log file already exists is not downloaded again, and concurrent
+    callers asking for the same run wait for a single download.
+    """
+    if cache and cache.touch_run_log(run_id):
+        return str(cache.run_log_path(run_id))
+    if cache and completed:
+        target = cache.run_log_path(run_id)
+    else:
+        target = Path(spool_dir) / f"{run_id}.log"
+    with _spool_lock(target):
+        if target.exists():
+            return str(target)
+        return _download_run_log(run_id, target)
+
+
+def _download_run_log(run_id: str, target: Path) -> str | None:
+    """Stream the failed-jobs log of a run into `target`, falling back to the full log."""
+    tmp_path = target.with_name(f".{target.name}.{threading.get_ident()}.tmp")
+
+    def download(cmd: str) -> int:
+        with open(tmp_path, "w", encoding="utf-8") as log_file:
+            return stream_command(cmd, log_file)
+
+    for cmd in _run_log_commands(run_id):
+        try:
+            written = api_scheduler().call(lambda: download(cmd), _command_span_name(cmd))
+        except subprocess.CalledProcessError as exc:
+            print(f"Warning: Failed to fetch logs for run {run_id}: {exc}")
+            continue
+        if written:
+            os.replace(tmp_path, target)
+            return str(target)
+    tmp_path.unlink(missing_ok=True)
+    return None
+
+
+def attach_failed_check_logs(
+    check_lists: List[List[Dict[str, str]]],
+    spool_dir: str,
+    cache: PrMetadataCache | None = None,
+    jobs: int = 1,
+) -> int:
+    """Fetch each failed Actions run once and set ``logFile`` on every check using it.
+
+    Checks across all lists are grouped by run ID, so a workflow whose jobs
+    report as several checks, or that several PRs point at, is downloaded a
+    single time. Runs are fetched `jobs` at a time. Returns the number of
+    distinct runs whose logs were retrieved.
+    """
+    checks_by_run: Dict[str, List[Dict[str, str]]] = {}
+    for checks in check_lists:
+        for check in checks:
+            run_id = failed_check_run_id(check)
+            if run_id:
+                checks_by_run.setdefault(run_id, []).append(check)
+    if not checks_by_run:
+        return 0
+
+    run_count = len(checks_by_run)
+    check_count = sum(len(checks) for checks in checks_by_run.values())
+    print(f"Fetching logs for {run_count} failed run(s) referenced by {check_count} check(s)")
+
+    def fetch(item: Tuple[str, List[Dict[str, str]]]) -> str | None:
+        run_id, checks = item
+        completed = all((c.get("status") or "").lower() == "completed" for c in checks)
+        return spool_run_log(run_id, spool_dir, cache, completed)
+
+    items = list(checks_by_run.items())
+    fetched = 0
+    for (_, checks), log_file in zip(items, run_parallel(fetch, items, jobs)):
+        if not log_file:
+            continue
+        fetched += 1
+        for check in checks:
+            check["logFile"] = log_file
+    return fetched
+
+
+def lookup_pr_info(
+    pr_number: int, bulk_data: Dict[int, Dict[str, object] | None] | None = None
+) -> Tuple[Dict[str, str] | None, str | None]:
+    """Return (info, error) for a PR, preferring prefetched bulk data."""
+    if bulk_data and pr_number in bulk_data:
+        bundle = bulk_data[pr_number]
+        if bundle is None:
+            return None, "not a pull request"
+        return bundle["info"], None
     try:
-        print(
-            f"Fetching logs for failed check '{check.get('name', 'unknown check')}' "
-            f"(run {run_id})"
-        )
-        return run_command(f"gh run view {shlex.quote(run_id)} --log")
-    except subprocess.CalledProcessError as exc:
-        print(f"Warning: Failed to fetch logs for run {run_id}: {exc}")
-        return None
+        return get_pr_info(pr_number), None
+    except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
+        return None, str(exc)
+
+
+def collect_pr_artifacts(
+    pr_number: int,
+    bundle: Dict[str, object] | None = None,
+    cache: PrMetadataCache | None = None,
+) -> Dict[str, object]:
+    """Fetch changed files, comments and checks for one PR.
+
+    Failures are recorded as messages instead of being printed so callers
+    running this across a thread pool can report them in PR order. ``files``
+    is None when the file list could not be retrieved. ``checks_with_logs``
+    holds copies of the checks for attach_failed_check_logs to fill in.
+    """
+    artifacts: Dict[str, object] = {
+        "files": None,
+        "comments": [],
+        "checks": [],
+        "checks_with_logs": [],
+        "messages": [],
+    }
+    messages: List[str] = artifacts["messages"]
+
+    try:
+        artifacts["files"] = bundle["files"] if bundle else get_pr_changed_files(pr_number)
+    except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
+        messages.append(f"Failed to retrieve files for PR #{pr_number}: {exc}")
+        return artifacts
+    if not artifacts["files"]:
+        return artifacts
+
+    try:
+        artifacts["comments"] = bundle["comments"] if bundle else get_pr_comments(pr_number)
+    except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
+        messages.append(f"Failed to retrieve comments for PR #{pr_number}: {exc}")
+
+    try:
+        checks = bundle["checks"] if bundle else get_pr_checks(pr_number)
+    except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
+        messages.append(f"Failed to retrieve checks for PR #{pr_number}: {exc}")
+        return artifacts
+
+    artifacts["checks"] = checks
+    artifacts["checks_with_logs"] = [dict(check) for check in checks]
+    return artifacts
 
 
 def filter_existing_files(files: List[str]) -> Tuple[List[str], List[str]]:
@@ -341,8 +1691,20 @@ def filter_existing_files(files: List[str]) -> Tuple[List[str], List[str]]:
     return existing_files, deleted_files
 
 
-def checkout_pr_branch(pr_info: Dict[str, str], remote: str) -> str:
-    """Checkout a specific PR branch, falling back to PR refs when needed."""
+def checkout_pr_branch(
+    pr_info: Dict[str, str], remote: str, head_ref: str | None = None
+) -> str:
+    """Checkout a specific PR branch, falling back to PR refs when needed.
+
+    When `head_ref` already holds the PR head (see fetch_pr_heads_bulk), it is
+    checked out detached and returned, so no local branch is created or reset,
+    and the fallback chain is skipped.
+    """
+    if head_ref:
+        run_command(f"git checkout --quiet --detach {shlex.quote(head_ref)}")
+        print(f"✓ Checked out {head_ref} (detached)")
+        return head_ref
+
     branch_name = pr_info["branch"]
     print(f"Attempting to checkout branch {branch_name}...")
 
@@ -376,6 +1738,264 @@ def checkout_pr_branch(pr_info: Dict[str, str], remote: str) -> str:
         raise exc
 
 
+PR_REF_NAMESPACE = "refs/pr-batch"
+
+
+def pr_head_ref(pr_number: int) -> str:
+    """Return the private ref that holds a PR head in checkout-free mode."""
+    return f"{PR_REF_NAMESPACE}/{pr_number}"
+
+
+def fetch_pr_head_ref(pr_info: Dict[str, str], remote: str) -> str:
+    """Fetch a PR head into the private ref namespace without touching the working tree."""
+    ref = pr_head_ref(pr_info["number"])
+    try:
+        run_command(
+            f"git fetch --quiet {shlex.quote(remote)} "
+            f"+pull/{pr_info['number']}/head:{shlex.quote(ref)}"
+        )
+        print(f"✓ Fetched PR #{pr_info['number']} into {ref}")
+        return ref
+    except subprocess.CalledProcessError:
+        print(f"PR ref for #{pr_info['number']} not found on {remote}, trying branch...")
+
+    remote_branch = f"{remote}/{pr_info['branch']}"
+    try:
+        run_command(f"git update-ref {shlex.quote(ref)} {shlex.quote(remote_branch)}")
+    except subprocess.CalledProcessError as exc:
+        print(f"Error: Could not resolve a head ref for PR #{pr_info['number']}")
+        raise exc
+    print(f"✓ Pointed {ref} at {remote_branch}")
+    return ref
+
+
+def fetch_pr_heads_bulk(
+    pr_numbers: List[int],
+    remote: str,
+    base_branch: str | None = None,
+    partial: bool = False,
+) -> Set[int]:
+    """Fetch every PR head into the private ref namespace with one `git fetch`.
+
+    When `base_branch` is given it is fetched in the same call and tags are
+    skipped, so nothing outside the selection is transferred. `partial` adds
+    ``--filter=blob:none`` so blobs are only downloaded when a diff needs them.
+    Returns the PR numbers whose heads are now available; on failure the set
+    is empty and callers fall back to per-PR fetches.
+    """
+    if not pr_numbers:
+        return set()
+
+    refspecs = [f"+pull/{number}/head:{pr_head_ref(number)}" for number in pr_numbers]
+    options = ["--quiet"]
+    if base_branch:
+        refspecs.append(f"+refs/heads/{base_branch}:refs/remotes/{remote}/{base_branch}")
+        options.append("--no-tags")
+    if partial:
+        options.append("--filter=blob:none")
+
+    print(f"Fetching {len(pr_numbers)} PR head(s) from {remote} in one request...")
+    try:
+        run_command(
+            f"git fetch {' '.join(options)} {shlex.quote(remote)} "
+            + " ".join(shlex.quote(refspec) for refspec in refspecs)
+        )
+    except (subprocess.CalledProcessError, CassetteMissError) as exc:
+        print(f"Warning: Bulk fetch of PR heads failed, falling back to per-PR fetches: {exc}")
+        return set()
+    print(f"✓ Fetched PR heads into {PR_REF_NAMESPACE}/")
+    return set(pr_numbers)
+
+
+def filter_existing_files_at_ref(files: List[str], ref: str) -> Tuple[List[str], List[str]]:
+    """Filter files to those present in `ref`, answered from the object database."""
+    if not files:
+        return [], []
+
+    output = run_command(
+        "git cat-file --batch-check",
+        input_text="".join(f"{ref}:{file_path}\n" for file_path in files),
+    )
+    existing_files: List[str] = []
+    deleted_files: List[str] = []
+    for file_path, line in zip(files, output.splitlines()):
+        if line.endswith(" missing"):
+            deleted_files.append(file_path)
+        else:
+            existing_files.append(file_path)
+
+    if deleted_files:
+        print(f"Skipping {len(deleted_files)} deleted file(s): {', '.join(deleted_files)}")
+
+    return existing_files, deleted_files
+
+
+DEFAULT_MAX_BLOB_BYTES = 5 * 1024 * 1024
+BINARY_SNIFF_BYTES = 8000
+
+
+class GitBlobReader:
+    """Long-lived `git cat-file` processes for streaming blob contents.
+
+    Object headers come from a ``--batch-check`` process so missing and
+    oversized blobs are rejected from the size header alone; only accepted
+    blobs are requested from the ``--batch`` process. Content is streamed
+    to the destination in chunks rather than held in memory.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._check_proc: subprocess.Popen | None = None
+        self._batch_proc: subprocess.Popen | None = None
+
+    def __enter__(self) -> "GitBlobReader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    @staticmethod
+    def _start(mode: str) -> subprocess.Popen:
+        return subprocess.Popen(
+            ["git", "cat-file", mode],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    @staticmethod
+    def _request(proc: subprocess.Popen, spec: str) -> List[str]:
+        assert proc.stdin is not None and proc.stdout is not None
+        proc.stdin.write(spec.encode("utf-8") + b"\n")
+        proc.stdin.flush()
+        header = proc.stdout.readline()
+        if not header:
+            raise RuntimeError(f"git cat-file exited while reading {spec}")
+        return header.decode("utf-8", "replace").rstrip("\n").split(" ")
+
+    def info(self, spec: str) -> Tuple[str, int] | None:
+        """Return ``(type, size)`` for the object named by `spec`, or None if missing."""
+        with self._lock:
+            if self._check_proc is None:
+                self._check_proc = self._start("--batch-check")
+            fields = self._request(self._check_proc, spec)
+        if len(fields) != 3 or fields[-1] == "missing":
+            return None
+        return fields[1], int(fields[2])
+
+    def stream_blob(
+        self,
+        spec: str,
+        dest: IO[str],
+        max_bytes: int | None = DEFAULT_MAX_BLOB_BYTES,
+        header: str = "",
+    ) -> Tuple[str, int]:
+        """Stream the blob named by `spec` into `dest` as text, preceded by `header`.
+
+        Returns ``(status, size)`` where status is ``"ok"``, ``"missing"``,
+        ``"too-large"`` or ``"binary"``. Nothing is written unless the status
+        is ``"ok"``; the text written always ends with a newline.
+        """
+        info = self.info(spec)
+        if info is None or info[0] != "blob":
+            return "missing", 0
+        size = info[1]
+        if max_bytes and size > max_bytes:
+            return "too-large", size
+
+        with self._lock, trace_span(
+            "git cat-file", "command", command=f"git cat-file --batch {spec}"
+        ) as span:
+            span["output_bytes"] = size
+            if self._batch_proc is None:
+                self._batch_proc = self._start("--batch")
+            proc = self._batch_proc
+            self._request(proc, spec)
+            assert proc.stdout is not None
+            remaining = size
+            head = proc.stdout.read(min(size, BINARY_SNIFF_BYTES))
+            remaining -= len(head)
+            binary = b"\0" in head
+            if not binary:
+                dest.write(header)
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            last = ""
+            chunk = head
+            while True:
+                if not binary and chunk:
+                    text = decoder.decode(chunk)
+                    if text:
+                        dest.write(text)
+                        last = text
+                if remaining <= 0:
+                    break
+                chunk = proc.stdout.read(min(remaining, STREAM_CHUNK_SIZE))
+                if not chunk:
+                    raise RuntimeError(f"git cat-file truncated {spec}")
+                remaining -= len(chunk)
+            proc.stdout.read(1)  # trailing newline after the object
+            if binary:
+                return "binary", size
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                dest.write(tail)
+                last = tail
+            if not last.endswith("\n"):
+                dest.write("\n")
+        return "ok", size
+
+    def close(self) -> None:
+        with self._lock:
+            for proc in (self._check_proc, self._batch_proc):
+                if proc is None:
+                    continue
+                assert proc.stdin is not None and proc.stdout is not None
+                proc.stdin.close()
+                proc.stdout.close()
+                proc.wait()
+            self._check_proc = None
+            self._batch_proc = None
+
+
+def compute_merge_base(base_branch: str, head_ref: str) -> str | None:
+    """Return the merge-base commit of `base_branch` and `head_ref`, or None."""
+    try:
+        return run_command(
+            f"git merge-base {shlex.quote(base_branch)} {shlex.quote(head_ref)}"
+        ) or None
+    except subprocess.CalledProcessError:
+        print(f"Warning: No merge base between {base_branch} and {head_ref}")
+        return None
+
+
+class WorkerTimings:
+    """Thread-safe tally of task count and elapsed seconds per worker thread."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            worker = threading.current_thread().name
+            with self._lock:
+                totals = self._totals.setdefault(worker, [0, 0.0])
+                totals[0] += 1
+                totals[1] += elapsed
+
+    def summary_lines(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._totals.items())
+        return [
+            f"  {worker}: {int(count)} task(s) in {seconds:.2f}s"
+            for worker, (count, seconds) in items
+        ]
+
+
 def generate_file_descriptions(files: List[str]) -> List[str]:
     """Generate descriptive names for files in the big_picture compilation."""
     file_args: List[str] = []
@@ -414,133 +2034,610 @@ def generate_file_descriptions(files: List[str]) -> List[str]:
     return file_args
 
 
-def run_big_picture(
+OUTPUT_VARIANTS = ("plain", "logs")
+
+
+def _pr_diff_revisions(base_branch: str, branch_for_diff: str, merge_base: str | None) -> str:
+    if merge_base:
+        return f"{shlex.quote(merge_base)} {shlex.quote(branch_for_diff)}"
+    return f"{shlex.quote(base_branch)}...{shlex.quote(branch_for_diff)}"
+
+
+def path_matches(path: str, patterns: List[str]) -> bool:
+    """Return whether `path` matches any glob in `patterns`.
+
+    Patterns without a ``/`` match the file name in any directory, so
+    ``package-lock.json`` or ``*.min.js`` need no leading ``**/``.
+    """
+    name = path.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(path, pattern):
+            return True
+        if "/" not in pattern and fnmatch.fnmatchcase(name, pattern):
+            return True
+        if pattern.startswith("**/") and fnmatch.fnmatchcase(path, pattern[3:]):
+            return True
+    return False
+
+
+def filter_paths(
+    files: List[str], include: List[str] | None = None, exclude: List[str] | None = None
+) -> Tuple[List[str], List[str]]:
+    """Split `files` into (kept, excluded) by --include and --exclude globs."""
+    kept: List[str] = []
+    excluded: List[str] = []
+    for path in files:
+        if (include and not path_matches(path, include)) or (
+            exclude and path_matches(path, exclude)
+        ):
+            excluded.append(path)
+        else:
+            kept.append(path)
+    return kept, excluded
+
+
+class DiffByteCap:
+    """Text sink that caps every file of a streamed ``git diff`` at `max_bytes`.
+
+    Lines are passed through to `dest` until the current file's patch would
+    exceed the cap; the rest of that file is dropped up to the next
+    ``diff --git`` header and replaced by a single marker line.
+    """
+
+    def __init__(self, dest: IO[str], max_bytes: int) -> None:
+        self.dest = dest
+        self.max_bytes = max_bytes
+        self.truncated_files = 0
+        self._partial = ""
+        self._file_bytes = 0
+        self._omitted_lines = 0
+        self._omitted_bytes = 0
+
+    def write(self, text: str) -> int:
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line + "\n")
+        return len(text)
+
+    def _line(self, line: str) -> None:
+        if line.startswith("diff --git "):
+            self._write_marker()
+            self._file_bytes = 0
+        size = len(line.encode("utf-8"))
+        if not self._omitted_lines and (
+            self._file_bytes == 0 or self._file_bytes + size <= self.max_bytes
+        ):
+            self.dest.write(line)
+            self._file_bytes += size
+        else:
+            self._omitted_lines += 1
+            self._omitted_bytes += size
+
+    def _write_marker(self) -> None:
+        if not self._omitted_lines:
+            return
+        self.dest.write(
+            f"# ... diff truncated: {self._omitted_lines} more line(s), "
+            f"{self._omitted_bytes} byte(s) over the {self.max_bytes}-byte per-file limit\n"
+        )
+        self.truncated_files += 1
+        self._omitted_lines = 0
+        self._omitted_bytes = 0
+
+    def close(self) -> None:
+        if self._partial:
+            self._line(self._partial)
+            self._partial = ""
+        self._write_marker()
+
+
+def write_diffstat(outf: IO[str], revisions: str, files: List[str]) -> int:
+    """Write ``git diff --numstat --stat`` for `files` in place of their patches."""
+    files_arg = " ".join(shlex.quote(f) for f in files)
+    outf.write(f"# Diffstat only (--stat-only) for {len(files)} file(s):\n")
+    count = stream_command(f"git diff --numstat --stat {revisions} -- {files_arg}", outf)
+    outf.write("\n")
+    return count
+
+
+def stream_patches(
+    outf: IO[str], revisions: str, files: List[str], max_bytes_per_file: int = 0
+) -> int:
+    """Stream ``git diff`` patches for `files`, each capped at `max_bytes_per_file` if set.
+
+    An empty `files` list diffs the whole tree. Returns the number of
+    characters git produced, before any truncation.
+    """
+    cmd = f"git diff {revisions}"
+    if files:
+        cmd += " -- " + " ".join(shlex.quote(f) for f in files)
+    if not max_bytes_per_file:
+        return stream_command(cmd, outf)
+    capped = DiffByteCap(outf, max_bytes_per_file)
+    try:
+        return stream_command(cmd, capped)
+    finally:
+        capped.close()
+
+
+def _write_pr_header(
+    outf: IO[str],
+    pr_info: Dict[str, str],
+    files: List[str],
+    base_branch: str,
+    head_branch: str,
+    merge_base: str | None,
+    excluded_files: List[str] | None = None,
+) -> None:
+    summary_text = " ".join(pr_info.get("body", "").split()) or "(no summary provided)"
+    outf.write(f"# PR #{pr_info['number']}: {pr_info['title']}\n")
+    outf.write(f"# Branch: {head_branch}\n")
+    outf.write(f"# Base: {base_branch}\n")
+    if merge_base:
+        outf.write(f"# Merge base: {merge_base}\n")
+    outf.write(f"# Author: {pr_info.get('author', 'unknown')}\n")
+    outf.write(f"# Created: {pr_info.get('createdAt', '')}\n")
+    outf.write(f"# URL: {pr_info.get('url', '')}\n")
+    outf.write(f"# Summary: {summary_text}\n")
+    outf.write(f"# Changed files: {len(files)}\n")
+    if excluded_files:
+        outf.write(f"# Excluded by path filters: {', '.join(excluded_files)}\n")
+    outf.write(f"# Files: {', '.join(files)}\n\n")
+
+
+def _write_pr_checks(outf: IO[str], checks: List[Dict[str, str]], include_logs: bool) -> None:
+    outf.write("=" * 80 + "\n")
+    outf.write(f"Checks ({len(checks)}):\n")
+
+    if not checks:
+        outf.write("# No checks found\n")
+    else:
+        for check in checks:
+            name = check.get("name") or "unknown check"
+            status = check.get("status") or "unknown"
+            conclusion = check.get("conclusion") or "unknown"
+            details_url = check.get("detailsUrl") or ""
+            log_file = check.get("logFile") or ""
+            heading = f"- {name}: status={status}, conclusion={conclusion}"
+            if details_url:
+                heading += f" [{details_url}]"
+            outf.write(heading + "\n")
+
+            summary_text = check.get("summary") or check.get("title") or ""
+            if summary_text:
+                for line in summary_text.splitlines():
+                    outf.write(f"    {line}\n")
+            if include_logs and log_file:
+                outf.write("    Logs:\n")
+                with open(log_file, "r", encoding="utf-8", errors="replace") as log_input:
+                    write_indented(log_input, outf, "    ")
+
+    outf.write("\n")
+
+
+def _write_pr_comments(outf: IO[str], comments: List[Dict[str, str]]) -> None:
+    outf.write("=" * 80 + "\n")
+    outf.write(f"Comments ({len(comments)}):\n")
+
+    if not comments:
+        outf.write("# No comments found\n")
+    else:
+        for comment in comments:
+            timestamp = comment.get("createdAt") or "unknown time"
+            author = comment.get("author") or "unknown author"
+            comment_type = comment.get("type") or "comment"
+            url = comment.get("url") or ""
+            heading = f"- [{timestamp}] {author} ({comment_type})"
+            if url:
+                heading += f" [{url}]"
+            outf.write(heading + "\n")
+            body = comment.get("body") or ""
+            lines = body.splitlines() or ["(no content)"]
+            for line in lines:
+                outf.write(f"    {line}\n")
+            outf.write("\n")
+
+
+def render_pr_variants(
     pr_info: Dict[str, str],
     files: List[str],
     comments: List[Dict[str, str]],
-    checks: List[Dict[str, str]],
-    output_file: str,
-    include_logs: bool = False,
+    variants: List[Tuple[str, List[Dict[str, str]], bool]],
     base_branch: str = "main",
     local_branch: str | None = None,
+    merge_base: str | None = None,
+    excluded_files: List[str] | None = None,
+    stat_only: List[str] | None = None,
+    max_diff_bytes_per_file: int = 0,
 ) -> bool:
-    """Generate a git diff for the PR instead of full files."""
+    """Render one PR into several output variants from a single git diff.
+
+    Each variant is ``(output_file, checks, include_logs)``. The header and
+    diff are streamed into the first variant only; every other variant gets
+    that prefix by a kernel-level copy and then its own checks section. The
+    comments section is shared by all variants. Files matching a `stat_only`
+    glob get one diffstat block instead of patches, and each remaining patch
+    is truncated after `max_diff_bytes_per_file` bytes when that is set.
+    """
     branch_for_diff = local_branch or pr_info["branch"]
     print(f"Creating diff compilation for PR #{pr_info['number']}...")
 
     if not files:
         print(f"Warning: No files found for PR #{pr_info['number']}")
         return False
+    if not variants:
+        return False
 
-    files_arg = " ".join(shlex.quote(f) for f in files)
-    cmd = f"git diff {shlex.quote(base_branch)}...{shlex.quote(branch_for_diff)} -- {files_arg}"
-
-    diff_output = run_command(cmd)
-
-    summary_text = " ".join(pr_info.get("body", "").split()) or "(no summary provided)"
-
-    with open(output_file, "w", encoding="utf-8") as diff_file:
-        diff_file.write(f"# PR #{pr_info['number']}: {pr_info['title']}\n")
-        diff_file.write(f"# Branch: {branch_for_diff}\n")
-        diff_file.write(f"# Base: {base_branch}\n")
-        diff_file.write(f"# Author: {pr_info.get('author', 'unknown')}\n")
-        diff_file.write(f"# Created: {pr_info.get('createdAt', '')}\n")
-        diff_file.write(f"# URL: {pr_info.get('url', '')}\n")
-        diff_file.write(f"# Summary: {summary_text}\n")
-        diff_file.write(f"# Changed files: {len(files)}\n")
-        diff_file.write(f"# Files: {', '.join(files)}\n\n")
-        diff_file.write("=" * 80 + "\n")
-        diff_file.write(diff_output if diff_output else "# No differences found\n")
-        diff_file.write("\n\n")
-        diff_file.write("=" * 80 + "\n")
-        diff_file.write(f"Checks ({len(checks)}):\n")
-
-        if not checks:
-            diff_file.write("# No checks found\n")
-        else:
-            for check in checks:
-                name = check.get("name") or "unknown check"
-                status = check.get("status") or "unknown"
-                conclusion = check.get("conclusion") or "unknown"
-                details_url = check.get("detailsUrl") or ""
-                log_output = check.get("logOutput") or ""
-                heading = f"- {name}: status={status}, conclusion={conclusion}"
-                if details_url:
-                    heading += f" [{details_url}]"
-                diff_file.write(heading + "\n")
-
-                summary_text = check.get("summary") or check.get("title") or ""
-                if summary_text:
-                    for line in summary_text.splitlines():
-                        diff_file.write(f"    {line}\n")
-                if include_logs and log_output:
-                    diff_file.write("    Logs:\n")
-                    for line in log_output.splitlines():
-                        diff_file.write(f"    {line}\n")
-
-        diff_file.write("\n")
-        diff_file.write("=" * 80 + "\n")
-        diff_file.write(f"Comments ({len(comments)}):\n")
-
-        if not comments:
-            diff_file.write("# No comments found\n")
-        else:
-            for comment in comments:
-                timestamp = comment.get("createdAt") or "unknown time"
-                author = comment.get("author") or "unknown author"
-                comment_type = comment.get("type") or "comment"
-                url = comment.get("url") or ""
-                heading = f"- [{timestamp}] {author} ({comment_type})"
-                if url:
-                    heading += f" [{url}]"
-                diff_file.write(heading + "\n")
-                body = comment.get("body") or ""
-                lines = body.splitlines() or ["(no content)"]
-                for line in lines:
-                    diff_file.write(f"    {line}\n")
-                diff_file.write("\n")
-
-    print(f"✓ Created diff: {output_file}")
+    revisions = _pr_diff_revisions(base_branch, branch_for_diff, merge_base)
+    patch_files, stat_files = filter_paths(files, exclude=stat_only)
+    primary_path = variants[0][0]
+
+    number = pr_info["number"]
+    tail_offsets: List[Tuple[int, int, int]] = []
+    with open(primary_path, "w", encoding="utf-8") as primary_file:
+        _write_pr_header(
+            primary_file,
+            pr_info,
+            files,
+            base_branch,
+            # The diff may read a private ref; the header names the PR's own branch.
+            pr_info.get("branch") or branch_for_diff,
+            merge_base,
+            excluded_files,
+        )
+        primary_file.flush()
+        header_end = primary_file.tell()
+        primary_file.write("=" * 80 + "\n")
+        primary_file.flush()
+        stat_start = primary_file.tell()
+        diffed = write_diffstat(primary_file, revisions, stat_files) if stat_files else 0
+        primary_file.flush()
+        patches_start = primary_file.tell()
+        if patch_files:
+            diffed += stream_patches(
+                primary_file, revisions, patch_files, max_diff_bytes_per_file
+            )
+        if not diffed:
+            primary_file.write("# No differences found\n\n")
+        primary_file.flush()
+        diff_end = primary_file.tell()
+        primary_file.write("\n")
+        primary_file.flush()
+        shared_length = primary_file.tell()
+
+        outputs = [primary_file]
+        try:
+            for output_file, _, _ in variants[1:]:
+                outf = open(output_file, "w", encoding="utf-8")
+                outputs.append(outf)
+                copy_file_into(outf, primary_path, shared_length)
+            for outf, (_, checks, include_logs) in zip(outputs, variants):
+                outf.flush()
+                checks_start = outf.tell()
+                _write_pr_checks(outf, checks, include_logs)
+                outf.flush()
+                comments_start = outf.tell()
+                _write_pr_comments(outf, comments)
+                outf.flush()
+                tail_offsets.append((checks_start, comments_start, outf.tell()))
+        finally:
+            for outf in outputs[1:]:
+                outf.close()
+
+    shared_records = [section_record(number, None, "header", 0, header_end)]
+    if stat_files:
+        shared_records.append(section_record(number, None, "stat", stat_start, patches_start))
+    diff_sections = diff_file_sections(primary_path, patches_start, diff_end)
+    if diff_sections:
+        shared_records += [
+            section_record(number, path, "diff", start, end)
+            for path, start, end in diff_sections
+        ]
+    elif not stat_files:
+        shared_records.append(section_record(number, None, "diff", header_end, diff_end))
+
+    for (output_file, _, _), (checks_start, comments_start, end) in zip(variants, tail_offsets):
+        write_section_index(
+            output_file,
+            shared_records
+            + [
+                section_record(number, None, "checks", checks_start, comments_start),
+                section_record(number, None, "comments", comments_start, end),
+            ],
+        )
+        print(f"✓ Created diff: {output_file}")
     return True
 
 
-def create_master_comparison(
-    pr_files: List[Tuple[Dict[str, str], str]],
-    selection_requested: str,
-    selection_canonical: str,
-    selected_prs: List[int],
+def run_big_picture(
+    pr_info: Dict[str, str],
+    files: List[str],
+    comments: List[Dict[str, str]],
+    checks: List[Dict[str, str]],
     output_file: str,
     include_logs: bool = False,
-) -> bool:
-    """Create a master comparison file combining all individual PR diff files."""
+    base_branch: str = "main",
+    local_branch: str | None = None,
+    merge_base: str | None = None,
+    stat_only: List[str] | None = None,
+    max_diff_bytes_per_file: int = 0,
+) -> bool:
+    """Generate a git diff for the PR instead of full files.
+
+    When `merge_base` is given the diff runs from it directly, which is what
+    ``base...branch`` resolves to, without recomputing it for every call.
+    """
+    return render_pr_variants(
+        pr_info,
+        files,
+        comments,
+        [(output_file, checks, include_logs)],
+        base_branch=base_branch,
+        local_branch=local_branch,
+        merge_base=merge_base,
+        stat_only=stat_only,
+        max_diff_bytes_per_file=max_diff_bytes_per_file,
+    )
+
+
+MASTER_APPENDIX_HEADER = (
+    "=" * 80 + "\n" + "# Appended master comparison (diffs and summaries)\n\n"
+)
+
+
+def copy_file_into(
+    dest: IO[str], source_path: str, length: int | None = None, offset: int = 0
+) -> int:
+    """Append a file's bytes to an open text output without loading it into Python.
+
+    The text layer is flushed first, then the bytes are copied fd-to-fd with
+    os.sendfile, falling back to chunked reads where sendfile is not
+    available. Copying starts at byte `offset` and stops after `length`
+    bytes when it is given. Returns the number of bytes copied.
+    """
+    dest.flush()
+    with open(source_path, "rb") as source:
+        size = max(os.fstat(source.fileno()).st_size - offset, 0)
+        if length is not None:
+            size = min(size, length)
+        sent = 0
+        if hasattr(os, "sendfile"):
+            try:
+                while sent < size:
+                    count = os.sendfile(
+                        dest.fileno(), source.fileno(), offset + sent, size - sent
+                    )
+                    if count == 0:
+                        break
+                    sent += count
+            except OSError:
+                pass
+        source.seek(offset + sent)
+        while sent < size:
+            chunk = source.read(min(STREAM_CHUNK_SIZE, size - sent))
+            if not chunk:
+                break
+            dest.buffer.write(chunk)
+            sent += len(chunk)
+        dest.buffer.flush()
+    return sent
+
+
+INDEX_SUFFIX = ".index.jsonl"
+DIFF_FILE_MARKER = b"diff --git "
+
+
+def section_index_path(output_file: str) -> str:
+    """Return the JSONL index path that sits next to `output_file`."""
+    return os.path.splitext(output_file)[0] + INDEX_SUFFIX
+
+
+def section_record(
+    pr_number: int | None, path: str | None, section: str, offset: int, end: int
+) -> Dict[str, object]:
+    """Build one index record for the bytes ``[offset, end)`` of an output file."""
+    return {
+        "pr": pr_number,
+        "path": path,
+        "section": section,
+        "offset": offset,
+        "length": end - offset,
+    }
+
+
+def write_section_index(
+    output_file: str, records: List[Dict[str, object]], append: bool = False
+) -> None:
+    """Write `records` to the sidecar index of `output_file`, one JSON object per line."""
+    with open(section_index_path(output_file), "a" if append else "w", encoding="utf-8") as idx:
+        for record in records:
+            idx.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def load_section_index(output_file: str) -> List[Dict[str, object]]:
+    """Read the sidecar index of `output_file`; an absent index yields no records."""
+    try:
+        with open(section_index_path(output_file), "r", encoding="utf-8") as idx:
+            return [json.loads(line) for line in idx if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def shift_section_records(
+    records: List[Dict[str, object]], delta: int
+) -> List[Dict[str, object]]:
+    """Return copies of `records` with their offsets moved by `delta` bytes."""
+    return [dict(record, offset=record["offset"] + delta) for record in records]
+
+
+def _diff_path(header: bytes) -> str | None:
+    """Extract the file path from a ``diff --git a/X b/X`` line."""
+    rest = header[len(DIFF_FILE_MARKER):].decode("utf-8", "replace")
+    if rest.startswith("a/") and len(rest) % 2 == 1:
+        path = rest[2:(len(rest) - 1) // 2]
+        if rest[(len(rest) - 1) // 2:] == f" b/{path}":
+            return path
+    return rest or None
+
+
+def diff_file_sections(
+    output_file: str, start: int, end: int
+) -> List[Tuple[str | None, int, int]]:
+    """Locate per-file diffs in bytes ``[start, end)`` of `output_file`.
+
+    Returns ``(path, offset, end)`` for each ``diff --git`` block, found with
+    mmap so the diff is never read into Python as a whole.
+    """
+    if end <= start:
+        return []
+    with open(output_file, "rb") as handle, \
+            mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        positions: List[int] = []
+        pos = view.find(DIFF_FILE_MARKER, start, end)
+        while pos != -1:
+            if pos == start or view[pos - 1:pos] == b"\n":
+                positions.append(pos)
+            pos = view.find(DIFF_FILE_MARKER, pos + 1, end)
+        sections: List[Tuple[str | None, int, int]] = []
+        for idx, pos in enumerate(positions):
+            line_end = view.find(b"\n", pos, end)
+            header = view[pos:line_end if line_end != -1 else end]
+            section_end = positions[idx + 1] if idx + 1 < len(positions) else end
+            sections.append((_diff_path(header), pos, section_end))
+    return sections
+
+
+class CompilationReader:
+    """Random access to the sections of an output file through its JSONL index.
+
+    The output is memory-mapped, so reading one PR's checks or one file's
+    diff touches only those bytes::
+
+        with CompilationReader("pr-comparison-1-4.txt") as reader:
+            for record in reader.find(pr=12, section="diff"):
+                print(record["path"], reader.read(record))
+    """
+
+    def __init__(self, output_file: str) -> None:
+        self.output_file = output_file
+        self.records = load_section_index(output_file)
+        self._handle = open(output_file, "rb")
+        try:
+            self._view: mmap.mmap | None = mmap.mmap(
+                self._handle.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        except ValueError:
+            self._view = None  # empty file
+
+    def __enter__(self) -> "CompilationReader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def find(
+        self,
+        pr: int | None = None,
+        path: str | None = None,
+        section: str | None = None,
+    ) -> List[Dict[str, object]]:
+        """Return the index records matching every given field."""
+        return [
+            record
+            for record in self.records
+            if (pr is None or record["pr"] == pr)
+            and (path is None or record["path"] == path)
+            and (section is None or record["section"] == section)
+        ]
+
+    def read_bytes(self, record: Dict[str, object]) -> bytes:
+        if self._view is None:
+            return b""
+        offset = int(record["offset"])
+        return self._view[offset:offset + int(record["length"])]
+
+    def read(self, record: Dict[str, object]) -> str:
+        return self.read_bytes(record).decode("utf-8", "replace")
+
+    def close(self) -> None:
+        if self._view is not None:
+            self._view.close()
+            self._view = None
+        self._handle.close()
+
+
+def create_master_comparison(
+    pr_files: List[Tuple[Dict[str, str], str]],
+    selection_requested: str,
+    selection_canonical: str,
+    selected_prs: List[int],
+    output_file: str,
+    include_logs: bool = False,
+    mirror_outputs: List[str] | None = None,
+) -> bool:
+    """Create a master comparison file combining all individual PR diff files.
+
+    Files listed in `mirror_outputs` (such as a touched-files compilation)
+    get the same content appended in the same pass, after
+    MASTER_APPENDIX_HEADER, so the master file never has to be read back.
+    Each PR's section index is carried over, shifted to where the PR lands,
+    into the index of the master file and appended to each mirror's index.
+    """
     print("Creating master comparison file...")
 
     if not pr_files:
         print("Warning: No individual PR files found for master comparison")
         return False
 
-    with open(output_file, "w", encoding="utf-8") as outf:
+    outputs = [open(output_file, "w", encoding="utf-8")]
+    output_records: List[List[Dict[str, object]]] = [[]]
+    try:
+        for mirror in mirror_outputs or []:
+            mirror_file = open(mirror, "a", encoding="utf-8")
+            outputs.append(mirror_file)
+            output_records.append([])
+            mirror_file.write(MASTER_APPENDIX_HEADER)
+
+        def write(text: str) -> None:
+            for outf in outputs:
+                outf.write(text)
+
         log_note = " (with logs)" if include_logs else ""
-        outf.write(f"# Master Comparison{log_note}\n")
+        write(f"# Master Comparison{log_note}\n")
         for line in selection_header_lines(
             selection_requested, selection_canonical, selected_prs
         ):
-            outf.write(f"{line}\n")
-        outf.write(f"# Total PRs: {len(pr_files)}\n")
-        outf.write(f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        outf.write("=" * 80 + "\n\n")
+            write(f"{line}\n")
+        write(f"# Total PRs: {len(pr_files)}\n")
+        write(f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        write("=" * 80 + "\n\n")
 
         for idx, (pr_info, pr_file) in enumerate(pr_files, 1):
-            outf.write("\n" + "=" * 80 + "\n")
-            outf.write(f"# PR {idx}/{len(pr_files)} - #{pr_info['number']}: {pr_info['title']}\n")
-            outf.write("=" * 80 + "\n\n")
-
-            with open(pr_file, "r", encoding="utf-8") as inf:
-                outf.write(inf.read())
+            write("\n" + "=" * 80 + "\n")
+            write(f"# PR {idx}/{len(pr_files)} - #{pr_info['number']}: {pr_info['title']}\n")
+            write("=" * 80 + "\n\n")
+
+            pr_records = load_section_index(pr_file)
+            for outf, records in zip(outputs, output_records):
+                outf.flush()
+                start = outf.tell()
+                end = start + copy_file_into(outf, pr_file)
+                records.append(section_record(pr_info["number"], None, "pr", start, end))
+                records.extend(shift_section_records(pr_records, start))
+
+            write("\n\n")
+    finally:
+        for outf in outputs:
+            outf.close()
 
-            outf.write("\n\n")
+    write_section_index(output_file, output_records[0])
+    for mirror, records in zip(mirror_outputs or [], output_records[1:]):
+        write_section_index(mirror, records, append=True)
 
     print(f"✓ Created master comparison: {output_file}")
+    for mirror in mirror_outputs or []:
+        print(f"✓ Appended master comparison to {mirror}")
     return True
 
 
@@ -553,8 +2650,18 @@ def create_touched_files_compilation(
     output_file: str,
     master_comparison_file: str | None = None,
     include_logs: bool = False,
+    extra_outputs: List[Tuple[str, bool]] | None = None,
+    max_file_bytes: int | None = DEFAULT_MAX_BLOB_BYTES,
 ) -> bool:
-    """Create a compilation of unique touched files from the base branch."""
+    """Create a compilation of unique touched files from the base branch.
+
+    `extra_outputs` lists further ``(output_file, include_logs)`` variants.
+    They get their own header, and the file section is copied from the first
+    output instead of being read from git again. File contents are streamed
+    through a single `GitBlobReader`; binary files and files larger than
+    `max_file_bytes` are skipped. Every output gets a section index with one
+    ``file`` record per included file.
+    """
     print("Creating touched files compilation...")
 
     if not touched_files:
@@ -562,9 +2669,10 @@ def create_touched_files_compilation(
         return False
 
     sorted_files = sorted(touched_files)
+    generated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    with open(output_file, "w", encoding="utf-8") as outf:
-        log_note = " (with logs)" if include_logs else ""
+    def write_header(outf: IO[str], with_logs: bool) -> None:
+        log_note = " (with logs)" if with_logs else ""
         outf.write(f"# Touched Files{log_note} (base branch)\n")
         for line in selection_header_lines(
             selection_requested, selection_canonical, selected_prs
@@ -572,35 +2680,68 @@ def create_touched_files_compilation(
             outf.write(f"{line}\n")
         outf.write(f"# Total unique files: {len(sorted_files)}\n")
         outf.write(f"# Source branch: {base_branch}\n")
-        outf.write(f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        outf.write(f"# Generated: {generated}\n")
         outf.write("=" * 80 + "\n\n")
 
-        for file_path in sorted_files:
-            ref_path = f"{base_branch}:{file_path}"
-            try:
-                file_contents = run_command(f"git show {shlex.quote(ref_path)}")
-            except subprocess.CalledProcessError:
-                print(
-                    f"Skipping {file_path} because it does not exist on {base_branch}"
+    with open(output_file, "w", encoding="utf-8") as outf:
+        write_header(outf, include_logs)
+        outf.flush()
+        section_start = outf.tell()
+
+        file_records: List[Dict[str, object]] = []
+        with GitBlobReader() as reader:
+            for file_path in sorted_files:
+                outf.flush()
+                file_start = outf.tell()
+                header = (
+                    "=" * 80 + "\n"
+                    f"# File: {file_path}\n"
+                    f"# Source: {base_branch}\n\n"
+                )
+                status, size = reader.stream_blob(
+                    f"{base_branch}:{file_path}", outf, max_file_bytes, header
+                )
+                if status == "missing":
+                    print(
+                        f"Skipping {file_path} because it does not exist on {base_branch}"
+                    )
+                    continue
+                if status != "ok":
+                    reason = "binary" if status == "binary" else "larger than the size limit"
+                    print(f"Skipping {file_path} ({size} bytes) because it is {reason}")
+                    continue
+                outf.write("\n\n")
+                outf.flush()
+                file_records.append(
+                    section_record(None, file_path, "file", file_start, outf.tell())
                 )
-                continue
 
-            outf.write("=" * 80 + "\n")
-            outf.write(f"# File: {file_path}\n")
-            outf.write(f"# Source: {base_branch}\n\n")
-            outf.write(file_contents)
-            if not file_contents.endswith("\n"):
-                outf.write("\n")
-            outf.write("\n\n")
+        outf.flush()
+        section_end = outf.tell()
+
+        for extra_output, extra_include_logs in extra_outputs or []:
+            with open(extra_output, "w", encoding="utf-8") as extra_file:
+                write_header(extra_file, extra_include_logs)
+                extra_file.flush()
+                extra_start = extra_file.tell()
+                copy_file_into(
+                    extra_file, output_file, section_end - section_start, section_start
+                )
+            write_section_index(
+                extra_output, shift_section_records(file_records, extra_start - section_start)
+            )
+            print(f"✓ Created touched files compilation: {extra_output}")
 
         if master_comparison_file and os.path.exists(master_comparison_file):
-            outf.write("=" * 80 + "\n")
-            outf.write(
-                "# Appended master comparison (diffs and summaries)\n\n"
+            outf.write(MASTER_APPENDIX_HEADER)
+            outf.flush()
+            appendix_start = outf.tell()
+            copy_file_into(outf, master_comparison_file)
+            file_records += shift_section_records(
+                load_section_index(master_comparison_file), appendix_start
             )
-            with open(master_comparison_file, "r", encoding="utf-8") as master_file:
-                outf.write(master_file.read())
 
+    write_section_index(output_file, file_records)
     print(f"✓ Created touched files compilation: {output_file}")
     return True
 
@@ -646,23 +2787,295 @@ def create_summary_compilation(
     return True
 
 
+CHUNK_TOP_SECTIONS = ("pr", "file")
+CHUNK_HEADER_RESERVE_TOKENS = 200
+MIN_CHUNK_TOKENS = 1000
+CHUNK_HEADER_MAX_LABELS = 20
+_TOKEN_PIECE = re.compile(rb"\w{1,4}|[^\w\s]")
+
+
+def estimate_tokens(data: bytes) -> int:
+    """Estimate LLM tokens as punctuation marks plus word pieces of up to four characters."""
+    return len(_TOKEN_PIECE.findall(data))
+
+
+def _split_lines(
+    view: mmap.mmap, start: int, end: int, budget: int
+) -> List[Tuple[int, int, int]]:
+    """Split bytes ``[start, end)`` into runs of whole lines of at most `budget` tokens.
+
+    A single line over budget is cut at a UTF-8 character boundary.
+    """
+    pieces: List[Tuple[int, int, int]] = []
+    run_start, run_tokens = start, 0
+    pos = start
+    while pos < end:
+        newline = view.find(b"\n", pos, end)
+        line_end = end if newline == -1 else newline + 1
+        tokens = estimate_tokens(view[pos:line_end])
+        if run_tokens and run_tokens + tokens > budget:
+            pieces.append((run_start, pos, run_tokens))
+            run_start, run_tokens = pos, 0
+        if tokens > budget:
+            # Every token spans at least one byte, so `budget` bytes never overflow.
+            cut = pos
+            while line_end - cut > budget:
+                step = cut + budget
+                while step > cut + 1 and view[step] & 0xC0 == 0x80:
+                    step -= 1
+                pieces.append((cut, step, estimate_tokens(view[cut:step])))
+                cut = step
+            run_start, run_tokens = cut, estimate_tokens(view[cut:line_end])
+        else:
+            run_tokens += tokens
+        pos = line_end
+    if run_start < end:
+        pieces.append((run_start, end, run_tokens))
+    return pieces
+
+
+def plan_chunks(output_file: str, max_tokens: int) -> List[Dict[str, object]]:
+    """Plan contiguous chunks of `output_file` of at most `max_tokens` estimated tokens.
+
+    Cuts fall between the top-level sections of the section index (whole
+    PRs or touched files) where possible, then between nested sections such
+    as per-file diffs, and only then between lines. Returns one dict per
+    chunk with its byte range, token estimate and section labels; labels of
+    sections split across chunks are marked as partial.
+    """
+    size = os.path.getsize(output_file)
+    if not size:
+        return []
+    records = load_section_index(output_file)
+    top = sorted(
+        (int(r["offset"]), int(r["offset"]) + int(r["length"]), r)
+        for r in records
+        if r["section"] in CHUNK_TOP_SECTIONS
+    )
+    # Each top-level unit ends where its section ends, so separators and
+    # banners between sections travel with the section that follows them.
+    cuts = sorted({0, size} | {end for _, end, _ in top if 0 < end < size})
+    inner_records = [r for r in records if r["section"] not in CHUNK_TOP_SECTIONS]
+    nested = sorted(
+        {int(r["offset"]) for r in inner_records}
+        | {int(r["offset"]) + int(r["length"]) for r in inner_records}
+    )
+
+    def label(record: Dict[str, object]) -> str:
+        return f"PR #{record['pr']}" if record["section"] == "pr" else str(record["path"])
+
+    pieces: List[Tuple[int, int, int, List[str]]] = []
+    with open(output_file, "rb") as handle, \
+            mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        for unit_start, unit_end in zip(cuts, cuts[1:]):
+            labels = [label(r) for start, end, r in top if unit_start <= start < unit_end]
+            tokens = estimate_tokens(view[unit_start:unit_end])
+            if tokens <= max_tokens:
+                pieces.append((unit_start, unit_end, tokens, labels))
+                continue
+            inner = [unit_start] + [c for c in nested if unit_start < c < unit_end] + [unit_end]
+            for part_start, part_end in zip(inner, inner[1:]):
+                part_tokens = estimate_tokens(view[part_start:part_end])
+                if part_tokens <= max_tokens:
+                    parts = [(part_start, part_end, part_tokens)]
+                else:
+                    parts = _split_lines(view, part_start, part_end, max_tokens)
+                pieces.extend((start, end, count, labels) for start, end, count in parts)
+
+    chunks: List[Dict[str, object]] = []
+    for start, end, tokens, labels in pieces:
+        if chunks and chunks[-1]["tokens"] + tokens <= max_tokens:
+            chunk = chunks[-1]
+            chunk["end"] = end
+            chunk["tokens"] += tokens
+        else:
+            chunk = {"start": start, "end": end, "tokens": tokens, "labels": []}
+            chunks.append(chunk)
+        for name in labels:
+            if name not in chunk["labels"]:
+                chunk["labels"].append(name)
+    placed = [list(chunk["labels"]) for chunk in chunks]
+    for idx, chunk in enumerate(chunks):
+        neighbours = placed[max(idx - 1, 0):idx + 2]
+        chunk["labels"] = [
+            f"{name} (partial)" if sum(name in other for other in neighbours) > 1 else name
+            for name in chunk["labels"]
+        ]
+    return chunks
+
+
+def chunk_output_dir(output_file: str) -> str:
+    """Return the directory holding the chunks of `output_file`."""
+    return os.path.splitext(output_file)[0] + "-chunks"
+
+
+def write_compilation_chunks(output_file: str, max_tokens: int) -> List[str]:
+    """Split a compilation into numbered chunk files, each with a short index header.
+
+    Chunks are copied byte-for-byte from `output_file`, so concatenating
+    them without their headers reproduces it. Chunks from an earlier run
+    are removed first.
+    """
+    chunk_dir = chunk_output_dir(output_file)
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    chunks = plan_chunks(output_file, max(max_tokens - CHUNK_HEADER_RESERVE_TOKENS, 1))
+    if not chunks:
+        return []
+    os.makedirs(chunk_dir)
+    name = os.path.basename(output_file)
+    stem = os.path.splitext(name)[0]
+    paths: List[str] = []
+    for idx, chunk in enumerate(chunks, 1):
+        labels = chunk["labels"]
+        listed = ", ".join(labels[:CHUNK_HEADER_MAX_LABELS]) or "(preamble only)"
+        if len(labels) > CHUNK_HEADER_MAX_LABELS:
+            listed += f" and {len(labels) - CHUNK_HEADER_MAX_LABELS} more"
+        path = os.path.join(chunk_dir, f"{stem}-chunk-{idx:03d}-of-{len(chunks):03d}.txt")
+        with open(path, "w", encoding="utf-8") as outf:
+            outf.write(f"# Chunk {idx}/{len(chunks)} of {name}\n")
+            outf.write(
+                f"# Bytes {chunk['start']}-{chunk['end']} of {os.path.getsize(output_file)}; "
+                f"~{chunk['tokens']} estimated tokens (budget {max_tokens})\n"
+            )
+            outf.write(f"# Sections: {listed}\n")
+            outf.write("=" * 80 + "\n")
+            copy_file_into(outf, output_file, chunk["end"] - chunk["start"], chunk["start"])
+        paths.append(path)
+    return paths
+
+
+ROUND_ROBIN_MODES = ("all", "overlapping", "conflicting", "top", "pairs", "none")
+
+
+def parse_pr_pairs(text: str) -> List[Tuple[int, int]]:
+    """Parse an explicit pair list like '12:15,12:18' into sorted PR number pairs."""
+    pairs: List[Tuple[int, int]] = []
+    for segment in text.split(","):
+        parts = segment.strip().split(":")
+        if len(parts) != 2:
+            raise SelectionParseError(
+                f"Invalid PR pair '{segment.strip()}' in '{text}'. "
+                "Expected format like '12:15,12:18'."
+            )
+        left = _parse_pr_token(parts[0], text)
+        right = _parse_pr_token(parts[1], text)
+        if left == right:
+            raise SelectionParseError(
+                f"Invalid PR pair '{segment.strip()}' in '{text}': a PR cannot be paired "
+                "with itself."
+            )
+        pair = (min(left, right), max(left, right))
+        if pair not in pairs:
+            pairs.append(pair)
+    return pairs
+
+
+def build_file_overlap_index(processed_prs: List[Dict[str, object]]) -> Dict[str, List[int]]:
+    """Map every touched file path to the sorted PR numbers that touch it."""
+    index: Dict[str, Set[int]] = {}
+    for entry in processed_prs:
+        number = entry["info"]["number"]
+        for file_path in entry["files"]:
+            index.setdefault(file_path, set()).add(number)
+    return {file_path: sorted(numbers) for file_path, numbers in index.items()}
+
+
+def count_pair_overlaps(overlap_index: Dict[str, List[int]]) -> Dict[Tuple[int, int], int]:
+    """Count shared files for every PR pair that shares at least one file."""
+    counts: Dict[Tuple[int, int], int] = {}
+    for numbers in overlap_index.values():
+        for pair in combinations(numbers, 2):
+            counts[pair] = counts.get(pair, 0) + 1
+    return counts
+
+
+def select_round_robin_pairs(
+    processed_prs: List[Dict[str, object]],
+    mode: str = "all",
+    top_k: int = 3,
+    explicit_pairs: List[Tuple[int, int]] | None = None,
+    conflict_pairs: List[Tuple[int, int]] | None = None,
+) -> List[Tuple[int, int]]:
+    """Choose which PR pairs get a round-robin comparison.
+
+    ``all`` keeps every combination, ``overlapping`` keeps pairs that share at
+    least one file, ``conflicting`` keeps `conflict_pairs` (pairs whose hunks
+    overlap, see find_hunk_overlaps), ``top`` keeps each PR's `top_k`
+    most-overlapping partners, ``pairs`` keeps `explicit_pairs` and ``none``
+    disables comparisons.
+    """
+    numbers = sorted(entry["info"]["number"] for entry in processed_prs)
+    if mode == "all":
+        return list(combinations(numbers, 2))
+    if mode == "none":
+        return []
+    if mode == "conflicting":
+        return sorted(conflict_pairs or [])
+    if mode == "pairs":
+        available = set(numbers)
+        selected: List[Tuple[int, int]] = []
+        for pair in explicit_pairs or []:
+            if pair[0] in available and pair[1] in available:
+                selected.append(pair)
+            else:
+                print(f"Skipping pair {pair[0]}:{pair[1]} because a PR was not processed")
+        return sorted(selected)
+
+    overlaps = count_pair_overlaps(build_file_overlap_index(processed_prs))
+    if mode == "overlapping":
+        return sorted(overlaps)
+    if mode == "top":
+        partners: Dict[int, List[Tuple[int, int]]] = {}
+        for (left, right), count in overlaps.items():
+            partners.setdefault(left, []).append((-count, right))
+            partners.setdefault(right, []).append((-count, left))
+        chosen: Set[Tuple[int, int]] = set()
+        for number, candidates in partners.items():
+            for _, partner in sorted(candidates)[:top_k]:
+                chosen.add((min(number, partner), max(number, partner)))
+        return sorted(chosen)
+    raise ValueError(f"Unknown round-robin mode '{mode}'")
+
+
+def round_robin_output_path(output_dir: str, left_number: int, right_number: int) -> str:
+    """Return the comparison file path for a PR pair."""
+    return os.path.join(output_dir, f"pr-{left_number}-versus-{right_number}.txt")
+
+
 def create_round_robin_comparisons(
     processed_prs: List[Dict[str, object]],
     output_dir: str,
     selection_requested: str,
     selection_canonical: str,
     selected_prs: List[int],
+    pairs: List[Tuple[int, int]] | None = None,
+    jobs: int = 1,
+    stat_only: List[str] | None = None,
+    max_diff_bytes_per_file: int = 0,
 ) -> List[str]:
-    """Create pairwise comparison files for every PR combination."""
+    """Create pairwise comparison files for the given PR pairs.
+
+    `pairs` holds PR numbers (see select_round_robin_pairs) and defaults to
+    every combination. Pair diffs run on up to `jobs` threads. `stat_only`
+    and `max_diff_bytes_per_file` shape the diff as in render_pr_variants.
+    """
     print("Creating round-robin comparisons...")
 
     if len(processed_prs) < 2:
         print("Warning: Not enough PRs for round-robin comparisons")
         return []
 
-    output_files: List[str] = []
+    by_number = {entry["info"]["number"]: entry for entry in processed_prs}
+    if pairs is None:
+        pairs = list(combinations(sorted(by_number), 2))
+    print(
+        f"Comparing {len(pairs)} of "
+        f"{len(by_number) * (len(by_number) - 1) // 2} possible PR pair(s)"
+    )
 
-    for left, right in combinations(processed_prs, 2):
+    def write_pair(pair: Tuple[int, int]) -> str | None:
+        left = by_number[pair[0]]
+        right = by_number[pair[1]]
         left_info = left["info"]
         right_info = right["info"]
         left_branch = left["local_branch"]
@@ -671,30 +3084,22 @@ def create_round_robin_comparisons(
         right_files = right["files"]
 
         if not isinstance(left_info, dict) or not isinstance(right_info, dict):
-            continue
+            return None
         if not isinstance(left_branch, str) or not isinstance(right_branch, str):
-            continue
+            return None
         if not isinstance(left_files, list) or not isinstance(right_files, list):
-            continue
+            return None
 
         left_number = left_info.get("number")
         right_number = right_info.get("number")
         if left_number is None or right_number is None:
-            continue
+            return None
 
-        output_file = os.path.join(
-            output_dir, f"pr-{left_number}-versus-{right_number}.txt"
-        )
+        output_file = round_robin_output_path(output_dir, left_number, right_number)
 
         combined_files = sorted(set(left_files) | set(right_files))
-        files_arg = " ".join(shlex.quote(f) for f in combined_files)
-        diff_cmd = (
-            f"git diff {shlex.quote(left_branch)} {shlex.quote(right_branch)}"
-        )
-        if files_arg:
-            diff_cmd += f" -- {files_arg}"
-
-        diff_output = run_command(diff_cmd)
+        revisions = f"{shlex.quote(left_branch)} {shlex.quote(right_branch)}"
+        patch_files, stat_files = filter_paths(combined_files, exclude=stat_only)
 
         left_summary = " ".join(left_info.get("body", "").split()) or "(no summary provided)"
         right_summary = " ".join(right_info.get("body", "").split()) or "(no summary provided)"
@@ -711,6 +3116,9 @@ def create_round_robin_comparisons(
             outf.write(f"# Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             outf.write(f"# Left branch: {left_branch}\n")
             outf.write(f"# Right branch: {right_branch}\n")
+            if left.get("merge_base") or right.get("merge_base"):
+                outf.write(f"# Left merge base: {left.get('merge_base') or 'unknown'}\n")
+                outf.write(f"# Right merge base: {right.get('merge_base') or 'unknown'}\n")
             outf.write(f"# Left author: {left_info.get('author', 'unknown')}\n")
             outf.write(f"# Right author: {right_info.get('author', 'unknown')}\n")
             outf.write(f"# Left URL: {left_info.get('url', '')}\n")
@@ -720,10 +3128,20 @@ def create_round_robin_comparisons(
             outf.write(f"# Files compared: {len(combined_files)}\n")
             outf.write(f"# Files: {', '.join(combined_files)}\n\n")
             outf.write("=" * 80 + "\n")
-            outf.write(diff_output if diff_output else "# No differences found\n")
-            outf.write("\n\n")
+            diffed = write_diffstat(outf, revisions, stat_files) if stat_files else 0
+            if patch_files or not combined_files:
+                diffed += stream_patches(outf, revisions, patch_files, max_diff_bytes_per_file)
+            if not diffed:
+                outf.write("# No differences found\n\n")
+            outf.write("\n")
 
-        output_files.append(output_file)
+        return output_file
+
+    output_files = [
+        output_file
+        for output_file in run_parallel(write_pair, pairs, jobs)
+        if output_file is not None
+    ]
 
     print(
         f"✓ Created {len(output_files)} round-robin comparison file(s) "
@@ -732,7 +3150,1124 @@ def create_round_robin_comparisons(
     return output_files
 
 
-def main() -> None:
+SIMILARITY_SHINGLE_TOKENS = 5
+DEFAULT_SIMILARITY_PERMUTATIONS = 128
+DEFAULT_SIMILARITY_THRESHOLD = 0.5
+MINHASH_PRIME = (1 << 31) - 1
+MINHASH_SEED = 1
+_DIFF_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def diff_shingles(diff_text: str, size: int = SIMILARITY_SHINGLE_TOKENS) -> Set[int]:
+    """Hash every run of `size` tokens on the lines a unified diff adds or removes.
+
+    Each changed line contributes its ``+``/``-`` sign as a token, so adding a
+    line and removing it do not look alike. File headers and hunk markers
+    are ignored, which keeps renames and line shifts from affecting the set.
+    """
+    tokens: List[str] = []
+    for line in diff_text.splitlines():
+        if line[:1] in ("+", "-") and not line.startswith(("+++ ", "--- ")):
+            tokens.append(line[0])
+            tokens.extend(_DIFF_TOKEN.findall(line[1:]))
+    if not tokens:
+        return set()
+    return {
+        zlib.crc32("\x1f".join(tokens[start:start + size]).encode("utf-8"))
+        for start in range(max(len(tokens) - size + 1, 1))
+    }
+
+
+def pr_diff_shingles(output_file: str) -> Set[int]:
+    """Shingle the diff sections of a rendered PR file, located via its section index."""
+    shingles: Set[int] = set()
+    with CompilationReader(output_file) as reader:
+        for record in reader.find(section="diff"):
+            shingles |= diff_shingles(reader.read(record))
+    return shingles
+
+
+def _minhash_coefficients(permutations: int) -> Tuple[List[int], List[int]]:
+    rng = random.Random(MINHASH_SEED)
+    scales = [rng.randrange(1, MINHASH_PRIME) for _ in range(permutations)]
+    offsets = [rng.randrange(0, MINHASH_PRIME) for _ in range(permutations)]
+    return scales, offsets
+
+
+def minhash_signatures(
+    shingle_sets: List[Set[int]], permutations: int = DEFAULT_SIMILARITY_PERMUTATIONS
+) -> List[List[int]]:
+    """Return one MinHash signature of `permutations` values per shingle set.
+
+    Each permutation is ``(a * x + b) mod p`` with p = 2**31 - 1, so every
+    product fits in 64 bits and NumPy and the pure-Python fallback agree
+    exactly. Empty sets get the sentinel p in every slot.
+    """
+    scales, offsets = _minhash_coefficients(permutations)
+    if np is None:
+        return [
+            [
+                min(((a * x + b) % MINHASH_PRIME for x in shingles), default=MINHASH_PRIME)
+                for a, b in zip(scales, offsets)
+            ]
+            for shingles in shingle_sets
+        ]
+    a = np.array(scales, dtype=np.uint64)[:, None]
+    b = np.array(offsets, dtype=np.uint64)[:, None]
+    signatures = np.full((len(shingle_sets), permutations), MINHASH_PRIME, dtype=np.uint64)
+    # Bound the (permutations x chunk) intermediate for very large diffs.
+    chunk = max(1, (1 << 22) // permutations)
+    for row, shingles in enumerate(shingle_sets):
+        values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles)) % MINHASH_PRIME
+        for start in range(0, len(values), chunk):
+            hashed = (a * values[None, start:start + chunk] + b) % MINHASH_PRIME
+            np.minimum(signatures[row], hashed.min(axis=1), out=signatures[row])
+    return signatures.tolist()
+
+
+def estimate_jaccard_matrix(signatures: List[List[int]]) -> List[List[float]]:
+    """Estimate pairwise Jaccard similarity as the share of equal signature slots.
+
+    PRs without any changed lines (all-sentinel signatures) are similar only
+    to themselves.
+    """
+    count = len(signatures)
+    empty = [all(value == MINHASH_PRIME for value in row) for row in signatures]
+    if np is None:
+        width = len(signatures[0]) if signatures else 1
+        matrix = [
+            [sum(map(int.__eq__, left, right)) / width for right in signatures]
+            for left in signatures
+        ]
+    else:
+        sig = np.array(signatures, dtype=np.uint64).reshape(count, -1)
+        result = np.empty((count, count), dtype=np.float64)
+        # Compare a block of rows against all rows at a time to bound memory.
+        block = max(1, (1 << 24) // max(count * sig.shape[1], 1))
+        for start in range(0, count, block):
+            rows = sig[start:start + block]
+            result[start:start + len(rows)] = (rows[:, None, :] == sig[None, :, :]).mean(axis=2)
+        matrix = result.tolist()
+    for idx in range(count):
+        if empty[idx]:
+            for other in range(count):
+                matrix[idx][other] = matrix[other][idx] = 0.0
+        matrix[idx][idx] = 1.0
+    return matrix
+
+
+def similarity_clusters(
+    numbers: List[int], matrix: List[List[float]], threshold: float
+) -> List[List[int]]:
+    """Group PRs linked by an estimated similarity of at least `threshold`.
+
+    Clusters are connected components (single linkage); PRs similar to no
+    other PR are left out.
+    """
+    parent = list(range(len(numbers)))
+
+    def find(idx: int) -> int:
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    for left, row in enumerate(matrix):
+        for right in range(left + 1, len(numbers)):
+            if row[right] >= threshold:
+                parent[find(right)] = find(left)
+    groups: Dict[int, List[int]] = {}
+    for idx, number in enumerate(numbers):
+        groups.setdefault(find(idx), []).append(number)
+    return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+
+def similarity_output_paths(output_dir: str, selection_tag: str) -> Tuple[str, str]:
+    """Return the CSV and JSON paths of the similarity report for a selection."""
+    base = os.path.join(output_dir, f"pr-similarity-{selection_tag}")
+    return f"{base}.csv", f"{base}.json"
+
+
+def create_similarity_report(
+    processed_prs: List[Dict[str, object]],
+    output_dir: str,
+    selection_tag: str,
+    permutations: int = DEFAULT_SIMILARITY_PERMUTATIONS,
+    threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+) -> Tuple[str, str, List[List[int]]]:
+    """Write an N x N estimated-Jaccard matrix of the PR diffs as CSV and JSON.
+
+    Diffs are read back from each PR's rendered file, so no git command runs.
+    Returns the CSV path, the JSON path and the clusters of similar PRs.
+    """
+    entries = sorted(processed_prs, key=lambda entry: entry["info"]["number"])
+    numbers = [entry["info"]["number"] for entry in entries]
+    with trace_span("similarity shingles", prs=len(entries)):
+        shingle_sets = [pr_diff_shingles(entry["file"]) for entry in entries]
+    with trace_span("similarity minhash", prs=len(entries), numpy=np is not None):
+        matrix = estimate_jaccard_matrix(minhash_signatures(shingle_sets, permutations))
+    clusters = similarity_clusters(numbers, matrix, threshold)
+
+    csv_path, json_path = similarity_output_paths(output_dir, selection_tag)
+    with open(csv_path, "w", encoding="utf-8") as outf:
+        outf.write(",".join(["pr"] + [str(number) for number in numbers]) + "\n")
+        for number, row in zip(numbers, matrix):
+            outf.write(",".join([str(number)] + [f"{value:.3f}" for value in row]) + "\n")
+    report = {
+        "prs": numbers,
+        "shingles": [len(shingles) for shingles in shingle_sets],
+        "permutations": permutations,
+        "shingle_tokens": SIMILARITY_SHINGLE_TOKENS,
+        "threshold": threshold,
+        "matrix": [[round(value, 3) for value in row] for row in matrix],
+        "clusters": clusters,
+    }
+    with open(json_path, "w", encoding="utf-8") as outf:
+        json.dump(report, outf)
+        outf.write("\n")
+    return csv_path, json_path, clusters
+
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@")
+
+
+def _unquote_git_path(text: str) -> str:
+    """Undo git's C-style quoting of a path (``"a/caf\\303\\251"``), if present."""
+    if len(text) >= 2 and text.startswith('"') and text.endswith('"'):
+        return codecs.escape_decode(text[1:-1].encode("ascii", "backslashreplace"))[0].decode(
+            "utf-8", "replace"
+        )
+    return text
+
+
+def _diff_header_old_path(header: str) -> str | None:
+    """Return the base-side path of a ``diff --git a/OLD b/NEW`` line.
+
+    Quoted paths are unquoted. Unquoted paths may contain spaces, so the
+    common case of identical halves is tried before splitting at `` b/``.
+    """
+    rest = header[len("diff --git "):]
+    if rest.startswith('"'):
+        pos = 1
+        while pos < len(rest) and rest[pos] != '"':
+            pos += 2 if rest[pos] == "\\" else 1
+        old = _unquote_git_path(rest[:pos + 1])
+    else:
+        half = (len(rest) - 1) // 2
+        if rest[half:half + 3] == " b/" and rest[2:half] == rest[half + 3:]:
+            old = rest[:half]
+        else:
+            split = rest.find(' "b/')
+            split = rest.find(" b/") if split == -1 else split
+            old = rest[:split] if split != -1 else rest
+    return old[2:] if old.startswith("a/") else old or None
+
+
+class HunkRangeParser:
+    """Text sink for ``git diff -U0`` that maps files to the base line ranges of their hunks.
+
+    Used as the destination of stream_command, so a diff is parsed line by
+    line and never held in memory whole. Files are keyed by their base-side
+    path from the ``diff --git`` header, or the ``rename from`` line for
+    renames. Ranges are inclusive ``(first, last)`` line pairs on the old
+    side. A pure insertion after line N claims lines N and N + 1, so it
+    overlaps edits on either side of the insertion point, as in a merge.
+    Added files report ``(0, 1)``, so two PRs adding the same path overlap.
+    """
+
+    def __init__(self) -> None:
+        self.ranges: Dict[str, List[Tuple[int, int]]] = {}
+        self._path: str | None = None
+        self._partial = ""
+
+    def write(self, text: str) -> int:
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line)
+        return len(text)
+
+    def close(self) -> None:
+        if self._partial:
+            self._line(self._partial)
+            self._partial = ""
+
+    def _line(self, line: str) -> None:
+        # Patch lines start with "+", "-", " " or a backslash, so they never look like headers.
+        if line.startswith("diff --git "):
+            self._path = _diff_header_old_path(line)
+        elif line.startswith("rename from "):
+            self._path = _unquote_git_path(line[len("rename from "):])
+        elif line.startswith("@@ ") and self._path is not None:
+            match = _HUNK_HEADER.match(line)
+            if not match:
+                return
+            start = int(match.group(1))
+            count = 1 if match.group(2) is None else int(match.group(2))
+            span = (start, start + count - 1) if count else (start, start + 1)
+            self.ranges.setdefault(self._path, []).append(span)
+
+
+def parse_hunk_ranges(diff_text: str) -> Dict[str, List[Tuple[int, int]]]:
+    """Map each file in a unified diff to the base line ranges its hunks replace."""
+    parser = HunkRangeParser()
+    parser.write(diff_text)
+    parser.close()
+    return parser.ranges
+
+
+def collect_hunk_ranges(
+    entry: Dict[str, object], base_branch: str
+) -> Dict[str, List[Tuple[int, int]]]:
+    """Stream one processed PR's zero-context ``git diff`` into a HunkRangeParser."""
+    branch = entry.get("local_branch") or entry["info"]["branch"]
+    revisions = _pr_diff_revisions(base_branch, branch, entry.get("merge_base"))
+    # Explicit prefixes and -M keep headers and rename detection independent of user config.
+    cmd = (
+        "git diff -U0 -M --no-color --no-ext-diff --src-prefix=a/ --dst-prefix=b/ "
+        f"{revisions}"
+    )
+    if entry["files"]:
+        cmd += " -- " + " ".join(shlex.quote(f) for f in entry["files"])
+    parser = HunkRangeParser()
+    stream_command(cmd, parser)
+    parser.close()
+    return parser.ranges
+
+
+def find_hunk_overlaps(
+    pr_ranges: Dict[int, Dict[str, List[Tuple[int, int]]]]
+) -> Dict[Tuple[int, int], Dict[str, int]]:
+    """Find PR pairs whose hunks touch overlapping base lines of the same file.
+
+    Each file's ranges from all PRs are swept once in start order while an
+    active list keeps the ranges that have not ended yet, so the cost is
+    O(n log n) plus the number of overlaps reported. Returns, per PR pair,
+    the number of overlapping hunk pairs in each file.
+    """
+    by_file: Dict[str, List[Tuple[int, int, int]]] = {}
+    for number, files in pr_ranges.items():
+        for path, spans in files.items():
+            by_file.setdefault(path, []).extend((first, last, number) for first, last in spans)
+    overlaps: Dict[Tuple[int, int], Dict[str, int]] = {}
+    for path, spans in by_file.items():
+        active: List[Tuple[int, int]] = []
+        for first, last, number in sorted(spans):
+            active = [(end, other) for end, other in active if end >= first]
+            for _, other in active:
+                if other != number:
+                    pair = (min(number, other), max(number, other))
+                    files = overlaps.setdefault(pair, {})
+                    files[path] = files.get(path, 0) + 1
+            active.append((last, number))
+    return overlaps
+
+
+def hunk_hot_spots(
+    pr_ranges: Dict[int, Dict[str, List[Tuple[int, int]]]]
+) -> List[Dict[str, object]]:
+    """Merge overlapping ranges across PRs into hot spots edited by two or more PRs.
+
+    Hot spots are sorted by how many PRs edit them, then by path and line.
+    """
+    by_file: Dict[str, List[Tuple[int, int, int]]] = {}
+    for number, files in pr_ranges.items():
+        for path, spans in files.items():
+            by_file.setdefault(path, []).extend((first, last, number) for first, last in spans)
+    spots: List[Dict[str, object]] = []
+    for path, spans in by_file.items():
+        merged: List[List[object]] = []
+        for first, last, number in sorted(spans):
+            if merged and first <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], last)
+                merged[-1][2].add(number)
+            else:
+                merged.append([first, last, {number}])
+        for first, last, numbers in merged:
+            if len(numbers) > 1:
+                spots.append({"path": path, "lines": [first, last], "prs": sorted(numbers)})
+    spots.sort(key=lambda spot: (-len(spot["prs"]), spot["path"], spot["lines"]))
+    return spots
+
+
+def conflict_output_paths(output_dir: str, selection_tag: str) -> Tuple[str, str, str]:
+    """Return the CSV, JSON and hot-spot report paths for a selection."""
+    base = os.path.join(output_dir, f"pr-conflicts-{selection_tag}")
+    return f"{base}.csv", f"{base}.json", os.path.join(
+        output_dir, f"pr-hotspots-{selection_tag}.txt"
+    )
+
+
+def create_conflict_report(
+    numbers: List[int],
+    pr_ranges: Dict[int, Dict[str, List[Tuple[int, int]]]],
+    overlaps: Dict[Tuple[int, int], Dict[str, int]],
+    output_dir: str,
+    selection_tag: str,
+) -> Tuple[str, str, str]:
+    """Write the predicted-conflict matrix (CSV and JSON) and the hot-spot report.
+
+    Matrix cells count the overlapping hunk pairs of two PRs. Ranges refer
+    to each PR's own merge base, so PRs on very different bases may be
+    reported approximately.
+    """
+    csv_path, json_path, hot_spot_path = conflict_output_paths(output_dir, selection_tag)
+    numbers = sorted(numbers)
+    totals = {pair: sum(files.values()) for pair, files in overlaps.items()}
+    with open(csv_path, "w", encoding="utf-8") as outf:
+        outf.write(",".join(["pr"] + [str(number) for number in numbers]) + "\n")
+        for left in numbers:
+            row = [
+                str(totals.get((min(left, right), max(left, right)), 0)) if left != right else ""
+                for right in numbers
+            ]
+            outf.write(",".join([str(left)] + row) + "\n")
+
+    spots = hunk_hot_spots(pr_ranges)
+    report = {
+        "prs": numbers,
+        "pairs": [
+            {
+                "prs": list(pair),
+                "hunks": totals[pair],
+                "files": dict(sorted(overlaps[pair].items())),
+            }
+            for pair in sorted(overlaps)
+        ],
+        "hot_spots": spots,
+    }
+    with open(json_path, "w", encoding="utf-8") as outf:
+        json.dump(report, outf, indent=2)
+        outf.write("\n")
+
+    touching: Dict[str, Set[int]] = {}
+    for number, files in pr_ranges.items():
+        for path in files:
+            touching.setdefault(path, set()).add(number)
+    spots_by_file: Dict[str, List[Dict[str, object]]] = {}
+    for spot in spots:
+        spots_by_file.setdefault(spot["path"], []).append(spot)
+    ranked = sorted(
+        spots_by_file,
+        key=lambda path: (-len({n for spot in spots_by_file[path] for n in spot["prs"]}), path),
+    )
+    with open(hot_spot_path, "w", encoding="utf-8") as outf:
+        outf.write(f"# Hunk-level hot spots for {len(numbers)} PR(s)\n")
+        outf.write(
+            f"# {len(overlaps)} PR pair(s) edit overlapping base lines "
+            f"in {len(spots_by_file)} file(s)\n\n"
+        )
+        for path in ranked:
+            conflicting = sorted({n for spot in spots_by_file[path] for n in spot["prs"]})
+            outf.write(
+                f"{path}: {len(touching[path])} PR(s) edit it, "
+                f"{len(conflicting)} in overlapping ranges\n"
+            )
+            for spot in sorted(spots_by_file[path], key=lambda spot: spot["lines"]):
+                first, last = spot["lines"]
+                prs = ", ".join(f"#{number}" for number in spot["prs"])
+                outf.write(f"  lines {first}-{last}: {prs}\n")
+            outf.write("\n")
+    return csv_path, json_path, hot_spot_path
+
+
+ARCHIVE_SUFFIXES = {".tar.zst": "zst", ".tar.gz": "gz", ".tgz": "gz", ".zip": "zip"}
+ARCHIVE_TOC_SUFFIX = ".toc.json"
+ARCHIVE_TOC_MEMBER = "pr-archive-toc.json"
+
+
+def archive_format(path: str) -> str | None:
+    """Return ``zst``, ``gz`` or ``zip`` for a supported archive name, else None."""
+    for suffix, kind in ARCHIVE_SUFFIXES.items():
+        if path.endswith(suffix):
+            return kind
+    return None
+
+
+def resolve_archive_path(path: str) -> str:
+    """Swap a ``.tar.zst`` name for ``.tar.gz`` when the zstandard package is missing."""
+    if archive_format(path) == "zst" and zstandard is None:
+        return path[:-len(".tar.zst")] + ".tar.gz"
+    return path
+
+
+class ArtifactArchive:
+    """Streams finished artifacts into one compressed archive on a background thread.
+
+    Callers `add` each output as soon as it is complete, and a single writer
+    thread compresses it while the run continues. Tar archives compress
+    every member as its own gzip member or zstd frame. The result is still
+    an ordinary ``.tar.gz`` or ``.tar.zst``, and the table of contents
+    written next to it (``<archive>.toc.json``, also stored as the last
+    member) gives each member's compressed offset and length, so
+    read_archive_member can decompress a single member. Zip archives use
+    zipfile and record each member's local header offset.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.format = archive_format(path)
+        if self.format is None:
+            raise ValueError(f"Unsupported archive type: {path}")
+        if self.format == "zst" and zstandard is None:
+            raise RuntimeError("Writing .tar.zst archives needs the zstandard package")
+        self.members: List[Dict[str, object]] = []
+        self._names: Set[str] = set()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[str, str] | None]" = queue.Queue()
+        self._error: BaseException | None = None
+        self._tar_offset = 0
+        if self.format == "zip":
+            self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+        else:
+            self._handle = open(path, "wb")
+        self._thread = threading.Thread(target=self._drain, name="archive", daemon=True)
+        self._thread.start()
+
+    def add(self, source: str, arcname: str | None = None) -> None:
+        """Queue `source` for the archive; names already queued are skipped."""
+        name = arcname or os.path.basename(source)
+        with self._lock:
+            if name in self._names:
+                return
+            self._names.add(name)
+        self._queue.put((source, name))
+
+    def add_output(self, output_file: str) -> None:
+        """Queue an output file together with its section index, if it has one."""
+        if not os.path.exists(output_file):
+            return
+        self.add(output_file)
+        index_path = section_index_path(output_file)
+        if os.path.exists(index_path):
+            self.add(index_path)
+
+    def _drain(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            source, name = item
+            if self._error:
+                continue
+            try:
+                with trace_span(f"archive {name}", "archive"), open(source, "rb") as src:
+                    self._write_member(name, src, os.fstat(src.fileno()).st_size)
+            except BaseException as exc:  # re-raised by close() on the main thread
+                self._error = exc
+
+    def _compressor(self):
+        if self.format == "zst":
+            return zstandard.ZstdCompressor(level=3).compressobj()
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def _write_member(self, name: str, source: IO[bytes], size: int) -> None:
+        if self.format == "zip":
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.file_size = size
+            with self._zip.open(info, "w", force_zip64=size >= 1 << 31) as dest:
+                shutil.copyfileobj(source, dest, STREAM_CHUNK_SIZE)
+            self.members.append(
+                {
+                    "name": name,
+                    "size": size,
+                    "offset": info.header_offset,
+                    "compressed_size": info.compress_size,
+                }
+            )
+            return
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        header = info.tobuf(format=tarfile.PAX_FORMAT)
+        compressor = self._compressor()
+        frame_start = self._handle.tell()
+        self._handle.write(compressor.compress(header))
+        remaining = size
+        while remaining:
+            chunk = source.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise OSError(f"{name} shrank while it was being archived")
+            self._handle.write(compressor.compress(chunk))
+            remaining -= len(chunk)
+        self._handle.write(compressor.compress(b"\0" * (-size % tarfile.BLOCKSIZE)))
+        self._handle.write(compressor.flush())
+        self.members.append(
+            {
+                "name": name,
+                "size": size,
+                "offset": frame_start,
+                "length": self._handle.tell() - frame_start,
+                "data_offset": len(header),
+                "tar_offset": self._tar_offset,
+            }
+        )
+        self._tar_offset += len(header) + size + (-size % tarfile.BLOCKSIZE)
+
+    def close(self) -> str:
+        """Finish the archive, write its table of contents and return the TOC path.
+
+        Raises the first error the writer thread hit.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            if self._error is None:
+                toc = {
+                    "archive": os.path.basename(self.path),
+                    "format": self.format,
+                    "members": self.members,
+                }
+                toc_bytes = (json.dumps(toc, indent=2) + "\n").encode("utf-8")
+                self._write_member(ARCHIVE_TOC_MEMBER, io.BytesIO(toc_bytes), len(toc_bytes))
+                if self.format != "zip":
+                    # End-of-archive marker: two zero blocks in a frame of their own.
+                    compressor = self._compressor()
+                    self._handle.write(compressor.compress(b"\0" * tarfile.BLOCKSIZE * 2))
+                    self._handle.write(compressor.flush())
+        finally:
+            if self.format == "zip":
+                self._zip.close()
+            else:
+                self._handle.close()
+        if self._error is not None:
+            raise self._error
+        toc_path = self.path + ARCHIVE_TOC_SUFFIX
+        with open(toc_path, "wb") as outf:
+            outf.write(toc_bytes)
+        return toc_path
+
+
+def read_archive_member(archive_path: str, name: str) -> bytes:
+    """Read one member of an ArtifactArchive through its table of contents.
+
+    Only that member's compressed bytes are read and decompressed.
+    """
+    with open(archive_path + ARCHIVE_TOC_SUFFIX, "r", encoding="utf-8") as handle:
+        toc = json.load(handle)
+    entry = next((member for member in toc["members"] if member["name"] == name), None)
+    if entry is None:
+        raise KeyError(f"{name} is not in {archive_path}")
+    if toc["format"] == "zip":
+        with zipfile.ZipFile(archive_path) as archive:
+            return archive.read(name)
+    with open(archive_path, "rb") as handle:
+        handle.seek(entry["offset"])
+        frame = handle.read(entry["length"])
+    if toc["format"] == "zst":
+        if zstandard is None:
+            raise RuntimeError("Reading .tar.zst archives needs the zstandard package")
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(frame)
+    else:
+        data = zlib.decompressobj(31).decompress(frame)
+    start = entry["data_offset"]
+    return data[start:start + entry["size"]]
+
+
+MANIFEST_NAME = "pr-batch-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def fingerprint(value: object) -> str:
+    """Return a stable SHA-256 of a JSON-serializable value."""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """Return the SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(STREAM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_ref_shas() -> Dict[str, str]:
+    """Map every local ref name to the commit it points at, in one git call."""
+    output = run_command("git for-each-ref --format='%(refname) %(objectname)'")
+    return dict(line.split(" ", 1) for line in output.splitlines() if " " in line)
+
+
+def resolve_commit(ref: str) -> str | None:
+    """Return the commit SHA of `ref`, or None when it does not resolve."""
+    try:
+        return run_command(f"git rev-parse --verify -q {shlex.quote(ref + '^{commit}')}") or None
+    except subprocess.CalledProcessError:
+        return None
+
+
+def ref_sha(ref_shas: Dict[str, str], ref: str) -> str | None:
+    """Look up `ref` in a list_ref_shas() map the way git resolves short names."""
+    for candidate in (ref, f"refs/heads/{ref}", f"refs/remotes/{ref}"):
+        if candidate in ref_shas:
+            return ref_shas[candidate]
+    return None
+
+
+def pr_artifact_inputs(
+    pr_info: Dict[str, str],
+    artifacts: Dict[str, object],
+    variant: str,
+    head_sha: str,
+    base_sha: str | None,
+    base_branch: str,
+    checkout_free: bool,
+    diff_options: Dict[str, object] | None = None,
+) -> Dict[str, object]:
+    """Describe everything a per-PR output file is rendered from.
+
+    Logs are left out: they are attached per Actions run, and a completed
+    run's log does not change once the check fingerprint is stable.
+    """
+    checks = [
+        {key: value for key, value in check.items() if key != "logFile"}
+        for check in artifacts["checks"]
+    ]
+    return {
+        "kind": "pr",
+        "pr": pr_info["number"],
+        "variant": variant,
+        "head": head_sha,
+        "base": base_sha,
+        "base_branch": base_branch,
+        "checkout_free": checkout_free,
+        "diff": diff_options or {},
+        "info": fingerprint(pr_info),
+        "files": fingerprint(artifacts["files"]),
+        "excluded": fingerprint(artifacts.get("excluded_files") or []),
+        "comments": fingerprint(artifacts["comments"]),
+        "checks": fingerprint(checks),
+    }
+
+
+def round_robin_pair_inputs(
+    left: Dict[str, object],
+    right: Dict[str, object],
+    selection_requested: str,
+    selection_canonical: str,
+    diff_options: Dict[str, object] | None = None,
+) -> Dict[str, object]:
+    """Describe everything a round-robin comparison file is rendered from."""
+
+    def side(entry: Dict[str, object]) -> Dict[str, object]:
+        return {
+            "pr": entry["info"]["number"],
+            "head": entry.get("head"),
+            "local_branch": entry.get("local_branch"),
+            "merge_base": entry.get("merge_base"),
+            "info": fingerprint(entry["info"]),
+            "files": fingerprint(entry.get("files")),
+        }
+
+    return {
+        "kind": "pair",
+        "selection": [selection_requested, selection_canonical],
+        "diff": diff_options or {},
+        "left": side(left),
+        "right": side(right),
+    }
+
+
+class ArtifactManifest:
+    """Inputs and content hash of every artifact written to an output directory.
+
+    Entries are keyed by file name and hold the fingerprint of the inputs the
+    file was rendered from (PR head SHA, base SHA, comment and check
+    fingerprints, ...), the file's SHA-256, and its size and mtime. An
+    artifact is current when its input fingerprint is unchanged and the file
+    on disk still has the recorded size and mtime.
+    """
+
+    def __init__(self, output_dir: str) -> None:
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self._lock = threading.Lock()
+        self.artifacts: Dict[str, Dict[str, object]] = {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.artifacts = data.get("artifacts") or {}
+
+    def get(self, output_file: str) -> Dict[str, object] | None:
+        with self._lock:
+            return self.artifacts.get(os.path.basename(output_file))
+
+    def is_current(self, output_file: str, inputs: Dict[str, object]) -> bool:
+        entry = self.get(output_file)
+        if not entry or entry.get("key") != fingerprint(inputs):
+            return False
+        try:
+            stat = os.stat(output_file)
+        except OSError:
+            return False
+        return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+
+    def record(self, output_file: str, inputs: Dict[str, object], **details: object) -> None:
+        stat = os.stat(output_file)
+        entry: Dict[str, object] = {
+            "key": fingerprint(inputs),
+            "inputs": inputs,
+            "sha256": hash_file(output_file),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        entry.update(details)
+        with self._lock:
+            self.artifacts[os.path.basename(output_file)] = entry
+
+    def save(self) -> None:
+        with self._lock:
+            payload = {"version": MANIFEST_VERSION, "artifacts": self.artifacts}
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        tmp_path.write_text(json.dumps(payload, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+class PipelineContext:
+    """State shared by the per-PR pipeline stages of one run.
+
+    The stages run on separate threads; each PR's state dict flows through
+    them in turn, while this object holds what they share: the parsed
+    arguments, cache and manifest, and the ref SHAs and reuse decisions the
+    "git fetch" stage makes for the render stage. `git_lock` keeps `git
+    fetch` from running while a checkout rewrites the shared working tree.
+    """
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        variants: Set[str],
+        manifest: ArtifactManifest,
+        cache: PrMetadataCache | None = None,
+        fingerprints: Dict[int, str] | None = None,
+        bulk_data: Dict[int, Dict[str, object] | None] | None = None,
+        bulk_repo: Tuple[str, str] | None = None,
+        log_spool_dir: str | None = None,
+        archive: ArtifactArchive | None = None,
+    ) -> None:
+        self.args = args
+        self.variants = [variant for variant in OUTPUT_VARIANTS if variant in variants]
+        self.manifest = manifest
+        self.cache = cache
+        self.fingerprints = fingerprints or {}
+        self.bulk_data = bulk_data if bulk_data is not None else {}
+        self.bulk_repo = bulk_repo
+        self.log_spool_dir = log_spool_dir
+        self.archive = archive
+        self.diff_options: Dict[str, object] = {
+            "include": args.include or [],
+            "exclude": args.exclude or [],
+            "stat_only": args.stat_only or [],
+            "max_diff_bytes_per_file": args.max_diff_bytes_per_file,
+        }
+        self.base_sha: str | None = None
+        self.base_fetched = False
+        self.ref_shas: Dict[str, str] = {}
+        self.fetched_heads: Set[int] = set()
+        self.head_shas: Dict[int, str | None] = {}
+        self.reused: Dict[int, Dict[str, object]] = {}
+        self.diff_timings = WorkerTimings()
+        self.git_lock = threading.Lock()
+
+    def variant_output(self, pr_number: int, variant: str) -> str:
+        suffix = "-with-logs" if variant == "logs" else ""
+        return os.path.join(self.args.output_dir, f"pr-{pr_number}-implementation{suffix}.txt")
+
+
+def reusable_result(
+    ctx: PipelineContext, pr_info: Dict[str, str], artifacts: Dict[str, object]
+) -> Dict[str, object] | None:
+    """Return the recorded result for a PR whose outputs are all current, else None."""
+    args = ctx.args
+    head_sha = ctx.head_shas.get(pr_info["number"])
+    if not head_sha or not artifacts["files"]:
+        return None
+    keys: Dict[str, str] = {}
+    for variant in ctx.variants:
+        output = ctx.variant_output(pr_info["number"], variant)
+        inputs = pr_artifact_inputs(
+            pr_info, artifacts, variant, head_sha, ctx.base_sha,
+            args.base_branch, args.checkout_free, ctx.diff_options,
+        )
+        if not ctx.manifest.is_current(output, inputs):
+            return None
+        keys[variant] = fingerprint(inputs)
+    entry = ctx.manifest.get(ctx.variant_output(pr_info["number"], ctx.variants[0]))
+    local_branch = entry.get("local_branch")
+    if not isinstance(local_branch, str) or ref_sha(ctx.ref_shas, local_branch) != head_sha:
+        return None
+    return {
+        "info": pr_info,
+        "local_branch": local_branch,
+        "merge_base": entry.get("merge_base"),
+        "files": entry.get("files") or [],
+        "head": head_sha,
+        "keys": keys,
+        "file": ctx.variant_output(pr_info["number"], "plain") if "plain" in keys else None,
+        "file_with_logs": (
+            ctx.variant_output(pr_info["number"], "logs") if "logs" in keys else None
+        ),
+    }
+
+
+def collect_metadata(ctx: PipelineContext, pr_numbers: List[int]) -> List[Dict[str, object]]:
+    """Pipeline stage: look up info, files, comments and checks for a batch of PRs."""
+    args = ctx.args
+    batch_data = {n: ctx.bulk_data[n] for n in pr_numbers if n in ctx.bulk_data}
+    uncached = [n for n in pr_numbers if n not in batch_data]
+    if ctx.bulk_repo and uncached:
+        batch_data.update(
+            fetch_pr_data_bulk(uncached, args.graphql_batch_size, repo=ctx.bulk_repo)
+        )
+    states: List[Dict[str, object]] = []
+    for pr_num in pr_numbers:
+        pr_info, error = lookup_pr_info(pr_num, batch_data)
+        if pr_info is None:
+            print(f"  PR #{pr_num}: Not found or inaccessible ({error})")
+            states.append({"number": pr_num, "info": None})
+            continue
+        print(f"  PR #{pr_num}: {pr_info['title']}")
+        artifacts = collect_pr_artifacts(pr_num, batch_data.get(pr_num), ctx.cache)
+        if ctx.cache and artifacts["files"] is not None and not artifacts["messages"]:
+            ctx.cache.put_pr(
+                pr_num,
+                ctx.fingerprints.get(pr_num),
+                {
+                    "info": pr_info,
+                    "files": artifacts["files"],
+                    "comments": artifacts["comments"],
+                    "checks": artifacts["checks"],
+                },
+            )
+        if (args.include or args.exclude) and artifacts["files"]:
+            artifacts["files"], artifacts["excluded_files"] = filter_paths(
+                artifacts["files"], args.include, args.exclude
+            )
+            if artifacts["excluded_files"]:
+                print(
+                    f"  PR #{pr_num}: {len(artifacts['excluded_files'])} file(s) "
+                    "excluded by path filters"
+                )
+        states.append({"number": pr_num, "info": pr_info, "artifacts": artifacts})
+    return states
+
+
+def fetch_heads(
+    ctx: PipelineContext, states: List[Dict[str, object]]
+) -> List[Dict[str, object]]:
+    """Pipeline stage: fetch a batch of PR heads and decide which PRs can be reused."""
+    args = ctx.args
+    numbers = [state["number"] for state in states if state["info"]]
+    if not numbers:
+        return states
+    # With --fetch-scope full the base branch is already fetched. Otherwise it
+    # rides along with the first batch, and later batches retry it until one
+    # of their fetches succeeds.
+    fetch_base = args.fetch_scope == "selected" and not ctx.base_fetched
+    with ctx.git_lock:
+        fetched = fetch_pr_heads_bulk(
+            numbers,
+            args.remote,
+            base_branch=args.base_branch if fetch_base else None,
+            partial=args.partial_fetch,
+        )
+        if not ctx.base_fetched and (fetched or not fetch_base):
+            ctx.base_fetched = True
+            ctx.base_sha = resolve_commit(args.base_branch)
+        ctx.ref_shas.update(list_ref_shas())
+    ctx.fetched_heads.update(fetched)
+    for pr_num in fetched:
+        ctx.head_shas[pr_num] = ctx.ref_shas.get(pr_head_ref(pr_num))
+    if args.incremental:
+        for state in states:
+            if not state["info"]:
+                continue
+            result = reusable_result(ctx, state["info"], state["artifacts"])
+            if result is not None:
+                ctx.reused[state["number"]] = result
+    return states
+
+
+def fetch_check_logs(ctx: PipelineContext, state: Dict[str, object]) -> Dict[str, object]:
+    """Pipeline stage: download failed check logs when the logs variant needs them."""
+    if state["info"] and "logs" in ctx.variants and state["number"] not in ctx.reused:
+        attach_failed_check_logs(
+            [state["artifacts"]["checks_with_logs"]], ctx.log_spool_dir, ctx.cache
+        )
+    return state
+
+
+def render_state(ctx: PipelineContext, state: Dict[str, object]) -> Dict[str, object]:
+    """Pipeline stage: render a PR's outputs and add them to the archive."""
+    if state["info"]:
+        state["result"] = process_pr(ctx, (state["info"], state["artifacts"]))
+        if ctx.archive and state["result"]:
+            for output in (state["result"]["file"], state["result"]["file_with_logs"]):
+                if output:
+                    ctx.archive.add_output(output)
+    return state
+
+
+def process_pr(
+    ctx: PipelineContext, item: Tuple[Dict[str, str], Dict[str, object]]
+) -> Dict[str, object] | None:
+    with trace_span(f"PR #{item[0]['number']}", "pr"):
+        return render_pr(ctx, item)
+
+
+def render_pr(
+    ctx: PipelineContext, item: Tuple[Dict[str, str], Dict[str, object]]
+) -> Dict[str, object] | None:
+    """Write the requested output variants for one PR and record them in the manifest."""
+    args = ctx.args
+    pr_info, artifacts = item
+    print(f"\n--- Processing PR #{pr_info['number']}: {pr_info['title']} ---")
+    for message in artifacts["messages"]:
+        print(message)
+
+    if pr_info["number"] in ctx.reused:
+        print(f"Reusing up-to-date output for PR #{pr_info['number']}")
+        return ctx.reused[pr_info["number"]]
+
+    all_files = artifacts["files"]
+    if all_files is None:
+        return None
+
+    if not all_files:
+        if artifacts.get("excluded_files"):
+            print(
+                f"Every changed file of PR #{pr_info['number']} is excluded by "
+                "path filters"
+            )
+        else:
+            print(f"No changed files found for PR #{pr_info['number']}")
+        return None
+
+    print(f"Total changed files: {len(all_files)}")
+
+    if args.checkout_free:
+        try:
+            if pr_info["number"] in ctx.fetched_heads:
+                local_branch = pr_head_ref(pr_info["number"])
+            else:
+                local_branch = fetch_pr_head_ref(pr_info, args.remote)
+        except subprocess.CalledProcessError:
+            print(f"Failed to fetch head ref for PR #{pr_info['number']}")
+            return None
+        existing_files, deleted_files = filter_existing_files_at_ref(all_files, local_branch)
+    else:
+        try:
+            with ctx.git_lock:
+                local_branch = checkout_pr_branch(
+                    pr_info,
+                    args.remote,
+                    pr_head_ref(pr_info["number"])
+                    if pr_info["number"] in ctx.fetched_heads
+                    else None,
+                )
+        except subprocess.CalledProcessError:
+            print(f"Failed to checkout branch for PR #{pr_info['number']}")
+            return None
+        existing_files, deleted_files = filter_existing_files(all_files)
+
+    if not existing_files and deleted_files:
+        print(
+            f"No existing files to process for PR #{pr_info['number']} "
+            "(all files were deleted)"
+        )
+        return None
+
+    print(
+        f"Files to process ({len(existing_files)}): "
+        f"{', '.join(existing_files)}"
+    )
+
+    output_file = ctx.variant_output(pr_info["number"], "plain")
+    output_file_with_logs = ctx.variant_output(pr_info["number"], "logs")
+    with ctx.diff_timings.measure():
+        merge_base = compute_merge_base(args.base_branch, local_branch)
+        variants: List[Tuple[str, List[Dict[str, str]], bool]] = []
+        if "plain" in ctx.variants:
+            variants.append((output_file, artifacts["checks"], False))
+        if "logs" in ctx.variants:
+            variants.append((output_file_with_logs, artifacts["checks_with_logs"], True))
+        written = render_pr_variants(
+            pr_info,
+            existing_files,
+            artifacts["comments"],
+            variants,
+            base_branch=args.base_branch,
+            local_branch=local_branch,
+            merge_base=merge_base,
+            excluded_files=artifacts.get("excluded_files"),
+            stat_only=args.stat_only,
+            max_diff_bytes_per_file=args.max_diff_bytes_per_file,
+        )
+    head_sha = ctx.head_shas.get(pr_info["number"]) or resolve_commit(local_branch)
+    keys: Dict[str, str] = {}
+    if written and head_sha:
+        for variant in ctx.variants:
+            inputs = pr_artifact_inputs(
+                pr_info, artifacts, variant, head_sha, ctx.base_sha,
+                args.base_branch, args.checkout_free, ctx.diff_options,
+            )
+            ctx.manifest.record(
+                ctx.variant_output(pr_info["number"], variant),
+                inputs,
+                local_branch=local_branch,
+                merge_base=merge_base,
+                files=existing_files,
+            )
+            keys[variant] = fingerprint(inputs)
+    return {
+        "info": pr_info,
+        "local_branch": local_branch,
+        "merge_base": merge_base,
+        "files": existing_files,
+        "head": head_sha,
+        "keys": keys,
+        "file": output_file if written and "plain" in ctx.variants else None,
+        "file_with_logs": (
+            output_file_with_logs if written and "logs" in ctx.variants else None
+        ),
+    }
+
+
+def build_pipeline_stages(ctx: PipelineContext, pr_count: int) -> List[PipelineStage]:
+    """Return the metadata -> git fetch -> logs -> render stages for one run."""
+    args = ctx.args
+    # Checkouts share the working tree, so only checkout-free runs render in parallel.
+    process_jobs = (args.diff_jobs or args.jobs) if args.checkout_free else 1
+    # Network-bound stages hand PRs on as soon as they are ready, so GitHub
+    # and `git fetch` waits for later PRs overlap with diffing earlier ones.
+    # Recorded commands are looked up verbatim, so while a cassette is in use
+    # batches follow input order rather than arrival timing.
+    fixed = _CASSETTE is not None
+    return [
+        PipelineStage(
+            "metadata",
+            functools.partial(collect_metadata, ctx),
+            workers=args.jobs,
+            batch_size=args.graphql_batch_size if ctx.bulk_repo else 1,
+            fixed_batches=fixed,
+        ),
+        PipelineStage(
+            "git fetch",
+            functools.partial(fetch_heads, ctx),
+            batch_size=pr_count,
+            fixed_batches=fixed,
+        ),
+        PipelineStage("logs", functools.partial(fetch_check_logs, ctx), workers=args.jobs),
+        PipelineStage("render", functools.partial(render_state, ctx), workers=process_jobs),
+    ]
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Return the command-line parser; main() validates the parsed values."""
     parser = argparse.ArgumentParser(
         description="Automate diff generation for selected pull requests",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -753,6 +4288,43 @@ def main() -> None:
             "Examples: '123-130,135,140-142' or '#123, #125-#127'."
         ),
     )
+    parser.add_argument(
+        "--resolve-selection",
+        choices=("auto", "list", "probe"),
+        default="auto",
+        help=(
+            "How to find which selected numbers are pull requests: 'list' pages through "
+            "the repository's PRs in the selection window with GraphQL, 'probe' looks up "
+            f"each number, and 'auto' lists for dense selections of {PR_LIST_AUTO_MIN}+ "
+            "numbers or when a filter is given (default: auto)"
+        ),
+    )
+    parser.add_argument(
+        "--state",
+        choices=PR_STATE_FILTERS,
+        help="Only include PRs in this state (filtered by GitHub while listing)",
+    )
+    parser.add_argument(
+        "--label",
+        action="append",
+        metavar="LABEL",
+        help="Only include PRs with any of these labels (repeatable)",
+    )
+    parser.add_argument(
+        "--author",
+        metavar="LOGIN",
+        help="Only include PRs opened by this user",
+    )
+    parser.add_argument(
+        "--created-since",
+        metavar="YYYY-MM-DD",
+        help="Only include PRs created on or after this date",
+    )
+    parser.add_argument(
+        "--created-until",
+        metavar="YYYY-MM-DD",
+        help="Only include PRs created on or before this date",
+    )
     parser.add_argument(
         "--base-branch",
         default="main",
@@ -773,17 +4345,348 @@ def main() -> None:
         action="store_true",
         help="Don't return to the base branch at the end",
     )
+    parser.add_argument(
+        "--variants",
+        default="plain,logs",
+        help=(
+            "Comma-separated output variants to render: 'plain' (without CI logs) "
+            "and/or 'logs' (with failed-check logs) (default: plain,logs)"
+        ),
+    )
+    parser.add_argument(
+        "--checkout-free",
+        action="store_true",
+        help=(
+            f"Fetch PR heads into {PR_REF_NAMESPACE}/<number> and diff ref-to-ref "
+            "without checking anything out; per-PR processing then honours --jobs"
+        ),
+    )
+    parser.add_argument(
+        "--fetch-scope",
+        choices=["full", "selected"],
+        default="full",
+        help=(
+            "'full' fetches every branch and tag from the remote before fetching PR heads; "
+            "'selected' fetches only the selected PR heads and the base branch (default: full)"
+        ),
+    )
+    parser.add_argument(
+        "--partial-fetch",
+        action="store_true",
+        help="Fetch with --filter=blob:none so blobs are downloaded only when diffed",
+    )
+    parser.add_argument(
+        "--graphql-batch-size",
+        type=int,
+        default=DEFAULT_GRAPHQL_BATCH_SIZE,
+        help=(
+            "Number of PRs fetched per aliased GraphQL request "
+            f"(default: {DEFAULT_GRAPHQL_BATCH_SIZE}; 0 uses one gh pr view call per field)"
+        ),
+    )
 
+    parser.add_argument(
+        "--diff-jobs",
+        type=int,
+        help=(
+            "Number of PRs diffed concurrently in --checkout-free mode "
+            "(default: the value of --jobs)"
+        ),
+    )
+    parser.add_argument(
+        "--round-robin",
+        choices=ROUND_ROBIN_MODES,
+        default="all",
+        help=(
+            "Which PR pairs get a pairwise comparison: every pair, pairs sharing a file, "
+            "pairs whose hunks edit overlapping base lines, each PR's top-K "
+            "most-overlapping partners, an explicit --round-robin-pairs list, or none "
+            "(default: all)"
+        ),
+    )
+    parser.add_argument(
+        "--round-robin-top-k",
+        type=int,
+        default=3,
+        help="Partners per PR for --round-robin top (default: 3)",
+    )
+    parser.add_argument(
+        "--round-robin-pairs",
+        help="Explicit PR pairs like '12:15,12:18'; implies --round-robin pairs",
+    )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Also split the master comparison and touched-files compilations into "
+            "numbered chunks of at most N estimated tokens, cut at PR and file section "
+            f"boundaries (at least {MIN_CHUNK_TOKENS}; default: 0, no chunks)"
+        ),
+    )
+    parser.add_argument(
+        "--conflicts",
+        action="store_true",
+        help=(
+            "Predict conflicts from hunk-level overlaps: write a PR x PR matrix of "
+            "overlapping hunks (pr-conflicts-*.csv and .json) and a per-file hot-spot "
+            "report (pr-hotspots-*.txt)"
+        ),
+    )
+    parser.add_argument(
+        "--similarity",
+        action="store_true",
+        help=(
+            "Write an estimated-Jaccard similarity matrix of the PR diffs "
+            "(pr-similarity-*.csv and .json, MinHash over diff shingles; uses NumPy when "
+            "installed) and print clusters of near-duplicate PRs"
+        ),
+    )
+    parser.add_argument(
+        "--similarity-threshold",
+        type=float,
+        default=DEFAULT_SIMILARITY_THRESHOLD,
+        help=(
+            "Estimated similarity at which PRs join a cluster "
+            f"(default: {DEFAULT_SIMILARITY_THRESHOLD:g})"
+        ),
+    )
+    parser.add_argument(
+        "--similarity-permutations",
+        type=int,
+        default=DEFAULT_SIMILARITY_PERMUTATIONS,
+        help=(
+            "MinHash permutations per PR; more are slower but estimate more precisely "
+            f"(default: {DEFAULT_SIMILARITY_PERMUTATIONS})"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            f"Reuse outputs whose inputs are unchanged since the last run, per the "
+            f"{MANIFEST_NAME} manifest in --output-dir"
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help=(
+            "Directory for a persistent cache of PR metadata, comments, checks and "
+            "Actions run logs, revalidated against each PR's updatedAt/headRefOid"
+        ),
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_CACHE_MAX_MB,
+        help=f"Size budget for --cache-dir before LRU eviction (default: {DEFAULT_CACHE_MAX_MB})",
+    )
+    parser.add_argument(
+        "--max-file-bytes",
+        type=int,
+        default=DEFAULT_MAX_BLOB_BYTES,
+        help=(
+            "Skip base-branch files larger than this in the touched-files compilation; "
+            f"0 disables the limit (default: {DEFAULT_MAX_BLOB_BYTES})"
+        ),
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help=(
+            "Only process changed files matching GLOB (repeatable). Globs without a '/' "
+            "match the file name in any directory"
+        ),
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="GLOB",
+        help="Leave changed files matching GLOB out of every output (repeatable)",
+    )
+    parser.add_argument(
+        "--max-diff-bytes-per-file",
+        type=int,
+        default=0,
+        help=(
+            "Truncate each file's patch after this many bytes, with a marker line, in PR "
+            "and round-robin diffs; 0 disables the cap (default: 0)"
+        ),
+    )
+    # A flag with an optional value would swallow a following PR selection,
+    # so the every-file form and the glob form are separate options.
+    parser.add_argument(
+        "--stat-only",
+        dest="stat_only",
+        action="append_const",
+        const="*",
+        help="Show `git diff --numstat --stat` instead of patches for every file",
+    )
+    parser.add_argument(
+        "--stat-only-glob",
+        dest="stat_only",
+        action="append",
+        metavar="GLOB",
+        help=(
+            "Show `git diff --numstat --stat` instead of patches for files matching GLOB "
+            "(repeatable)"
+        ),
+    )
+    parser.add_argument(
+        "--api-rate",
+        type=float,
+        default=DEFAULT_API_RATE,
+        help=(
+            "Maximum GitHub API calls per second, lowered further to fit the remaining "
+            "rate-limit quota once it runs low; 0 paces by quota only "
+            f"(default: {DEFAULT_API_RATE:g})"
+        ),
+    )
+    parser.add_argument(
+        "--api-concurrency",
+        type=int,
+        default=DEFAULT_API_CONCURRENCY,
+        help=f"Maximum concurrent GitHub API calls (default: {DEFAULT_API_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--api-retries",
+        type=int,
+        default=DEFAULT_API_RETRIES,
+        help=(
+            "Retries for rate-limited or transient GitHub API failures, with exponential "
+            f"backoff and jitter (default: {DEFAULT_API_RETRIES})"
+        ),
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help=(
+            "Write a Chrome trace-event JSON of every command and pipeline stage to "
+            "FILE (open it in Perfetto) and print the slowest operations"
+        ),
+    )
+    parser.add_argument(
+        "--trace-top",
+        type=int,
+        default=TRACE_SUMMARY_TOP,
+        help=f"Number of slowest operations printed with --trace (default: {TRACE_SUMMARY_TOP})",
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="PATH",
+        help=(
+            "Also stream every artifact into one compressed archive as it is produced, "
+            f"with a PATH{ARCHIVE_TOC_SUFFIX} table of contents for direct member access; "
+            ".tar.zst needs the zstandard package (falling back to .tar.gz), .tar.gz, .tgz "
+            "and .zip use the standard library"
+        ),
+    )
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="Save the output of every gh and git fetch command to DIR for later --replay",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="DIR",
+        help=(
+            "Serve gh and git fetch commands from a --record directory instead of the "
+            "network; the PR refs fetched while recording must still be in the repository"
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "Number of PRs whose metadata, comments, checks and logs are fetched "
+            "concurrently (default: 1)"
+        ),
+    )
+    return parser
+
+
+def main() -> None:
+    parser = build_arg_parser()
     args = parser.parse_args()
 
     if not args.pr_selection:
         parser.error("pr_selection is required (e.g. '123-130,135,140-142').")
+    if args.graphql_batch_size < 0:
+        parser.error("--graphql-batch-size must be zero or a positive integer.")
+    if args.jobs < 1:
+        parser.error("--jobs must be a positive integer.")
+    if args.diff_jobs is not None and args.diff_jobs < 1:
+        parser.error("--diff-jobs must be a positive integer.")
+    if args.max_file_bytes < 0:
+        parser.error("--max-file-bytes must be zero or a positive integer.")
+    for option, value in (
+        ("--created-since", args.created_since),
+        ("--created-until", args.created_until),
+    ):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                parser.error(f"{option} must be a date in YYYY-MM-DD form.")
+    selection_filters = bool(
+        args.state or args.label or args.author or args.created_since or args.created_until
+    )
+    if selection_filters and args.resolve_selection == "probe":
+        parser.error("--state, --label, --author and --created-* need --resolve-selection list.")
+    if args.max_diff_bytes_per_file < 0:
+        parser.error("--max-diff-bytes-per-file must be zero or a positive integer.")
+    if args.cache_max_mb < 1:
+        parser.error("--cache-max-mb must be a positive integer.")
+    if args.trace_top < 1:
+        parser.error("--trace-top must be a positive integer.")
+    if args.api_rate < 0:
+        parser.error("--api-rate must be zero or positive.")
+    if args.api_concurrency < 1:
+        parser.error("--api-concurrency must be a positive integer.")
+    if args.api_retries < 0:
+        parser.error("--api-retries must be zero or a positive integer.")
+    if args.record and args.replay:
+        parser.error("--record and --replay cannot be combined.")
+    if args.replay and not os.path.isdir(args.replay):
+        parser.error(f"--replay directory not found: {args.replay}")
+    if args.archive and archive_format(args.archive) is None:
+        parser.error("--archive must end in .tar.zst, .tar.gz, .tgz or .zip.")
 
     try:
         selected_prs = parse_pr_selection(args.pr_selection)
     except SelectionParseError as exc:
         parser.error(str(exc))
 
+    variants_requested = {
+        variant.strip() for variant in args.variants.split(",") if variant.strip()
+    }
+    if not variants_requested or not variants_requested <= set(OUTPUT_VARIANTS):
+        parser.error(
+            f"--variants must be a comma-separated subset of {', '.join(OUTPUT_VARIANTS)}."
+        )
+
+    explicit_pairs: List[Tuple[int, int]] | None = None
+    if args.round_robin_pairs:
+        try:
+            explicit_pairs = parse_pr_pairs(args.round_robin_pairs)
+        except SelectionParseError as exc:
+            parser.error(str(exc))
+        if args.round_robin == "all":
+            args.round_robin = "pairs"
+    if args.round_robin == "pairs" and not explicit_pairs:
+        parser.error("--round-robin pairs requires --round-robin-pairs.")
+    if args.round_robin_top_k < 1:
+        parser.error("--round-robin-top-k must be a positive integer.")
+    if args.chunk_tokens and args.chunk_tokens < MIN_CHUNK_TOKENS:
+        parser.error(f"--chunk-tokens must be 0 or at least {MIN_CHUNK_TOKENS}.")
+    if not 0 < args.similarity_threshold <= 1:
+        parser.error("--similarity-threshold must be greater than 0 and at most 1.")
+    if args.similarity_permutations < 1:
+        parser.error("--similarity-permutations must be a positive integer.")
+
     selection_requested = args.pr_selection
     selection_canonical = format_pr_selection(selected_prs)
     selection_tag = build_selection_tag(selected_prs, selection_canonical)
@@ -797,140 +4700,199 @@ def main() -> None:
             f"min={min(selected_prs)} max={max(selected_prs)} preview={preview}"
         )
 
-    check_current_branch(args.base_branch)
+    tracer = enable_tracing() if args.trace else None
+    cassette = configure_cassette(
+        CommandCassette(args.record or args.replay, replay=bool(args.replay))
+        if args.record or args.replay
+        else None
+    )
+    # Replayed calls never reach GitHub, so there is nothing to pace.
+    scheduler = configure_api_scheduler(
+        ApiScheduler(
+            rate=0.0 if args.replay else args.api_rate,
+            concurrency=args.api_concurrency,
+            retries=args.api_retries,
+            quota_reader=None if args.replay else read_api_quota,
+        )
+    )
+
+    if not args.checkout_free:
+        check_current_branch(args.base_branch)
+
+    archive: ArtifactArchive | None = None
+    if args.archive:
+        archive_path = resolve_archive_path(args.archive)
+        if archive_path != args.archive:
+            print(f"zstandard is not installed; writing {archive_path} instead of {args.archive}")
+        archive = ArtifactArchive(archive_path)
 
+    log_spool_dir = tempfile.mkdtemp(prefix="pr-batch-logs-")
     try:
-        fetch_remote_branches(args.remote)
+        if args.fetch_scope == "full":
+            with trace_span("fetch remote branches"):
+                fetch_remote_branches(args.remote, partial=args.partial_fetch)
+
+        pipeline_prs = selected_prs
+        if args.resolve_selection == "list" or (
+            args.resolve_selection == "auto"
+            and (selection_filters or should_list_selection(selected_prs))
+        ):
+            print(
+                f"Listing pull requests #{min(selected_prs)}-#{max(selected_prs)} "
+                "to resolve the selection..."
+            )
+            try:
+                with trace_span("resolve selection", prs=len(selected_prs)):
+                    listed = list_pull_requests(
+                        min(selected_prs),
+                        max(selected_prs),
+                        state=args.state,
+                        labels=args.label,
+                        author=args.author,
+                        created_since=args.created_since,
+                        created_until=args.created_until,
+                    )
+            except (
+                subprocess.CalledProcessError, json.JSONDecodeError, KeyError, GraphQLError
+            ) as exc:
+                if selection_filters:
+                    print(f"Error: Could not list pull requests to apply the filters: {exc}")
+                    sys.exit(1)
+                print(f"Warning: Could not list pull requests, probing each number: {exc}")
+            else:
+                listed_numbers = {node["number"] for node in listed}
+                pipeline_prs = [pr for pr in selected_prs if pr in listed_numbers]
+                unresolved = [pr for pr in selected_prs if pr not in listed_numbers]
+                filter_note = " matching the filters" if selection_filters else ""
+                print(
+                    f"✓ {len(pipeline_prs)} of {len(selected_prs)} selected number(s) are "
+                    f"pull requests{filter_note}"
+                )
+                if unresolved:
+                    print(f"Skipping {len(unresolved)}: {format_pr_selection(unresolved)}")
+                if not pipeline_prs:
+                    print("Error: No valid PRs found for the requested selection")
+                    sys.exit(1)
 
         print(f"Collecting info for PR selection: {selection_canonical}...")
         pr_infos: List[Dict[str, str]] = []
         touched_files: Set[str] = set()
         missing_prs: List[int] = []
-
-        for pr_num in selected_prs:
+        bulk_data: Dict[int, Dict[str, object] | None] = {}
+        cache: PrMetadataCache | None = None
+        fingerprints: Dict[int, str] = {}
+        if args.cache_dir:
+            with trace_span("PR cache revalidation", prs=len(pipeline_prs)):
+                cache = PrMetadataCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+                fingerprints = fetch_pr_fingerprints(pipeline_prs)
+                for pr_num in pipeline_prs:
+                    cached_bundle = cache.get_pr(pr_num, fingerprints.get(pr_num))
+                    if cached_bundle is not None:
+                        bulk_data[pr_num] = cached_bundle
+            print(f"Cache hits: {len(bulk_data)}/{len(pipeline_prs)} PR(s) in {args.cache_dir}")
+
+        bulk_repo: Tuple[str, str] | None = None
+        if args.graphql_batch_size and len(bulk_data) < len(pipeline_prs):
             try:
-                pr_info = get_pr_info(pr_num)
-                pr_infos.append(pr_info)
-                print(f"  PR #{pr_num}: {pr_info['title']}")
+                bulk_repo = get_repo_owner_and_name()
             except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
-                print(f"  PR #{pr_num}: Not found or inaccessible ({exc})")
-                missing_prs.append(pr_num)
+                print(f"Warning: Could not resolve repository for bulk fetch: {exc}")
+
+        manifest = ArtifactManifest(args.output_dir)
+        ctx = PipelineContext(
+            args,
+            variants_requested,
+            manifest,
+            cache=cache,
+            fingerprints=fingerprints,
+            bulk_data=bulk_data,
+            bulk_repo=bulk_repo,
+            log_spool_dir=log_spool_dir,
+            archive=archive,
+        )
+        stages = build_pipeline_stages(ctx, len(pipeline_prs))
+        print(
+            f"Processing {len(pipeline_prs)} PR(s) through the "
+            f"{' -> '.join(stage.name for stage in stages)} pipeline..."
+        )
+        with trace_span("PR pipeline", prs=len(pipeline_prs)):
+            states = run_pipeline(pipeline_prs, stages)
+
+        process_results: List[Dict[str, object] | None] = []
+        for state in states:
+            if state["info"] is None:
+                missing_prs.append(state["number"])
+            else:
+                pr_infos.append(state["info"])
+                process_results.append(state.get("result"))
+
+        print("\nPipeline stages:")
+        for stage in stages:
+            print(stage.summary_line())
+        print(f"\nDiff generation timings ({stages[-1].workers} worker(s)):")
+        for line in ctx.diff_timings.summary_lines():
+            print(line)
 
         if not pr_infos:
             print("Error: No valid PRs found for the requested selection")
             sys.exit(1)
+        if not ctx.base_fetched:
+            print(
+                f"Warning: Could not fetch {args.base_branch} from {args.remote}; "
+                "using the local ref"
+            )
+            ctx.base_sha = resolve_commit(args.base_branch)
+        if args.incremental:
+            print(
+                f"Incremental: {len(ctx.reused)}/{len(pr_infos)} PR(s) unchanged since the "
+                "last run"
+            )
+        if cache:
+            evicted = cache.evict()
+            if evicted:
+                print(f"Evicted {evicted} least recently used cache file(s)")
 
         successful_prs: List[Tuple[Dict[str, str], str]] = []
         successful_prs_with_logs: List[Tuple[Dict[str, str], str]] = []
         processed_prs: List[Dict[str, object]] = []
         processed_prs_with_logs: List[Dict[str, object]] = []
-
-        for pr_info in pr_infos:
-            print(f"\n--- Processing PR #{pr_info['number']}: {pr_info['title']} ---")
-
-            try:
-                all_files = get_pr_changed_files(pr_info["number"])
-            except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
-                print(f"Failed to retrieve files for PR #{pr_info['number']}: {exc}")
+        for result in process_results:
+            if result is None:
                 continue
-
-            if not all_files:
-                print(f"No changed files found for PR #{pr_info['number']}")
-                continue
-
-            print(f"Total changed files: {len(all_files)}")
-
-            try:
-                local_branch = checkout_pr_branch(pr_info, args.remote)
-            except subprocess.CalledProcessError:
-                print(f"Failed to checkout branch for PR #{pr_info['number']}")
-                continue
-
-            existing_files, deleted_files = filter_existing_files(all_files)
-            if not existing_files and deleted_files:
-                print(
-                    f"No existing files to process for PR #{pr_info['number']} "
-                    "(all files were deleted)"
-                )
-                continue
-
-            print(
-                f"Files to process ({len(existing_files)}): "
-                f"{', '.join(existing_files)}"
-            )
-            touched_files.update(existing_files)
-
-            try:
-                comments = get_pr_comments(pr_info["number"])
-            except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
-                print(f"Failed to retrieve comments for PR #{pr_info['number']}: {exc}")
-                comments = []
-
-            try:
-                checks_with_logs: List[Dict[str, str]] = []
-                checks = get_pr_checks(pr_info["number"])
-            except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
-                print(f"Failed to retrieve checks for PR #{pr_info['number']}: {exc}")
-                checks = []
-                checks_with_logs = []
-            else:
-                for check in checks:
-                    check_copy = dict(check)
-                    logs = get_failed_check_logs(check_copy)
-                    if logs:
-                        check_copy["logOutput"] = logs
-                    checks_with_logs.append(check_copy)
-
-            output_file = os.path.join(
-                args.output_dir, f"pr-{pr_info['number']}-implementation.txt"
-            )
-            output_file_with_logs = os.path.join(
-                args.output_dir, f"pr-{pr_info['number']}-implementation-with-logs.txt"
-            )
-            if run_big_picture(
-                pr_info,
-                existing_files,
-                comments,
-                checks,
-                output_file,
-                include_logs=False,
-                base_branch=args.base_branch,
-                local_branch=local_branch,
-            ):
-                successful_prs.append((pr_info, output_file))
+            pr_info = result["info"]
+            touched_files.update(result["files"])
+            if result["file"]:
+                successful_prs.append((pr_info, result["file"]))
                 processed_prs.append(
                     {
                         "info": pr_info,
-                        "file": output_file,
-                        "local_branch": local_branch,
-                        "files": existing_files,
+                        "file": result["file"],
+                        "local_branch": result["local_branch"],
+                        "merge_base": result["merge_base"],
+                        "files": result["files"],
+                        "head": result["head"],
                     }
                 )
-            if run_big_picture(
-                pr_info,
-                existing_files,
-                comments,
-                checks_with_logs,
-                output_file_with_logs,
-                include_logs=True,
-                base_branch=args.base_branch,
-                local_branch=local_branch,
-            ):
-                successful_prs_with_logs.append((pr_info, output_file_with_logs))
+            if result["file_with_logs"]:
+                successful_prs_with_logs.append((pr_info, result["file_with_logs"]))
                 processed_prs_with_logs.append(
                     {
                         "info": pr_info,
-                        "file": output_file_with_logs,
-                        "local_branch": local_branch,
-                        "files": existing_files,
+                        "file": result["file_with_logs"],
+                        "local_branch": result["local_branch"],
+                        "merge_base": result["merge_base"],
+                        "files": result["files"],
+                        "head": result["head"],
                     }
                 )
 
-        if successful_prs:
+        if successful_prs or successful_prs_with_logs:
             requested_count = len(selected_prs)
-            processed_numbers = {info["number"] for info, _ in successful_prs}
+            processed_numbers = {
+                info["number"] for info, _ in successful_prs + successful_prs_with_logs
+            }
             processed_count = len(processed_numbers)
-            skipped_prs = [pr for pr in selected_prs if pr not in processed_numbers]
+            skipped_prs = [pr for pr in pipeline_prs if pr not in processed_numbers]
             print(
                 f"\nRequested PR count: {requested_count}; "
                 f"processed PR count: {processed_count}"
@@ -940,117 +4902,336 @@ def main() -> None:
             if skipped_prs:
                 print(f"Skipped PRs after processing: {', '.join(map(str, skipped_prs))}")
 
-            master_output = os.path.join(
-                args.output_dir, f"pr-comparison-{selection_tag}.txt"
-            )
-            create_master_comparison(
-                successful_prs,
-                selection_requested,
-                selection_canonical,
-                selected_prs,
-                master_output,
-            )
+        master_output = os.path.join(
+            args.output_dir, f"pr-comparison-{selection_tag}.txt"
+        )
+        touched_output = os.path.join(
+            args.output_dir, f"pr-touched-files-{selection_tag}.txt"
+        )
+        summary_output = os.path.join(
+            args.output_dir, f"pr-summaries-{selection_tag}.txt"
+        )
+        master_output_with_logs = os.path.join(
+            args.output_dir, f"pr-comparison-{selection_tag}-with-logs.txt"
+        )
+        touched_output_with_logs = os.path.join(
+            args.output_dir, f"pr-touched-files-{selection_tag}-with-logs.txt"
+        )
+        summary_output_with_logs = os.path.join(
+            args.output_dir, f"pr-summaries-{selection_tag}-with-logs.txt"
+        )
 
-            summary_output = os.path.join(
-                args.output_dir, f"pr-summaries-{selection_tag}.txt"
-            )
-            create_summary_compilation(
-                successful_prs,
-                selection_requested,
-                selection_canonical,
-                selected_prs,
-                summary_output,
+        # Compilations are rebuilt together whenever any PR they include, the
+        # base branch or the selection changed.
+        compiled_results = [result for result in process_results if result is not None]
+        compilation_inputs: Dict[str, object] = {
+            "kind": "compilation",
+            "selection": [selection_requested, selection_canonical],
+            "base": ctx.base_sha,
+            "base_branch": args.base_branch,
+            "max_file_bytes": args.max_file_bytes,
+            "prs": [[result["info"]["number"], result["keys"]] for result in compiled_results],
+        }
+        compilation_outputs: List[str] = []
+        if successful_prs:
+            compilation_outputs += [master_output, summary_output]
+            if touched_files:
+                compilation_outputs.append(touched_output)
+        if successful_prs_with_logs:
+            compilation_outputs += [master_output_with_logs, summary_output_with_logs]
+            if touched_files:
+                compilation_outputs.append(touched_output_with_logs)
+        compilations_current = (
+            args.incremental
+            and all(result["keys"] for result in compiled_results)
+            and all(
+                manifest.is_current(output, compilation_inputs)
+                for output in compilation_outputs
             )
+        )
+        if compilations_current:
+            print("\nCompilations are unchanged since the last run; reusing them")
+        else:
+            with trace_span("compilations", outputs=len(compilation_outputs)):
+                # Both variants share the same touched-file section, so it is read
+                # from git once. The touched-files compilations end with the master
+                # comparison, so their file sections are written first and the
+                # master writer then fills both files in one pass.
+                touched_targets: List[Tuple[str, bool]] = []
+                if successful_prs:
+                    touched_targets.append((touched_output, False))
+                if successful_prs_with_logs:
+                    touched_targets.append((touched_output_with_logs, True))
+                touched_created = bool(touched_targets) and create_touched_files_compilation(
+                    touched_files,
+                    args.base_branch,
+                    selection_requested,
+                    selection_canonical,
+                    selected_prs,
+                    touched_targets[0][0],
+                    include_logs=touched_targets[0][1],
+                    extra_outputs=touched_targets[1:],
+                    max_file_bytes=args.max_file_bytes,
+                )
 
-            touched_output = os.path.join(
-                args.output_dir, f"pr-touched-files-{selection_tag}.txt"
-            )
-            create_touched_files_compilation(
-                touched_files,
-                args.base_branch,
-                selection_requested,
-                selection_canonical,
-                selected_prs,
-                touched_output,
-                master_output,
-            )
-            round_robin_outputs = create_round_robin_comparisons(
-                processed_prs,
-                args.output_dir,
-                selection_requested,
-                selection_canonical,
-                selected_prs,
-            )
+                if successful_prs:
+                    create_master_comparison(
+                        successful_prs,
+                        selection_requested,
+                        selection_canonical,
+                        selected_prs,
+                        master_output,
+                        mirror_outputs=[touched_output] if touched_created else None,
+                    )
+                    create_summary_compilation(
+                        successful_prs,
+                        selection_requested,
+                        selection_canonical,
+                        selected_prs,
+                        summary_output,
+                    )
+
+                if successful_prs_with_logs:
+                    create_master_comparison(
+                        successful_prs_with_logs,
+                        selection_requested,
+                        selection_canonical,
+                        selected_prs,
+                        master_output_with_logs,
+                        include_logs=True,
+                        mirror_outputs=[touched_output_with_logs] if touched_created else None,
+                    )
+                    create_summary_compilation(
+                        successful_prs_with_logs,
+                        selection_requested,
+                        selection_canonical,
+                        selected_prs,
+                        summary_output_with_logs,
+                        include_logs=True,
+                    )
+
+                for output in compilation_outputs:
+                    if os.path.exists(output):
+                        manifest.record(output, compilation_inputs)
+        if archive:
+            for output in compilation_outputs:
+                archive.add_output(output)
 
+        if successful_prs:
             print(f"\n✓ Successfully processed {len(successful_prs)} PR(s) (without logs)")
             print(f"✓ Individual files: {args.output_dir}/pr-{{num}}-implementation.txt")
             print(f"✓ Master comparison: {master_output}")
             print(f"✓ Summary compilation: {summary_output}")
             print(f"✓ Touched files compilation: {touched_output}")
-            if round_robin_outputs:
-                print(
-                    "✓ Round-robin comparisons: "
-                    f"{args.output_dir}/pr-{{left}}-versus-{{right}}.txt"
-                )
+        elif "plain" not in variants_requested:
+            print("\nSkipped the plain variant (not requested with --variants)")
         else:
             print("\nNo PRs were successfully processed (without logs)")
 
         if successful_prs_with_logs:
-            master_output_with_logs = os.path.join(
-                args.output_dir, f"pr-comparison-{selection_tag}-with-logs.txt"
-            )
-            create_master_comparison(
-                successful_prs_with_logs,
-                selection_requested,
-                selection_canonical,
-                selected_prs,
-                master_output_with_logs,
-                include_logs=True,
-            )
-
-            summary_output_with_logs = os.path.join(
-                args.output_dir, f"pr-summaries-{selection_tag}-with-logs.txt"
-            )
-            create_summary_compilation(
-                successful_prs_with_logs,
-                selection_requested,
-                selection_canonical,
-                selected_prs,
-                summary_output_with_logs,
-                include_logs=True,
-            )
-
-            touched_output_with_logs = os.path.join(
-                args.output_dir, f"pr-touched-files-{selection_tag}-with-logs.txt"
-            )
-            create_touched_files_compilation(
-                touched_files,
-                args.base_branch,
-                selection_requested,
-                selection_canonical,
-                selected_prs,
-                touched_output_with_logs,
-                master_output_with_logs,
-                include_logs=True,
-            )
-
             print(f"\n✓ Successfully processed {len(successful_prs_with_logs)} PR(s) (with logs)")
             print(f"✓ Individual files (with logs): {args.output_dir}/pr-{{num}}-implementation-with-logs.txt")
             print(f"✓ Master comparison (with logs): {master_output_with_logs}")
             print(f"✓ Summary compilation (with logs): {summary_output_with_logs}")
             print(f"✓ Touched files compilation (with logs): {touched_output_with_logs}")
+        elif "logs" not in variants_requested:
+            print("\nSkipped the with-logs variant (not requested with --variants)")
         else:
             print("\nNo PRs were successfully processed (with logs)")
 
+        if args.chunk_tokens:
+            chunked = [
+                output
+                for output in (
+                    master_output,
+                    touched_output,
+                    master_output_with_logs,
+                    touched_output_with_logs,
+                )
+                if output in compilation_outputs and os.path.exists(output)
+            ]
+            with trace_span("chunk compilations", outputs=len(chunked)):
+                for output in chunked:
+                    chunks = write_compilation_chunks(output, args.chunk_tokens)
+                    if archive:
+                        for chunk in chunks:
+                            archive.add(
+                                chunk,
+                                f"{os.path.basename(chunk_output_dir(output))}/"
+                                f"{os.path.basename(chunk)}",
+                            )
+                    print(
+                        f"✓ Split {os.path.basename(output)} into {len(chunks)} chunk(s) of "
+                        f"at most {args.chunk_tokens} estimated tokens: {chunk_output_dir(output)}"
+                    )
+
+        # Round-robin diffs compare PR heads directly, so they do not depend on
+        # which rendered variants were requested.
+        round_robin_source = processed_prs or processed_prs_with_logs
+        hunk_overlaps: Dict[Tuple[int, int], Dict[str, int]] = {}
+        if round_robin_source and (args.conflicts or args.round_robin == "conflicting"):
+            with trace_span("hunk overlaps", prs=len(round_robin_source)):
+                hunk_ranges = run_parallel(
+                    lambda entry: collect_hunk_ranges(entry, args.base_branch),
+                    round_robin_source,
+                    args.diff_jobs or args.jobs,
+                )
+                pr_ranges = {
+                    entry["info"]["number"]: ranges
+                    for entry, ranges in zip(round_robin_source, hunk_ranges)
+                }
+                hunk_overlaps = find_hunk_overlaps(pr_ranges)
+            print(
+                f"\n{len(hunk_overlaps)} PR pair(s) edit overlapping base lines "
+                "and may conflict"
+            )
+            if args.conflicts:
+                conflict_csv, conflict_json, hot_spot_report = create_conflict_report(
+                    list(pr_ranges), pr_ranges, hunk_overlaps, args.output_dir, selection_tag
+                )
+                print(f"✓ Conflict matrix: {conflict_csv} and {conflict_json}")
+                print(f"✓ Hot-spot report: {hot_spot_report}")
+                if archive:
+                    for report in (conflict_csv, conflict_json, hot_spot_report):
+                        archive.add(report)
+        if round_robin_source:
+            round_robin_pairs = select_round_robin_pairs(
+                round_robin_source,
+                mode=args.round_robin,
+                top_k=args.round_robin_top_k,
+                explicit_pairs=explicit_pairs,
+                conflict_pairs=list(hunk_overlaps),
+            )
+            by_number = {entry["info"]["number"]: entry for entry in round_robin_source}
+            pair_inputs = {
+                pair: round_robin_pair_inputs(
+                    by_number[pair[0]],
+                    by_number[pair[1]],
+                    selection_requested,
+                    selection_canonical,
+                    ctx.diff_options,
+                )
+                for pair in round_robin_pairs
+            }
+            # Pairs whose PR heads are unknown cannot be fingerprinted reliably.
+            trackable_pairs = {
+                pair
+                for pair in round_robin_pairs
+                if by_number[pair[0]].get("head") and by_number[pair[1]].get("head")
+            }
+            stale_pairs = round_robin_pairs
+            if args.incremental:
+                stale_pairs = [
+                    pair
+                    for pair in round_robin_pairs
+                    if pair not in trackable_pairs
+                    or not manifest.is_current(
+                        round_robin_output_path(args.output_dir, *pair), pair_inputs[pair]
+                    )
+                ]
+                print(
+                    f"Incremental: {len(round_robin_pairs) - len(stale_pairs)}/"
+                    f"{len(round_robin_pairs)} round-robin pair(s) unchanged since the last run"
+                )
+            round_robin_outputs: Set[str] = set()
+            if stale_pairs or not round_robin_pairs:
+                with trace_span("round-robin comparisons", pairs=len(stale_pairs)):
+                    round_robin_outputs.update(
+                        create_round_robin_comparisons(
+                            round_robin_source,
+                            args.output_dir,
+                            selection_requested,
+                            selection_canonical,
+                            selected_prs,
+                            pairs=stale_pairs,
+                            jobs=args.diff_jobs or args.jobs,
+                            stat_only=args.stat_only,
+                            max_diff_bytes_per_file=args.max_diff_bytes_per_file,
+                        )
+                    )
+            for pair in stale_pairs:
+                output = round_robin_output_path(args.output_dir, *pair)
+                if pair in trackable_pairs and output in round_robin_outputs:
+                    manifest.record(output, pair_inputs[pair])
+            if archive:
+                for pair in round_robin_pairs:
+                    archive.add_output(round_robin_output_path(args.output_dir, *pair))
+            if round_robin_outputs or len(stale_pairs) < len(round_robin_pairs):
+                print(
+                    "✓ Round-robin comparisons: "
+                    f"{args.output_dir}/pr-{{left}}-versus-{{right}}.txt"
+                )
+
+        if args.similarity and round_robin_source:
+            if np is None:
+                print("\nNumPy is not installed; computing PR similarity in pure Python")
+            similarity_csv, similarity_json, clusters = create_similarity_report(
+                round_robin_source,
+                args.output_dir,
+                selection_tag,
+                permutations=args.similarity_permutations,
+                threshold=args.similarity_threshold,
+            )
+            print(f"✓ Similarity matrix: {similarity_csv} and {similarity_json}")
+            if archive:
+                archive.add(similarity_csv)
+                archive.add(similarity_json)
+            if clusters:
+                print(
+                    f"✓ {len(clusters)} cluster(s) of PRs with estimated similarity "
+                    f">= {args.similarity_threshold:g}:"
+                )
+                for cluster in clusters:
+                    print(f"  {format_pr_selection(cluster)}")
+            else:
+                print(f"No PR pairs reach an estimated similarity of {args.similarity_threshold:g}")
+
+        manifest.save()
+
     except KeyboardInterrupt:
         print("\nInterrupted by user")
     finally:
-        if not args.no_cleanup:
+        shutil.rmtree(log_spool_dir, ignore_errors=True)
+        # A failed archive must not skip returning to the base branch, so its
+        # error is re-raised only once the rest of the cleanup has run.
+        archive_error: Exception | None = None
+        if archive:
+            try:
+                toc_path = archive.close()
+            except Exception as exc:
+                archive_error = exc
+                print(f"Error: Could not write archive {archive.path}: {exc}")
+            else:
+                size_mib = os.path.getsize(archive.path) / (1024 * 1024)
+                print(
+                    f"✓ Archive: {archive.path} ({len(archive.members)} member(s), "
+                    f"{size_mib:.2f} MiB); table of contents: {toc_path}"
+                )
+        stats = scheduler.stats
+        print(
+            f"\nGitHub API calls: {stats['calls']} "
+            f"(retries: {stats['retries']}, paced for {stats['waited_seconds']:.1f}s)"
+        )
+        if cassette:
+            configure_cassette(None)
+            if cassette.replay:
+                print(f"Replayed {cassette.stats['replayed']} command(s) from {args.replay}")
+            else:
+                print(f"Recorded {cassette.stats['recorded']} command(s) to {args.record}")
+        if not args.no_cleanup and not args.checkout_free:
             try:
                 checkout_base_branch(args.base_branch)
                 print(f"✓ Returned to {args.base_branch} branch")
             except subprocess.CalledProcessError:
                 print(f"Warning: Failed to return to {args.base_branch} branch")
+        if tracer:
+            disable_tracing()
+            tracer.write(args.trace)
+            print(f"\nSlowest operations (trace written to {args.trace}):")
+            for line in tracer.summary_lines(args.trace_top):
+                print(line)
+        if archive_error is not None:
+            raise archive_error
 
 
 if __name__ == "__main__":
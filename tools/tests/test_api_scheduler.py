@@ -0,0 +1,241 @@
+import json
+import subprocess
+import sys
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _scheduler(clock: FakeClock, **kwargs) -> pr_batch.ApiScheduler:
+    return pr_batch.ApiScheduler(sleep=clock.sleep, clock=clock, **kwargs)
+
+
+def _rate_limited() -> subprocess.CalledProcessError:
+    return subprocess.CalledProcessError(
+        1, "gh pr view 1", stderr="HTTP 403: You have exceeded a secondary rate limit"
+    )
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_unpaced_by_default(self) -> None:
+        clock = FakeClock()
+        scheduler = _scheduler(clock)
+        for _ in range(50):
+            scheduler.call(lambda: None)
+        self.assertEqual(clock.sleeps, [])
+
+    def test_paces_after_burst(self) -> None:
+        clock = FakeClock()
+        scheduler = _scheduler(clock, rate=2.0)
+        for _ in range(6):
+            scheduler.call(lambda: None)
+        # Two calls ride the initial burst; four more need half a second each.
+        self.assertAlmostEqual(sum(clock.sleeps), 2.0)
+        self.assertAlmostEqual(scheduler.stats["waited_seconds"], 2.0)
+
+
+class TestRetries(unittest.TestCase):
+    def test_retries_transient_failures_with_backoff(self) -> None:
+        clock = FakeClock()
+        scheduler = _scheduler(clock, retries=3)
+        outcomes = [
+            _rate_limited(),
+            subprocess.CalledProcessError(1, "gh", stderr="HTTP 502"),
+            "ok",
+        ]
+
+        def flaky():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with mock.patch.object(pr_batch.random, "uniform", side_effect=lambda low, high: high):
+            self.assertEqual(scheduler.call(flaky), "ok")
+        self.assertEqual(clock.sleeps, [1.0, 2.0])
+        self.assertEqual(scheduler.stats["retries"], 2)
+
+    def test_permanent_failures_are_not_retried(self) -> None:
+        clock = FakeClock()
+        scheduler = _scheduler(clock, retries=3)
+        error = subprocess.CalledProcessError(
+            1, "gh", stderr="GraphQL: Could not resolve to a PullRequest"
+        )
+        calls = []
+
+        def missing():
+            calls.append(1)
+            raise error
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            scheduler.call(missing)
+        self.assertEqual(len(calls), 1)
+
+    def test_status_numbers_in_permanent_errors_are_not_retried(self) -> None:
+        for stderr in (
+            "GraphQL: Could not resolve to a PullRequest with the number of 502.",
+            "no checks reported on the 'pr-503' branch",
+        ):
+            with self.subTest(stderr=stderr):
+                scheduler = _scheduler(FakeClock(), retries=3)
+                error = subprocess.CalledProcessError(1, "gh", stderr=stderr)
+                runner = mock.Mock(side_effect=error)
+                with self.assertRaises(subprocess.CalledProcessError):
+                    scheduler.call(runner)
+                self.assertEqual(runner.call_count, 1)
+        self.assertTrue(pr_batch.TRANSIENT_API_ERROR.search("gh: HTTP 503: Service Unavailable"))
+
+    def test_gives_up_after_retries(self) -> None:
+        clock = FakeClock()
+        scheduler = _scheduler(clock, retries=2)
+
+        def always_limited():
+            raise _rate_limited()
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            scheduler.call(always_limited)
+        self.assertEqual(len(clock.sleeps), 2)
+
+    def test_graphql_rate_limited_payload_is_retried(self) -> None:
+        limited = json.dumps({"data": None, "errors": [{"type": "RATE_LIMITED", "message": "x"}]})
+        ok = json.dumps({"data": {"repository": {}}})
+        clock = FakeClock()
+        scheduler = _scheduler(clock, retries=2)
+        with mock.patch.object(pr_batch, "run_command", side_effect=[limited, ok]), \
+                mock.patch.object(pr_batch, "_API_SCHEDULER", scheduler):
+            payload = pr_batch.run_graphql_query("{ x }")
+        self.assertEqual(payload["data"], {"repository": {}})
+        self.assertEqual(len(clock.sleeps), 1)
+
+
+class TestGraphQLTransientFailures(unittest.TestCase):
+    OK = json.dumps({"data": {"repository": {}}})
+
+    def _run(self, *outcomes):
+        clock = FakeClock()
+        scheduler = _scheduler(clock, retries=2)
+        runner = mock.Mock(side_effect=list(outcomes))
+        with mock.patch.object(pr_batch, "run_command", runner), \
+                mock.patch.object(pr_batch, "_API_SCHEDULER", scheduler):
+            payload = pr_batch.run_graphql_query("{ x }")
+        return payload, runner.call_count
+
+    @staticmethod
+    def _failed(output: str = "", stderr: str = "") -> subprocess.CalledProcessError:
+        return subprocess.CalledProcessError(1, "gh api graphql", output=output, stderr=stderr)
+
+    def test_secondary_rate_limit_body_is_retried(self) -> None:
+        body = json.dumps(
+            {
+                "message": "You have exceeded a secondary rate limit.",
+                "documentation_url": "https://docs.github.com/rest",
+            }
+        )
+        payload, calls = self._run(self._failed(body, "HTTP 403"), self.OK)
+        self.assertEqual(payload["data"], {"repository": {}})
+        self.assertEqual(calls, 2)
+
+    def test_empty_output_from_failed_gh_is_retried(self) -> None:
+        _, calls = self._run(self._failed("", "connection closed"), self.OK)
+        self.assertEqual(calls, 2)
+
+    def test_gateway_html_page_is_retried(self) -> None:
+        html = "<html><body><h1>502 Bad Gateway</h1></body></html>"
+        _, calls = self._run(self._failed(html, "HTTP 502"), self.OK)
+        self.assertEqual(calls, 2)
+
+    def test_transient_stderr_without_data_is_retried(self) -> None:
+        body = json.dumps({"errors": [{"message": "Something went wrong"}]})
+        _, calls = self._run(self._failed(body, "gh: HTTP 504: Gateway Timeout"), self.OK)
+        self.assertEqual(calls, 2)
+
+    def test_partial_errors_with_data_are_returned(self) -> None:
+        body = json.dumps(
+            {
+                "data": {"repository": {"pr1": None}},
+                "errors": [{"type": "NOT_FOUND", "message": "Could not resolve"}],
+            }
+        )
+        payload, calls = self._run(self._failed(body, "GraphQL: Could not resolve"))
+        self.assertEqual(payload["errors"][0]["type"], "NOT_FOUND")
+        self.assertEqual(calls, 1)
+
+    def test_permanent_errors_are_not_retried(self) -> None:
+        body = json.dumps({"errors": [{"message": "Field 'nope' doesn't exist"}]})
+        with self.assertRaises(pr_batch.GraphQLError):
+            self._run(self._failed(body, "GraphQL: Field 'nope' doesn't exist"))
+
+    def test_gives_up_with_graphql_error(self) -> None:
+        with self.assertRaises(pr_batch.GraphQLError):
+            self._run(*[self._failed("", "")] * 3)
+
+
+class TestQuotaPacing(unittest.TestCase):
+    def test_spreads_remaining_quota_until_reset(self) -> None:
+        clock = FakeClock()
+        reset_at = time.time() + 100
+        scheduler = _scheduler(
+            clock, quota_reader=lambda: (pr_batch.API_QUOTA_RESERVE + 100, reset_at)
+        )
+        for _ in range(4):
+            scheduler.call(lambda: None)
+        # About one call per second is left, so calls after the burst wait ~1s.
+        self.assertEqual(len(clock.sleeps), 3)
+        self.assertTrue(all(0.9 < pause < 1.1 for pause in clock.sleeps))
+
+    def test_plentiful_quota_is_not_spread(self) -> None:
+        clock = FakeClock()
+        scheduler = _scheduler(clock, quota_reader=lambda: (5000, time.time() + 3600))
+        for _ in range(20):
+            scheduler.call(lambda: None)
+        self.assertEqual(clock.sleeps, [])
+
+    def test_pauses_until_reset_when_exhausted(self) -> None:
+        clock = FakeClock()
+        quotas = [(3, time.time() + 30), (5000, time.time() + 3600)]
+        scheduler = _scheduler(clock, quota_reader=lambda: quotas.pop(0))
+        scheduler.call(lambda: None)
+        self.assertEqual(len(clock.sleeps), 1)
+        self.assertTrue(29 < clock.sleeps[0] <= 30)
+        # The quota is read again before the next call spends any of it.
+        scheduler.call(lambda: None)
+        self.assertEqual(quotas, [])
+        self.assertEqual(len(clock.sleeps), 1)
+
+    def test_read_api_quota_takes_the_tighter_resource(self) -> None:
+        payload = json.dumps(
+            {
+                "resources": {
+                    "core": {"remaining": 4000, "reset": 1700000000},
+                    "graphql": {"remaining": 120, "reset": 1700000500},
+                }
+            }
+        )
+        with mock.patch.object(pr_batch, "run_command", return_value=payload):
+            self.assertEqual(pr_batch.read_api_quota(), (120, 1700000500.0))
+        with mock.patch.object(
+            pr_batch, "run_command", side_effect=subprocess.CalledProcessError(1, "gh")
+        ):
+            self.assertIsNone(pr_batch.read_api_quota())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_benchmark as bench
+import pr_batch_big_picture as pr_batch
+
+
+class TestArtifactArchive(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.out = Path(self.tmp.name)
+        self.first = self.out / "pr-1-implementation.txt"
+        self.first.write_text("diff one\n" * 300)
+        pr_batch.write_section_index(
+            str(self.first), [pr_batch.section_record(1, None, "pr", 0, 9)]
+        )
+        self.second = self.out / "pr-1-versus-2.txt"
+        self.second.write_text("pair\n")
+
+    def _build(self, name: str) -> pr_batch.ArtifactArchive:
+        archive = pr_batch.ArtifactArchive(str(self.out / name))
+        archive.add_output(str(self.first))
+        archive.add_output(str(self.second))
+        archive.add(str(self.second))  # duplicates are skipped
+        archive.add_output(str(self.out / "missing.txt"))
+        archive.close()
+        return archive
+
+    def _check_members(self, archive_path: str, names) -> None:
+        expected = [
+            "pr-1-implementation.txt",
+            "pr-1-implementation.index.jsonl",
+            "pr-1-versus-2.txt",
+            pr_batch.ARCHIVE_TOC_MEMBER,
+        ]
+        self.assertEqual(names, expected)
+        toc = json.loads(Path(archive_path + pr_batch.ARCHIVE_TOC_SUFFIX).read_text())
+        self.assertEqual([member["name"] for member in toc["members"]], expected[:3])
+        self.assertEqual(
+            pr_batch.read_archive_member(archive_path, "pr-1-versus-2.txt"), b"pair\n"
+        )
+        self.assertEqual(
+            pr_batch.read_archive_member(archive_path, "pr-1-implementation.txt"),
+            self.first.read_bytes(),
+        )
+        with self.assertRaises(KeyError):
+            pr_batch.read_archive_member(archive_path, "nope.txt")
+
+    def test_tar_gz_is_a_regular_tarball_with_per_member_access(self) -> None:
+        archive = self._build("artifacts.tar.gz")
+        with tarfile.open(archive.path, "r:gz") as tar:
+            names = tar.getnames()
+            self.assertEqual(tar.extractfile("pr-1-versus-2.txt").read(), b"pair\n")
+        self._check_members(archive.path, names)
+
+    def test_zip(self) -> None:
+        archive = self._build("artifacts.zip")
+        with zipfile.ZipFile(archive.path) as zipped:
+            names = zipped.namelist()
+        self._check_members(archive.path, names)
+
+    @unittest.skipIf(pr_batch.zstandard is None, "zstandard is not installed")
+    def test_tar_zst(self) -> None:
+        archive = self._build("artifacts.tar.zst")
+        with open(archive.path, "rb") as handle:
+            reader = pr_batch.zstandard.ZstdDecompressor().stream_reader(
+                handle, read_across_frames=True
+            )
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                names = [member.name for member in tar]
+        self._check_members(archive.path, names)
+
+    def test_zst_falls_back_to_gzip_without_zstandard(self) -> None:
+        with mock.patch.object(pr_batch, "zstandard", None):
+            self.assertEqual(pr_batch.resolve_archive_path("out.tar.zst"), "out.tar.gz")
+        self.assertEqual(pr_batch.resolve_archive_path("out.zip"), "out.zip")
+        self.assertIsNone(pr_batch.archive_format("out.rar"))
+
+    def test_writer_errors_surface_on_close(self) -> None:
+        archive = pr_batch.ArtifactArchive(str(self.out / "broken.tar.gz"))
+        archive.add(str(self.out / "does-not-exist.txt"))
+        with self.assertRaises(FileNotFoundError):
+            archive.close()
+        self.assertFalse(os.path.exists(archive.path + pr_batch.ARCHIVE_TOC_SUFFIX))
+
+
+class TestArchiveFailureCleanup(unittest.TestCase):
+    def test_failed_archive_still_returns_to_base_branch(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        work = Path(tmp.name)
+        fixture = bench.build_synthetic_repo(work, 2, 2, 5, 0.0, 2, 3)
+        fixture_path = work / "fixture.json"
+        fixture_path.write_text(json.dumps(fixture))
+        bin_dir = work / "bin"
+        bench.install_fake_gh(bin_dir)
+        clone = work / "clone"
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(clone)
+        self.addCleanup(pr_batch.configure_api_scheduler, pr_batch.api_scheduler())
+        argv = [
+            "pr_batch_big_picture.py", "1-2", "--output-dir", str(work / "out"),
+            "--api-rate", "0", "--archive", str(work / "out.tar.gz"),
+            "--trace", str(work / "trace.json"),
+        ]
+        env = {
+            "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            "PR_BATCH_BENCH_FIXTURE": str(fixture_path),
+        }
+        with mock.patch.dict(os.environ, env), mock.patch.object(sys, "argv", argv), \
+                mock.patch.object(
+                    pr_batch.ArtifactArchive, "close", side_effect=OSError("disk full")
+                ), \
+                mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            with self.assertRaises(OSError):
+                pr_batch.main()
+
+        branch = subprocess.run(
+            ["git", "branch", "--show-current"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        self.assertEqual(branch, "main")
+        self.assertTrue((work / "trace.json").exists())
+        self.assertIn("Error: Could not write archive", stdout.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
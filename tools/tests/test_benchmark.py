@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_benchmark as bench
+
+
+class TestSyntheticRepo(unittest.TestCase):
+    def test_builds_pr_branches_with_shared_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            fixture = bench.build_synthetic_repo(
+                Path(tmp), 3, files_per_pr=4, lines_per_file=5, overlap=0.5, shared_files=4
+            )
+            origin = Path(tmp, "origin")
+            refs = subprocess.run(
+                ["git", "for-each-ref", "--format=%(refname)", "refs/pull"],
+                cwd=origin, capture_output=True, text=True, check=True,
+            ).stdout.split()
+            self.assertEqual(sorted(refs), [f"refs/pull/{n}/head" for n in (1, 2, 3)])
+            self.assertTrue(Path(tmp, "clone", "shared", "module_000.txt").exists())
+
+        files = [set(fixture["prs"][n]["files"]) for n in ("1", "2", "3")]
+        self.assertTrue(all(len(paths) == 4 for paths in files))
+        shared = [{p for p in paths if p.startswith("shared/")} for paths in files]
+        self.assertTrue(all(len(paths) == 2 for paths in shared))
+        self.assertEqual(fixture["prs"]["2"]["run_id"], bench.RUN_ID_BASE + 2)
+
+
+class TestFakeGh(unittest.TestCase):
+    def _gh(self, tmp: str, *args: str) -> subprocess.CompletedProcess:
+        fixture = {
+            "owner": "o",
+            "name": "r",
+            "log_lines": 2,
+            "prs": {"4": {"branch": "pr-4", "files": ["a"], "run_id": 9, "head": "abc"}},
+        }
+        fixture_path = Path(tmp, "fixture.json")
+        fixture_path.write_text(json.dumps(fixture))
+        gh = bench.install_fake_gh(Path(tmp, "bin"))
+        env = dict(os.environ, PR_BATCH_BENCH_FIXTURE=str(fixture_path))
+        return subprocess.run([str(gh), *args], capture_output=True, text=True, env=env)
+
+    def test_serves_pr_view_run_logs_and_graphql(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            view = json.loads(self._gh(tmp, "pr", "view", "4", "--json", "files").stdout)
+            self.assertEqual(view["files"], [{"path": "a"}])
+            self.assertIn("/actions/runs/9/", view["statusCheckRollup"][0]["detailsUrl"])
+            self.assertEqual(len(self._gh(tmp, "run", "view", "9", "--log").stdout.splitlines()), 2)
+            query = "pr4: pullRequest(number: 4) { x } pr5: pullRequest(number: 5) { x }"
+            payload = json.loads(self._gh(tmp, "api", "graphql", "-f", f"query={query}").stdout)
+            self.assertEqual(payload["data"]["repository"]["pr4"]["headRefOid"], "abc")
+            self.assertIsNone(payload["data"]["repository"]["pr5"])
+            self.assertEqual(self._gh(tmp, "pr", "view", "5").returncode, 1)
+
+
+class TestRunBenchmark(unittest.TestCase):
+    def test_runs_full_pipeline_and_reports_metrics(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = bench.run_benchmark(
+                [2],
+                Path(tmp),
+                files_per_pr=2,
+                lines_per_file=5,
+                log_lines=3,
+                latency_ms=0,
+                pipeline_args=["--checkout-free"],
+            )
+            self.assertTrue(Path(tmp, "n2", "out", "pr-1-versus-2.txt").exists())
+
+        (result,) = results
+        self.assertEqual(result["prs"], 2)
+        self.assertEqual(result["exit_code"], 0)
+        self.assertGreater(result["subprocesses"], 0)
+        self.assertGreaterEqual(result["gh_calls"], 2)
+        self.assertGreater(result["bytes_written"], 0)
+        self.assertGreater(result["peak_rss_bytes"], 0)
+        self.assertEqual(len(bench.format_results(results)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import io
+import os
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+def _git(*args: str, cwd: str) -> None:
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+class TestGitBlobReader(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = self._tmp.name
+        _git("init", "-q", "-b", "main", cwd=self.repo)
+        Path(self.repo, "text.txt").write_text("line one\nno newline")
+        Path(self.repo, "utf8.txt").write_text("héllo wörld\n", encoding="utf-8")
+        Path(self.repo, "image.bin").write_bytes(b"\x89PNG\x00\x01\x02" * 10)
+        Path(self.repo, "big.txt").write_text("x" * 5000 + "\n")
+        _git("add", ".", cwd=self.repo)
+        _git(
+            "-c", "user.name=t", "-c", "user.email=t@example.com",
+            "commit", "-q", "-m", "init", cwd=self.repo,
+        )
+        self._cwd = os.getcwd()
+        os.chdir(self.repo)
+        self.reader = pr_batch.GitBlobReader()
+
+    def tearDown(self) -> None:
+        self.reader.close()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_streams_text_with_header_and_trailing_newline(self) -> None:
+        out = io.StringIO()
+        status, size = self.reader.stream_blob("main:text.txt", out, header="# h\n")
+        self.assertEqual((status, size), ("ok", 19))
+        self.assertEqual(out.getvalue(), "# h\nline one\nno newline\n")
+
+    def test_reuses_processes_across_lookups(self) -> None:
+        out = io.StringIO()
+        self.reader.stream_blob("main:utf8.txt", out)
+        check_proc, batch_proc = self.reader._check_proc, self.reader._batch_proc
+        self.reader.stream_blob("main:text.txt", out)
+        self.assertIs(self.reader._check_proc, check_proc)
+        self.assertIs(self.reader._batch_proc, batch_proc)
+        self.assertTrue(out.getvalue().startswith("héllo wörld\nline one\n"))
+
+    def test_skips_missing_binary_and_oversized(self) -> None:
+        out = io.StringIO()
+        self.assertEqual(self.reader.stream_blob("main:nope.txt", out), ("missing", 0))
+        self.assertEqual(self.reader.stream_blob("main:image.bin", out, header="# h\n")[0], "binary")
+        self.assertEqual(
+            self.reader.stream_blob("main:big.txt", out, max_bytes=1024), ("too-large", 5001)
+        )
+        self.assertEqual(out.getvalue(), "")
+        # The stream stays in sync after skipped objects.
+        self.assertEqual(self.reader.stream_blob("main:text.txt", out)[0], "ok")
+        self.assertEqual(out.getvalue(), "line one\nno newline\n")
+
+    def test_info_reports_type_and_size(self) -> None:
+        self.assertEqual(self.reader.info("main:big.txt"), ("blob", 5001))
+        self.assertIsNone(self.reader.info("main:nope.txt"))
+
+    def test_touched_files_compilation_skips_binary(self) -> None:
+        output = Path(self._tmp.name, "touched.txt")
+        pr_batch.create_touched_files_compilation(
+            {"text.txt", "image.bin", "gone.txt"}, "main", "1", "1", [1], str(output)
+        )
+        content = output.read_text()
+        self.assertIn("# File: text.txt\n# Source: main\n\nline one\nno newline\n\n\n", content)
+        self.assertNotIn("image.bin", content)
+        self.assertNotIn("gone.txt", content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import json
+import unittest
+from pathlib import Path
+import sys
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+def _page(nodes, has_next=False, cursor=None):
+    return {"pageInfo": {"hasNextPage": has_next, "endCursor": cursor}, "nodes": nodes}
+
+
+def _pr_node(number, files=None, files_has_next=False):
+    return {
+        "number": number,
+        "headRefName": f"feature-{number}",
+        "title": f"PR {number}",
+        "baseRefName": "main",
+        "body": "Body",
+        "author": {"login": "octo"},
+        "createdAt": "2024-01-01T00:00:00Z",
+        "url": f"https://github.com/o/r/pull/{number}",
+        "files": _page(
+            [{"path": path} for path in (files or ["a.txt"])],
+            has_next=files_has_next,
+            cursor="c1" if files_has_next else None,
+        ),
+        "comments": _page(
+            [{"author": {"login": "bob"}, "createdAt": "2024-01-02", "url": "u", "body": "hi"}]
+        ),
+        "reviewThreads": _page(
+            [
+                {
+                    "id": "T1",
+                    "comments": _page(
+                        [{"author": None, "createdAt": "2024-01-01", "url": "", "body": "r"}]
+                    ),
+                }
+            ]
+        ),
+        "commits": {
+            "nodes": [
+                {
+                    "commit": {
+                        "statusCheckRollup": {
+                            "contexts": _page(
+                                [
+                                    {
+                                        "__typename": "StatusContext",
+                                        "context": "ci/lint",
+                                        "state": "FAILURE",
+                                        "targetUrl": "https://ci/1",
+                                    }
+                                ]
+                            )
+                        }
+                    }
+                }
+            ]
+        },
+    }
+
+
+class TestBulkQuery(unittest.TestCase):
+    def test_query_aliases_every_pr(self) -> None:
+        query = pr_batch.build_bulk_pr_query("o", "r", [3, 7])
+        self.assertIn('repository(owner: "o", name: "r")', query)
+        self.assertIn("pr3: pullRequest(number: 3)", query)
+        self.assertIn("pr7: pullRequest(number: 7)", query)
+        self.assertIn("statusCheckRollup", query)
+
+
+class TestFetchPrDataBulk(unittest.TestCase):
+    def _fake_gh(self, responses):
+        calls = []
+
+        def fake_run(cmd, check=True, capture_output=True):
+            calls.append(cmd)
+            if cmd.startswith("gh repo view"):
+                return json.dumps({"owner": {"login": "o"}, "name": "r"})
+            return json.dumps(responses.pop(0))
+
+        return calls, fake_run
+
+    def test_normalizes_and_marks_missing(self) -> None:
+        payload = {
+            "data": {"repository": {"pr1": _pr_node(1), "pr2": None}},
+            "errors": [{"type": "NOT_FOUND", "path": ["repository", "pr2"]}],
+        }
+        calls, fake_run = self._fake_gh([payload])
+        with mock.patch.object(pr_batch, "run_command", side_effect=fake_run):
+            result = pr_batch.fetch_pr_data_bulk([1, 2])
+
+        self.assertIsNone(result[2])
+        bundle = result[1]
+        self.assertEqual(bundle["info"]["branch"], "feature-1")
+        self.assertEqual(bundle["info"]["author"], "octo")
+        self.assertEqual(bundle["files"], ["a.txt"])
+        self.assertEqual([c["type"] for c in bundle["comments"]], ["review", "issue"])
+        self.assertEqual(bundle["comments"][0]["author"], "unknown")
+        self.assertEqual(bundle["checks"][0]["name"], "ci/lint")
+        self.assertEqual(bundle["checks"][0]["conclusion"], "FAILURE")
+        self.assertEqual(bundle["checks"][0]["detailsUrl"], "https://ci/1")
+        self.assertEqual(len(calls), 2)
+
+    def test_paginates_long_connections(self) -> None:
+        first = {"data": {"repository": {"pr5": _pr_node(5, ["a"], files_has_next=True)}}}
+        second = {"data": {"repository": {"pullRequest": {"files": _page([{"path": "b"}])}}}}
+        calls, fake_run = self._fake_gh([first, second])
+        with mock.patch.object(pr_batch, "run_command", side_effect=fake_run):
+            result = pr_batch.fetch_pr_data_bulk([5])
+
+        self.assertEqual(result[5]["files"], ["a", "b"])
+        self.assertIn('after: "c1"', calls[-1])
+
+    def test_failed_batch_is_left_for_fallback(self) -> None:
+        calls, fake_run = self._fake_gh([{"errors": [{"message": "Parse error on line 1"}]}])
+        with mock.patch.object(pr_batch, "run_command", side_effect=fake_run):
+            result = pr_batch.fetch_pr_data_bulk([1])
+        self.assertEqual(result, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
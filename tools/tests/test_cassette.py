@@ -0,0 +1,68 @@
+import io
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+class TestCommandCassette(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(pr_batch.configure_cassette, None)
+        # Treat printf as a network command so the tests need no gh.
+        patcher = mock.patch.object(pr_batch, "CASSETTE_COMMAND_PREFIXES", ("printf ",))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _use(self, replay: bool) -> pr_batch.CommandCassette:
+        return pr_batch.configure_cassette(pr_batch.CommandCassette(self.tmp.name, replay=replay))
+
+    def test_replays_recorded_output_without_running(self) -> None:
+        recorder = self._use(replay=False)
+        self.assertEqual(pr_batch.run_command("printf 'one\\ntwo\\n'"), "one\ntwo")
+        self.assertEqual(recorder.stats["recorded"], 1)
+        self.assertEqual(len(list(Path(self.tmp.name).glob("*.json"))), 1)
+
+        player = self._use(replay=True)
+        with mock.patch.object(pr_batch.subprocess, "run", side_effect=AssertionError("ran")):
+            self.assertEqual(pr_batch.run_command("printf 'one\\ntwo\\n'"), "one\ntwo")
+            dest = io.StringIO()
+            self.assertEqual(pr_batch.stream_command("printf 'one\\ntwo\\n'", dest, "> "), 8)
+        self.assertEqual(dest.getvalue(), "> one\n> two\n")
+        self.assertEqual(player.stats["replayed"], 2)
+
+    def test_failures_are_replayed_as_errors(self) -> None:
+        cmd = "printf 'partial' && printf 'bad' >&2 && exit 4"
+        self._use(replay=False)
+        with self.assertRaises(subprocess.CalledProcessError):
+            pr_batch.run_command(cmd)
+
+        self._use(replay=True)
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            pr_batch.run_command(cmd)
+        self.assertEqual(ctx.exception.returncode, 4)
+        self.assertEqual(ctx.exception.stderr, "bad")
+        self.assertEqual(pr_batch.run_command(cmd, check=False), "partial")
+        with self.assertRaises(subprocess.CalledProcessError):
+            pr_batch.stream_command(cmd, io.StringIO())
+
+    def test_unrecorded_command_fails_in_replay(self) -> None:
+        self._use(replay=True)
+        with self.assertRaises(pr_batch.CassetteMissError):
+            pr_batch.run_command("printf never-recorded")
+
+    def test_local_commands_always_run(self) -> None:
+        self._use(replay=True)
+        self.assertEqual(pr_batch.run_command("echo local"), "local")
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+def _git(cwd: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=cwd, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+class GitRemoteTestCase(unittest.TestCase):
+    """Clone of a local origin with a `feature` branch published as PR #7."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.origin = os.path.join(self.tmp.name, "origin")
+        self.clone = os.path.join(self.tmp.name, "clone")
+
+        os.makedirs(self.origin)
+        _git(self.origin, "init", "-q", "-b", "main")
+        _git(self.origin, "config", "user.email", "test@example.com")
+        _git(self.origin, "config", "user.name", "Test")
+        Path(self.origin, "keep.txt").write_text("keep\n")
+        Path(self.origin, "gone.txt").write_text("gone\n")
+        _git(self.origin, "add", ".")
+        _git(self.origin, "commit", "-q", "-m", "base")
+        _git(self.origin, "checkout", "-q", "-b", "feature")
+        _git(self.origin, "rm", "-q", "gone.txt")
+        Path(self.origin, "new.txt").write_text("new\n")
+        _git(self.origin, "add", ".")
+        _git(self.origin, "commit", "-q", "-m", "feature")
+        _git(self.origin, "update-ref", "refs/pull/7/head", "feature")
+        _git(self.origin, "checkout", "-q", "main")
+
+        _git(self.tmp.name, "clone", "-q", self.origin, self.clone)
+        self.previous_cwd = os.getcwd()
+        os.chdir(self.clone)
+        self.addCleanup(os.chdir, self.previous_cwd)
+
+
+class TestCheckoutFreeRefs(GitRemoteTestCase):
+    def test_fetches_pr_head_without_checkout(self) -> None:
+        ref = pr_batch.fetch_pr_head_ref({"number": 7, "branch": "feature"}, "origin")
+
+        self.assertEqual(ref, "refs/pr-batch/7")
+        self.assertEqual(_git(self.clone, "branch", "--show-current"), "main")
+        self.assertFalse(Path(self.clone, "new.txt").exists())
+
+        existing, deleted = pr_batch.filter_existing_files_at_ref(
+            ["keep.txt", "new.txt", "gone.txt"], ref
+        )
+        self.assertEqual(existing, ["keep.txt", "new.txt"])
+        self.assertEqual(deleted, ["gone.txt"])
+
+    def test_falls_back_to_remote_branch(self) -> None:
+        ref = pr_batch.fetch_pr_head_ref({"number": 99, "branch": "feature"}, "origin")
+        self.assertEqual(_git(self.clone, "rev-parse", ref), _git(self.clone, "rev-parse", "origin/feature"))
+
+
+class TestBulkHeadFetch(GitRemoteTestCase):
+    def test_fetches_all_heads_and_base_in_one_call(self) -> None:
+        _git(self.origin, "update-ref", "refs/pull/8/head", "main")
+        fetched = pr_batch.fetch_pr_heads_bulk([7, 8], "origin", base_branch="main")
+
+        self.assertEqual(fetched, {7, 8})
+        self.assertEqual(
+            _git(self.clone, "rev-parse", "refs/pr-batch/7"),
+            _git(self.origin, "rev-parse", "feature"),
+        )
+        self.assertEqual(
+            _git(self.clone, "rev-parse", "refs/pr-batch/8"),
+            _git(self.origin, "rev-parse", "main"),
+        )
+
+    def test_failed_bulk_fetch_returns_empty_set(self) -> None:
+        self.assertEqual(pr_batch.fetch_pr_heads_bulk([7, 404], "origin"), set())
+
+    def test_replay_with_different_batches_falls_back_to_per_pr_fetches(self) -> None:
+        _git(self.origin, "update-ref", "refs/pull/8/head", "main")
+        cassette_dir = os.path.join(self.tmp.name, "cassette")
+        self.addCleanup(pr_batch.configure_cassette, None)
+        pr_batch.configure_cassette(pr_batch.CommandCassette(cassette_dir))
+        pr_batch.fetch_pr_heads_bulk([7], "origin")
+        pr_batch.fetch_pr_heads_bulk([8], "origin")
+        for number in (7, 8):
+            pr_batch.fetch_pr_head_ref({"number": number, "branch": "feature"}, "origin")
+
+        player = pr_batch.configure_cassette(pr_batch.CommandCassette(cassette_dir, replay=True))
+        self.assertEqual(pr_batch.fetch_pr_heads_bulk([7, 8], "origin"), set())
+        self.assertEqual(
+            pr_batch.fetch_pr_head_ref({"number": 8, "branch": "feature"}, "origin"),
+            "refs/pr-batch/8",
+        )
+        self.assertEqual(player.stats["replayed"], 1)
+
+    def test_checkout_uses_prefetched_head_detached(self) -> None:
+        _git(self.clone, "branch", "pr-7", "main")
+        local_work = _git(self.clone, "rev-parse", "pr-7")
+        pr_batch.fetch_pr_heads_bulk([7], "origin")
+        ref = pr_batch.checkout_pr_branch(
+            {"number": 7, "branch": "feature"}, "origin", "refs/pr-batch/7"
+        )
+        self.assertEqual(ref, "refs/pr-batch/7")
+        self.assertTrue(Path(self.clone, "new.txt").exists())
+        self.assertEqual(_git(self.clone, "branch", "--show-current"), "")
+        self.assertEqual(
+            _git(self.clone, "rev-parse", "HEAD"), _git(self.origin, "rev-parse", "feature")
+        )
+        self.assertEqual(_git(self.clone, "rev-parse", "pr-7"), local_work)
+
+
+class TestMergeBaseDiffs(GitRemoteTestCase):
+    def test_merge_base_diff_matches_three_dot_diff(self) -> None:
+        ref = pr_batch.fetch_pr_head_ref({"number": 7, "branch": "feature"}, "origin")
+        merge_base = pr_batch.compute_merge_base("main", ref)
+        self.assertEqual(merge_base, _git(self.clone, "rev-parse", "main"))
+
+        pr_info = {"number": 7, "title": "Feature", "body": ""}
+        outputs = []
+        for name, base in (("three-dot.txt", None), ("merge-base.txt", merge_base)):
+            path = os.path.join(self.tmp.name, name)
+            pr_batch.run_big_picture(
+                pr_info, ["new.txt"], [], [], path, local_branch=ref, merge_base=base
+            )
+            outputs.append(Path(path).read_text())
+
+        self.assertIn(f"# Merge base: {merge_base}\n", outputs[1])
+        self.assertEqual(
+            outputs[0].split("=" * 80)[1], outputs[1].split("=" * 80)[1]
+        )
+        self.assertIn("+new", outputs[1])
+
+
+class TestWorkerTimings(unittest.TestCase):
+    def test_counts_tasks_per_worker(self) -> None:
+        timings = pr_batch.WorkerTimings()
+        for _ in range(2):
+            with timings.measure():
+                pass
+        lines = timings.summary_lines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn("2 task(s)", lines[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+def _write_compilation(directory: str, sections) -> str:
+    """Write ``(pr, text, nested)`` sections; nested holds ``(path, text)`` diff parts."""
+    output = os.path.join(directory, "pr-comparison-x.txt")
+    records = []
+    content = "# Master Comparison\n"
+    for pr_number, banner, nested in sections:
+        content += banner
+        start = len(content)
+        for path, text in nested:
+            end = len(content) + len(text)
+            records.append(pr_batch.section_record(pr_number, path, "diff", len(content), end))
+            content += text
+        records.append(pr_batch.section_record(pr_number, None, "pr", start, len(content)))
+    Path(output).write_text(content)
+    pr_batch.write_section_index(output, records)
+    return output
+
+
+def _lines(word: str, count: int) -> str:
+    return "".join(f"+{word} {idx}\n" for idx in range(count))
+
+
+class TestEstimateTokens(unittest.TestCase):
+    def test_counts_word_pieces_and_punctuation(self) -> None:
+        self.assertEqual(pr_batch.estimate_tokens(b"def f(x):"), 6)
+        self.assertEqual(pr_batch.estimate_tokens(b"internationalization"), 5)
+        self.assertEqual(pr_batch.estimate_tokens(b"   \n\t"), 0)
+
+
+class TestPlanChunks(unittest.TestCase):
+    def test_whole_prs_stay_together(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = _write_compilation(
+                tmp,
+                [(n, f"# PR #{n}\n", [("a.py", _lines("x", 20))]) for n in (1, 2, 3)],
+            )
+            chunks = pr_batch.plan_chunks(output, 100)
+            records = pr_batch.load_section_index(output)
+        pr_ends = {r["offset"] + r["length"] for r in records if r["section"] == "pr"}
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(all(chunk["end"] in pr_ends for chunk in chunks))
+        self.assertEqual([chunk["labels"] for chunk in chunks], [["PR #1"], ["PR #2"], ["PR #3"]])
+        self.assertTrue(all(chunk["tokens"] <= 100 for chunk in chunks))
+
+    def test_oversized_pr_is_cut_between_file_diffs_then_lines(self) -> None:
+        nested = [("a.py", _lines("x", 30)), ("b.py", _lines("y", 30)), ("c.py", _lines("z", 200))]
+        with tempfile.TemporaryDirectory() as tmp:
+            output = _write_compilation(tmp, [(7, "# PR #7\n", nested)])
+            chunks = pr_batch.plan_chunks(output, 100)
+            data = Path(output).read_bytes()
+        b_start = data.index(b"+y 0")
+        self.assertIn(b_start, [chunk["start"] for chunk in chunks])
+        self.assertTrue(all(chunk["tokens"] <= 100 for chunk in chunks))
+        self.assertTrue(all(data[chunk["end"] - 1:chunk["end"]] == b"\n" for chunk in chunks))
+        self.assertTrue(all(chunk["labels"] == ["PR #7 (partial)"] for chunk in chunks))
+        self.assertEqual(chunks[-1]["end"], len(data))
+
+    def test_single_long_line_is_cut(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "out.txt")
+            Path(output).write_text("é" * 300 + "\n")
+            chunks = pr_batch.plan_chunks(output, 50)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(chunk["tokens"] <= 50 for chunk in chunks))
+
+
+class TestWriteCompilationChunks(unittest.TestCase):
+    def test_chunks_reassemble_the_compilation(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = _write_compilation(
+                tmp,
+                [(n, f"# PR #{n}\n", [("a.py", _lines("x", 400))]) for n in (1, 2)],
+            )
+            stale = Path(pr_batch.chunk_output_dir(output), "stale.txt")
+            stale.parent.mkdir()
+            stale.write_text("old")
+
+            paths = pr_batch.write_compilation_chunks(output, 1200)
+            texts = [Path(path).read_text() for path in paths]
+            original = Path(output).read_text()
+
+            self.assertFalse(stale.exists())
+        total = len(paths)
+        self.assertGreater(total, 2)
+        self.assertTrue(paths[0].endswith(f"pr-comparison-x-chunk-001-of-{total:03d}.txt"))
+        self.assertTrue(
+            texts[0].startswith(f"# Chunk 1/{total} of pr-comparison-x.txt\n# Bytes 0-")
+        )
+        self.assertIn("# Sections: PR #1 (partial)\n", texts[0])
+        body = "".join(text.split("=" * 80 + "\n", 1)[1] for text in texts)
+        self.assertEqual(body, original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+class TestCopyFileInto(unittest.TestCase):
+    def test_interleaves_with_text_writes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp, "source.txt")
+            source.write_text("body ✓\n", encoding="utf-8")
+            target = Path(tmp, "target.txt")
+            with open(target, "w", encoding="utf-8") as outf:
+                outf.write("head\n")
+                copied = pr_batch.copy_file_into(outf, str(source))
+                outf.write("tail\n")
+            self.assertEqual(copied, len("body ✓\n".encode("utf-8")))
+            self.assertEqual(target.read_text(encoding="utf-8"), "head\nbody ✓\ntail\n")
+
+    def test_falls_back_without_sendfile(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp, "source.txt")
+            source.write_text("x" * 5000)
+            target = Path(tmp, "target.txt")
+            with mock.patch.object(pr_batch.os, "sendfile", side_effect=OSError("nope")):
+                with open(target, "a", encoding="utf-8") as outf:
+                    pr_batch.copy_file_into(outf, str(source))
+            self.assertEqual(target.read_text(), "x" * 5000)
+
+
+class TestMasterMirror(unittest.TestCase):
+    def test_mirror_matches_read_back_compilation(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            pr_files = []
+            for number in (1, 2):
+                path = Path(tmp, f"pr-{number}.txt")
+                path.write_text(f"diff for {number}\n")
+                pr_files.append(({"number": number, "title": f"T{number}"}, str(path)))
+
+            def fake_show(cmd, check=True, capture_output=True, input_text=None):
+                return "base content"
+
+            args = ("1-2", "1-2", [1, 2])
+            with mock.patch.object(pr_batch, "run_command", side_effect=fake_show), \
+                    mock.patch.object(pr_batch, "datetime") as fake_datetime:
+                fake_datetime.now.return_value.strftime.return_value = "2024-01-01 00:00:00"
+                master = os.path.join(tmp, "master.txt")
+                legacy_touched = os.path.join(tmp, "legacy.txt")
+                pr_batch.create_master_comparison(pr_files, *args, master)
+                pr_batch.create_touched_files_compilation(
+                    {"a.js"}, "main", *args, legacy_touched, master
+                )
+
+                mirrored_master = os.path.join(tmp, "master2.txt")
+                mirrored_touched = os.path.join(tmp, "mirrored.txt")
+                pr_batch.create_touched_files_compilation(
+                    {"a.js"}, "main", *args, mirrored_touched
+                )
+                pr_batch.create_master_comparison(
+                    pr_files, *args, mirrored_master, mirror_outputs=[mirrored_touched]
+                )
+
+            self.assertEqual(Path(master).read_text(), Path(mirrored_master).read_text())
+            self.assertEqual(
+                Path(legacy_touched).read_text(), Path(mirrored_touched).read_text()
+            )
+            self.assertIn("diff for 2\n", Path(mirrored_touched).read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
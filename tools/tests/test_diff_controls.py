@@ -0,0 +1,126 @@
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+PR_INFO = {"number": 9, "title": "Title", "branch": "feature", "body": "Body"}
+
+DIFF = (
+    "diff --git a/big.json b/big.json\n"
+    "+line one\n"
+    "+line two\n"
+    "+line three\n"
+    "diff --git a/small.py b/small.py\n"
+    "+ok\n"
+)
+
+
+class TestPathFilters(unittest.TestCase):
+    FILES = ["package-lock.json", "web/package-lock.json", "src/app.py", "docs/guide.md"]
+
+    def test_bare_globs_match_file_names_anywhere(self) -> None:
+        kept, excluded = pr_batch.filter_paths(self.FILES, exclude=["package-lock.json"])
+        self.assertEqual(kept, ["src/app.py", "docs/guide.md"])
+        self.assertEqual(excluded, ["package-lock.json", "web/package-lock.json"])
+
+    def test_include_then_exclude(self) -> None:
+        kept, excluded = pr_batch.filter_paths(
+            self.FILES, include=["src/*", "**/*.md"], exclude=["docs/*"]
+        )
+        self.assertEqual(kept, ["src/app.py"])
+        self.assertEqual(len(excluded), 3)
+
+    def test_no_filters_keep_everything(self) -> None:
+        self.assertEqual(pr_batch.filter_paths(self.FILES), (self.FILES, []))
+
+
+class TestDiffByteCap(unittest.TestCase):
+    def test_truncates_each_file_separately(self) -> None:
+        dest = io.StringIO()
+        cap = pr_batch.DiffByteCap(dest, 45)
+        for start in range(0, len(DIFF), 7):
+            cap.write(DIFF[start:start + 7])
+        cap.close()
+
+        self.assertEqual(
+            dest.getvalue(),
+            "diff --git a/big.json b/big.json\n"
+            "+line one\n"
+            "# ... diff truncated: 2 more line(s), 22 byte(s) over the 45-byte per-file limit\n"
+            "diff --git a/small.py b/small.py\n"
+            "+ok\n",
+        )
+        self.assertEqual(cap.truncated_files, 1)
+
+    def test_small_diffs_pass_through(self) -> None:
+        dest = io.StringIO()
+        cap = pr_batch.DiffByteCap(dest, 1000)
+        cap.write(DIFF)
+        cap.close()
+        self.assertEqual(dest.getvalue(), DIFF)
+
+
+class TestRenderDiffControls(unittest.TestCase):
+    def test_stat_only_files_get_a_diffstat_section(self) -> None:
+        commands = []
+
+        def fake_stream(cmd, dest, indent=""):
+            commands.append(cmd)
+            small_diff = DIFF[DIFF.index("diff --git a/small"):]
+            text = "1\t0\tbig.json\n" if "--stat" in cmd else small_diff
+            dest.write(text)
+            return len(text)
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(pr_batch, "stream_command", side_effect=fake_stream):
+            output = Path(tmp, "out.txt")
+            pr_batch.render_pr_variants(
+                PR_INFO,
+                ["big.json", "small.py"],
+                [],
+                [(str(output), [], False)],
+                merge_base="abc",
+                excluded_files=["package-lock.json"],
+                stat_only=["*.json"],
+            )
+            text = output.read_text()
+            records = pr_batch.load_section_index(str(output))
+
+        self.assertEqual(
+            commands,
+            [
+                "git diff --numstat --stat abc feature -- big.json",
+                "git diff abc feature -- small.py",
+            ],
+        )
+        self.assertIn("# Excluded by path filters: package-lock.json\n", text)
+        self.assertIn("# Diffstat only (--stat-only) for 1 file(s):\n1\t0\tbig.json\n", text)
+        self.assertEqual(
+            [(record["section"], record["path"]) for record in records][:3],
+            [("header", None), ("stat", None), ("diff", "small.py")],
+        )
+
+
+class TestStatOnlyOptions(unittest.TestCase):
+    def test_flag_does_not_swallow_the_pr_selection(self) -> None:
+        args = pr_batch.build_arg_parser().parse_args(["--stat-only", "123-130"])
+        self.assertEqual(args.pr_selection, "123-130")
+        self.assertEqual(args.stat_only, ["*"])
+
+    def test_globs_are_repeatable(self) -> None:
+        args = pr_batch.build_arg_parser().parse_args(
+            ["1-3", "--stat-only-glob", "*.json", "--stat-only-glob=*.lock"]
+        )
+        self.assertEqual(args.stat_only, ["*.json", "*.lock"])
+        self.assertIsNone(pr_batch.build_arg_parser().parse_args(["1-3"]).stat_only)
+
+
+if __name__ == "__main__":
+    unittest.main()
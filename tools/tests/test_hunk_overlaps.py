@@ -0,0 +1,169 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+DIFF = """diff --git a/src/view.js b/src/view.js
+index 1111111..2222222 100644
+--- a/src/view.js
++++ b/src/view.js
+@@ -10,3 +10,4 @@ function render() {
+-a
++b
+@@ -200 +201 @@
+-c
++d
+@@ -300,0 +302,2 @@
++e
+diff --git a/old.txt b/new.txt
+similarity index 90%
+--- a/old.txt
++++ b/new.txt
+@@ -1,2 +1,2 @@
+-x
++y
+diff --git a/added.txt b/added.txt
+new file mode 100644
+--- /dev/null
++++ b/added.txt
+@@ -0,0 +1 @@
++z
+"""
+
+
+class TestParseHunkRanges(unittest.TestCase):
+    def test_old_side_ranges_per_file(self) -> None:
+        self.assertEqual(
+            pr_batch.parse_hunk_ranges(DIFF),
+            {
+                "src/view.js": [(10, 12), (200, 200), (300, 301)],
+                "old.txt": [(1, 2)],
+                "added.txt": [(0, 1)],
+            },
+        )
+
+    def test_parses_across_arbitrary_chunk_boundaries(self) -> None:
+        parser = pr_batch.HunkRangeParser()
+        for char in DIFF:
+            parser.write(char)
+        parser.close()
+        self.assertEqual(parser.ranges, pr_batch.parse_hunk_ranges(DIFF))
+
+    def test_quoted_header_paths(self) -> None:
+        diff = (
+            'diff --git "a/caf\\303\\251 \\"x\\".txt" "b/caf\\303\\251 \\"x\\".txt"\n'
+            "@@ -4 +4 @@\n-a\n+b\n"
+            "diff --git a/with space.txt b/with space.txt\n"
+            "@@ -2,0 +3 @@\n+c\n"
+        )
+        self.assertEqual(
+            pr_batch.parse_hunk_ranges(diff),
+            {'café "x".txt': [(4, 4)], "with space.txt": [(2, 3)]},
+        )
+
+
+def _git(*args: str, cwd: str) -> None:
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+class TestCollectHunkRanges(unittest.TestCase):
+    def test_added_deleted_and_renamed_files(self) -> None:
+        with tempfile.TemporaryDirectory() as repo:
+            _git("init", "-q", "-b", "main", cwd=repo)
+            lines = "".join(f"line {idx}\n" for idx in range(1, 21))
+            Path(repo, "keep.txt").write_text(lines)
+            Path(repo, "gone.txt").write_text("a\nb\nc\n")
+            Path(repo, "old name.txt").write_text(lines)
+            _git("add", ".", cwd=repo)
+            commit = ["-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "-q"]
+            _git(*commit, "-m", "base", cwd=repo)
+            _git("checkout", "-q", "-b", "feature", cwd=repo)
+            Path(repo, "keep.txt").write_text(lines.replace("line 5\n", "line five\n"))
+            Path(repo, "gone.txt").unlink()
+            Path(repo, "new.txt").write_text("fresh\n")
+            _git("mv", "old name.txt", "new name.txt", cwd=repo)
+            Path(repo, "new name.txt").write_text(lines.replace("line 18\n", "line 18!\n"))
+            _git("add", "-A", cwd=repo)
+            _git(*commit, "-m", "change", cwd=repo)
+
+            cwd = os.getcwd()
+            os.chdir(repo)
+            try:
+                entry = {"info": {"branch": "feature"}, "local_branch": "feature", "files": []}
+                ranges = pr_batch.collect_hunk_ranges(entry, "main")
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(
+            ranges,
+            {
+                "keep.txt": [(5, 5)],
+                "gone.txt": [(1, 3)],
+                "new.txt": [(0, 1)],
+                "old name.txt": [(18, 18)],
+            },
+        )
+
+
+class TestFindHunkOverlaps(unittest.TestCase):
+    RANGES = {
+        1: {"core.js": [(1, 10)], "other.js": [(5, 5)]},
+        2: {"core.js": [(500, 520)]},
+        3: {"core.js": [(8, 12), (515, 515)], "other.js": [(6, 7)]},
+        4: {"core.js": [(11, 11)]},
+    }
+
+    def test_opposite_ends_of_a_file_do_not_overlap(self) -> None:
+        overlaps = pr_batch.find_hunk_overlaps(self.RANGES)
+        self.assertEqual(
+            overlaps,
+            {(1, 3): {"core.js": 1}, (2, 3): {"core.js": 1}, (3, 4): {"core.js": 1}},
+        )
+        self.assertNotIn((1, 2), overlaps)
+
+    def test_conflicting_round_robin_mode_uses_overlapping_pairs(self) -> None:
+        processed = [{"info": {"number": n}, "files": ["core.js"]} for n in self.RANGES]
+        overlaps = pr_batch.find_hunk_overlaps(self.RANGES)
+        self.assertEqual(
+            pr_batch.select_round_robin_pairs(
+                processed, mode="conflicting", conflict_pairs=list(overlaps)
+            ),
+            [(1, 3), (2, 3), (3, 4)],
+        )
+
+    def test_hot_spots_merge_ranges_across_prs(self) -> None:
+        self.assertEqual(
+            pr_batch.hunk_hot_spots(self.RANGES),
+            [
+                {"path": "core.js", "lines": [1, 12], "prs": [1, 3, 4]},
+                {"path": "core.js", "lines": [500, 520], "prs": [2, 3]},
+            ],
+        )
+
+    def test_report_files(self) -> None:
+        overlaps = pr_batch.find_hunk_overlaps(self.RANGES)
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path, json_path, hot_spot_path = pr_batch.create_conflict_report(
+                list(self.RANGES), self.RANGES, overlaps, tmp, "1-4"
+            )
+            csv_lines = Path(csv_path).read_text().splitlines()
+            report = json.loads(Path(json_path).read_text())
+            hot_spots = Path(hot_spot_path).read_text()
+
+        self.assertEqual(csv_lines[:2], ["pr,1,2,3,4", "1,,0,1,0"])
+        self.assertEqual(report["pairs"][0], {"prs": [1, 3], "hunks": 1, "files": {"core.js": 1}})
+        self.assertIn("core.js: 4 PR(s) edit it, 4 in overlapping ranges\n", hot_spots)
+        self.assertIn("  lines 1-12: #1, #3, #4\n", hot_spots)
+        self.assertNotIn("other.js", hot_spots)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+PR_INFO = {"number": 3, "title": "T", "branch": "b", "body": ""}
+ARTIFACTS = {
+    "files": ["a.txt"],
+    "comments": [{"author": "x", "body": "hi"}],
+    "checks": [{"name": "ci", "conclusion": "FAILURE", "logFile": "/tmp/spool/1.log"}],
+}
+
+
+def _inputs(head: str = "h1", artifacts=ARTIFACTS):
+    return pr_batch.pr_artifact_inputs(PR_INFO, artifacts, "plain", head, "b1", "main", True)
+
+
+class TestFingerprints(unittest.TestCase):
+    def test_fingerprint_ignores_key_order(self) -> None:
+        self.assertEqual(
+            pr_batch.fingerprint({"a": 1, "b": [1, 2]}),
+            pr_batch.fingerprint({"b": [1, 2], "a": 1}),
+        )
+
+    def test_pr_inputs_ignore_spooled_log_paths(self) -> None:
+        moved = dict(ARTIFACTS, checks=[dict(ARTIFACTS["checks"][0], logFile="/other/1.log")])
+        self.assertEqual(_inputs(), _inputs(artifacts=moved))
+        self.assertNotEqual(_inputs(), _inputs(head="h2"))
+
+    def test_ref_sha_resolves_short_names(self) -> None:
+        refs = {"refs/heads/pr-3": "aaa", "refs/pr-batch/3": "bbb", "refs/remotes/origin/main": "ccc"}
+        self.assertEqual(pr_batch.ref_sha(refs, "pr-3"), "aaa")
+        self.assertEqual(pr_batch.ref_sha(refs, "refs/pr-batch/3"), "bbb")
+        self.assertEqual(pr_batch.ref_sha(refs, "origin/main"), "ccc")
+        self.assertIsNone(pr_batch.ref_sha(refs, "missing"))
+
+
+class TestArtifactManifest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output_dir = self._tmp.name
+        self.output = os.path.join(self.output_dir, "pr-3-implementation.txt")
+        Path(self.output).write_text("rendered\n")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_round_trip_and_current_check(self) -> None:
+        manifest = pr_batch.ArtifactManifest(self.output_dir)
+        manifest.record(self.output, _inputs(), merge_base="m1", files=["a.txt"])
+        manifest.save()
+
+        reloaded = pr_batch.ArtifactManifest(self.output_dir)
+        entry = reloaded.get(self.output)
+        self.assertEqual(entry["merge_base"], "m1")
+        self.assertEqual(entry["inputs"]["head"], "h1")
+        self.assertEqual(len(entry["sha256"]), 64)
+        self.assertTrue(reloaded.is_current(self.output, _inputs()))
+        self.assertFalse(reloaded.is_current(self.output, _inputs(head="h2")))
+
+    def test_edited_or_missing_output_is_stale(self) -> None:
+        manifest = pr_batch.ArtifactManifest(self.output_dir)
+        manifest.record(self.output, _inputs())
+        Path(self.output).write_text("edited by hand\n")
+        self.assertFalse(manifest.is_current(self.output, _inputs()))
+        os.remove(self.output)
+        self.assertFalse(manifest.is_current(self.output, _inputs()))
+
+    def test_ignores_unknown_manifest_versions(self) -> None:
+        Path(self.output_dir, pr_batch.MANIFEST_NAME).write_text(
+            json.dumps({"version": 999, "artifacts": {"x": {}}})
+        )
+        self.assertEqual(pr_batch.ArtifactManifest(self.output_dir).artifacts, {})
+
+    def test_pair_inputs_track_both_heads(self) -> None:
+        left = {"info": PR_INFO, "head": "h1", "local_branch": "l", "files": ["a"]}
+        right = {"info": dict(PR_INFO, number=4), "head": "h2", "local_branch": "r", "files": []}
+        base = pr_batch.round_robin_pair_inputs(left, right, "3-4", "3-4")
+        moved = pr_batch.round_robin_pair_inputs(left, dict(right, head="h3"), "3-4", "3-4")
+        self.assertNotEqual(pr_batch.fingerprint(base), pr_batch.fingerprint(moved))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import sys
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+class TestPrMetadataCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_bundle_requires_matching_fingerprint(self) -> None:
+        cache = pr_batch.PrMetadataCache(self.tmp.name)
+        cache.put_pr(5, "t1|abc|SUCCESS", {"info": {"number": 5}})
+        self.assertEqual(cache.get_pr(5, "t1|abc|SUCCESS"), {"info": {"number": 5}})
+        self.assertIsNone(cache.get_pr(5, "t2|def|SUCCESS"))
+        self.assertIsNone(cache.get_pr(5, None))
+        self.assertIsNone(cache.get_pr(6, "t1|abc|SUCCESS"))
+
+    def test_missing_fingerprint_is_not_stored(self) -> None:
+        cache = pr_batch.PrMetadataCache(self.tmp.name)
+        cache.put_pr(5, None, {"info": {}})
+        self.assertEqual(list((Path(self.tmp.name) / "prs").iterdir()), [])
+
+    def test_evicts_least_recently_used_first(self) -> None:
+        cache = pr_batch.PrMetadataCache(self.tmp.name, max_bytes=250)
+        for age, (run_id, text) in enumerate([("2", "b"), ("1", "a"), ("3", "c")]):
+            path = cache.run_log_path(run_id)
+            path.write_text(text * 100)
+            os.utime(path, (1000 + age, 1000 + age))
+
+        self.assertEqual(cache.evict(), 1)
+        self.assertFalse(cache.touch_run_log("2"))
+        self.assertEqual(cache.run_log_path("1").read_text(), "a" * 100)
+
+
+class TestCachedRunLogs(unittest.TestCase):
+    def test_completed_run_log_is_fetched_once(self) -> None:
+        check = {
+            "name": "ci",
+            "status": "COMPLETED",
+            "conclusion": "FAILURE",
+            "detailsUrl": "https://github.com/o/r/actions/runs/42/job/1",
+        }
+
+        def fake_stream(cmd, dest, indent=""):
+            dest.write("log text\n")
+            return 9
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = pr_batch.PrMetadataCache(os.path.join(tmp, "cache"))
+            runs = [[dict(check)], [dict(check)]]
+            with mock.patch.object(pr_batch, "stream_command", side_effect=fake_stream) as stream:
+                for checks in runs:
+                    spool_dir = tempfile.mkdtemp(dir=tmp)
+                    fetched = pr_batch.attach_failed_check_logs([checks], spool_dir, cache)
+                    self.assertEqual(fetched, 1)
+            self.assertEqual(stream.call_count, 1)
+            self.assertEqual(runs[0][0]["logFile"], str(cache.run_log_path("42")))
+            self.assertEqual(runs[1][0]["logFile"], runs[0][0]["logFile"])
+
+
+class TestFetchPrFingerprints(unittest.TestCase):
+    def test_combines_update_head_and_check_state(self) -> None:
+        payload = {
+            "data": {
+                "repository": {
+                    "pr1": {
+                        "updatedAt": "2024-01-01",
+                        "headRefOid": "abc",
+                        "commits": {
+                            "nodes": [{"commit": {"statusCheckRollup": {"state": "PENDING"}}}]
+                        },
+                    },
+                    "pr2": None,
+                }
+            }
+        }
+
+        def fake_run(cmd, check=True, capture_output=True):
+            if cmd.startswith("gh repo view"):
+                return json.dumps({"owner": {"login": "o"}, "name": "r"})
+            return json.dumps(payload)
+
+        with mock.patch.object(pr_batch, "run_command", side_effect=fake_run):
+            fingerprints = pr_batch.fetch_pr_fingerprints([1, 2])
+        self.assertEqual(fingerprints, {1: "2024-01-01|abc|PENDING"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import subprocess
+import threading
+import time
+import unittest
+from pathlib import Path
+import sys
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+class TestRunParallel(unittest.TestCase):
+    def test_preserves_input_order(self) -> None:
+        def slow_square(value: int) -> int:
+            time.sleep(0.01 * (5 - value))
+            return value * value
+
+        self.assertEqual(pr_batch.run_parallel(slow_square, [1, 2, 3, 4], jobs=4), [1, 4, 9, 16])
+
+    def test_uses_multiple_threads(self) -> None:
+        seen = set()
+        barrier = threading.Barrier(3, timeout=2)
+
+        def record(value: int) -> int:
+            seen.add(threading.get_ident())
+            barrier.wait()
+            return value
+
+        pr_batch.run_parallel(record, [1, 2, 3], jobs=3)
+        self.assertEqual(len(seen), 3)
+
+    def test_serial_when_single_job(self) -> None:
+        self.assertEqual(pr_batch.run_parallel(str, [1, 2], jobs=1), ["1", "2"])
+
+
+class TestCollectPrArtifacts(unittest.TestCase):
+    def test_uses_bundle_and_copies_checks_for_logs(self) -> None:
+        bundle = {
+            "files": ["a.txt"],
+            "comments": [{"body": "hi"}],
+            "checks": [{"name": "ci", "conclusion": "failure", "detailsUrl": ""}],
+        }
+        with mock.patch.object(pr_batch, "run_command", side_effect=AssertionError("ran")):
+            artifacts = pr_batch.collect_pr_artifacts(1, bundle)
+
+        self.assertEqual(artifacts["files"], ["a.txt"])
+        self.assertEqual(artifacts["checks_with_logs"], artifacts["checks"])
+        artifacts["checks_with_logs"][0]["logFile"] = "run.log"
+        self.assertNotIn("logFile", artifacts["checks"][0])
+        self.assertEqual(artifacts["messages"], [])
+
+    def test_records_failures_as_messages(self) -> None:
+        error = subprocess.CalledProcessError(1, "gh")
+        with mock.patch.object(pr_batch, "get_pr_changed_files", return_value=["a"]), \
+                mock.patch.object(pr_batch, "get_pr_comments", side_effect=error), \
+                mock.patch.object(pr_batch, "get_pr_checks", side_effect=error):
+            artifacts = pr_batch.collect_pr_artifacts(7)
+
+        self.assertEqual(artifacts["comments"], [])
+        self.assertEqual(artifacts["checks"], [])
+        self.assertEqual(len(artifacts["messages"]), 2)
+        self.assertIn("comments for PR #7", artifacts["messages"][0])
+
+    def test_lookup_pr_info_reports_missing(self) -> None:
+        info, error = pr_batch.lookup_pr_info(3, {3: None})
+        self.assertIsNone(info)
+        self.assertEqual(error, "not a pull request")
+
+
+if __name__ == "__main__":
+    unittest.main()
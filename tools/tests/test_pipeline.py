@@ -0,0 +1,219 @@
+import argparse
+import subprocess
+import threading
+import time
+import unittest
+from pathlib import Path
+import sys
+import tempfile
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+class TestRunPipeline(unittest.TestCase):
+    def test_preserves_input_order_across_workers(self) -> None:
+        def slow_double(value: int) -> int:
+            time.sleep(0.002 * (10 - value))
+            return value * 2
+
+        stages = [
+            pr_batch.PipelineStage("double", slow_double, workers=4),
+            pr_batch.PipelineStage("label", str, workers=2),
+        ]
+        self.assertEqual(
+            pr_batch.run_pipeline(list(range(10)), stages), [str(v * 2) for v in range(10)]
+        )
+        self.assertEqual([stage.items for stage in stages], [10, 10])
+
+    def test_downstream_starts_before_upstream_finishes(self) -> None:
+        first_rendered = threading.Event()
+
+        def fetch(value: int) -> int:
+            # Later items wait until the first one has been rendered downstream.
+            if value and not first_rendered.wait(timeout=5):
+                raise AssertionError("render stage did not overlap with fetch stage")
+            return value
+
+        def render(value: int) -> int:
+            first_rendered.set()
+            return value
+
+        stages = [
+            pr_batch.PipelineStage("fetch", fetch),
+            pr_batch.PipelineStage("render", render),
+        ]
+        self.assertEqual(pr_batch.run_pipeline([0, 1, 2], stages), [0, 1, 2])
+
+    def test_batched_stage_receives_waiting_items_together(self) -> None:
+        batches = []
+
+        def bulk(values):
+            batches.append(list(values))
+            return [value + 100 for value in values]
+
+        stages = [pr_batch.PipelineStage("bulk", bulk, batch_size=3)]
+        self.assertEqual(pr_batch.run_pipeline([1, 2, 3, 4, 5], stages), [101, 102, 103, 104, 105])
+        self.assertEqual(batches, [[1, 2, 3], [4, 5]])
+        self.assertEqual(stages[0].batches, 2)
+        self.assertEqual(stages[0].max_depth, 5)
+        self.assertIn("bulk: 5 item(s) in 2 batch(es)", stages[0].summary_line())
+
+    def test_fixed_batches_follow_input_order_not_arrival(self) -> None:
+        batches = []
+
+        def reverse_delay(value: int) -> int:
+            time.sleep(0.002 * (7 - value))
+            return value
+
+        def bulk(values):
+            batches.append(list(values))
+            return values
+
+        stages = [
+            pr_batch.PipelineStage("fetch", reverse_delay, workers=4),
+            pr_batch.PipelineStage("bulk", bulk, batch_size=3, fixed_batches=True),
+        ]
+        self.assertEqual(pr_batch.run_pipeline(list(range(7)), stages), list(range(7)))
+        self.assertEqual(sorted(batches), [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_first_error_is_raised(self) -> None:
+        def explode(value: int) -> int:
+            if value == 2:
+                raise ValueError("boom")
+            return value
+
+        stages = [
+            pr_batch.PipelineStage("explode", explode, workers=2),
+            pr_batch.PipelineStage("noop", lambda value: value),
+        ]
+        with self.assertRaises(ValueError):
+            pr_batch.run_pipeline([1, 2, 3], stages)
+
+    def test_empty_input(self) -> None:
+        stages = [pr_batch.PipelineStage("noop", lambda value: value, batch_size=4)]
+        self.assertEqual(pr_batch.run_pipeline([], stages), [])
+        self.assertIn("0 item(s)", stages[0].summary_line())
+
+
+def _context(tmp: str, **overrides) -> pr_batch.PipelineContext:
+    options = {
+        "output_dir": tmp,
+        "remote": "origin",
+        "base_branch": "main",
+        "fetch_scope": "selected",
+        "partial_fetch": False,
+        "incremental": False,
+        "checkout_free": False,
+        "jobs": 2,
+        "diff_jobs": None,
+        "graphql_batch_size": 0,
+        "include": None,
+        "exclude": None,
+        "stat_only": None,
+        "max_diff_bytes_per_file": 0,
+    }
+    options.update(overrides)
+    args = argparse.Namespace(**options)
+    return pr_batch.PipelineContext(args, {"plain", "logs"}, pr_batch.ArtifactManifest(tmp))
+
+
+class TestPipelineStages(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_only_checkout_free_runs_render_in_parallel(self) -> None:
+        ctx = _context(self.tmp.name)
+        stages = pr_batch.build_pipeline_stages(ctx, 3)
+        self.assertEqual(
+            [stage.name for stage in stages], ["metadata", "git fetch", "logs", "render"]
+        )
+        self.assertEqual(stages[-1].workers, 1)
+        free = _context(self.tmp.name, checkout_free=True, diff_jobs=4)
+        self.assertEqual(pr_batch.build_pipeline_stages(free, 3)[-1].workers, 4)
+
+    def test_cassette_runs_use_fixed_batches(self) -> None:
+        ctx = _context(self.tmp.name)
+        stages = pr_batch.build_pipeline_stages(ctx, 3)
+        self.assertFalse(any(stage.fixed_batches for stage in stages))
+        self.addCleanup(pr_batch.configure_cassette, None)
+        pr_batch.configure_cassette(pr_batch.CommandCassette(self.tmp.name))
+        stages = pr_batch.build_pipeline_stages(ctx, 3)
+        self.assertEqual([stage.fixed_batches for stage in stages], [True, True, False, False])
+
+    def test_fetch_and_checkout_hold_the_git_lock(self) -> None:
+        ctx = _context(self.tmp.name)
+        held = []
+
+        def record_lock(*args, **kwargs):
+            held.append(ctx.git_lock.locked())
+            return {1}
+
+        def failed_checkout(*args, **kwargs):
+            held.append(ctx.git_lock.locked())
+            raise subprocess.CalledProcessError(1, "git checkout")
+
+        state = {"number": 1, "info": {"number": 1, "title": "t"}, "artifacts": {}}
+        with mock.patch.object(pr_batch, "fetch_pr_heads_bulk", side_effect=record_lock), \
+                mock.patch.object(pr_batch, "resolve_commit", return_value="base"), \
+                mock.patch.object(pr_batch, "list_ref_shas", return_value={}):
+            pr_batch.fetch_heads(ctx, [state])
+        artifacts = {"messages": [], "files": ["a.py"]}
+        with mock.patch.object(pr_batch, "checkout_pr_branch", side_effect=failed_checkout):
+            self.assertIsNone(pr_batch.render_pr(ctx, (state["info"], artifacts)))
+        self.assertEqual(held, [True, True])
+        self.assertFalse(ctx.git_lock.locked())
+        self.assertEqual(ctx.fetched_heads, {1})
+
+    def test_failed_base_fetch_is_retried_with_the_next_batch(self) -> None:
+        ctx = _context(self.tmp.name)
+        batches = [[{"number": n, "info": {"number": n}}] for n in (1, 2, 3)]
+        with mock.patch.object(
+            pr_batch, "fetch_pr_heads_bulk", side_effect=[set(), {2}, {3}]
+        ) as bulk, mock.patch.object(
+            pr_batch, "resolve_commit", return_value="base"
+        ) as resolve, mock.patch.object(pr_batch, "list_ref_shas", return_value={}):
+            pr_batch.fetch_heads(ctx, batches[0])
+            self.assertFalse(ctx.base_fetched)
+            self.assertIsNone(ctx.base_sha)
+            resolve.assert_not_called()
+            pr_batch.fetch_heads(ctx, batches[1])
+            pr_batch.fetch_heads(ctx, batches[2])
+        self.assertEqual(
+            [call.kwargs["base_branch"] for call in bulk.call_args_list], ["main", "main", None]
+        )
+        self.assertTrue(ctx.base_fetched)
+        self.assertEqual(ctx.base_sha, "base")
+        self.assertEqual(ctx.fetched_heads, {2, 3})
+
+    def test_full_fetch_scope_resolves_the_base_without_refetching(self) -> None:
+        ctx = _context(self.tmp.name, fetch_scope="full")
+        with mock.patch.object(pr_batch, "fetch_pr_heads_bulk", return_value=set()) as bulk, \
+                mock.patch.object(pr_batch, "resolve_commit", return_value="base"), \
+                mock.patch.object(pr_batch, "list_ref_shas", return_value={}):
+            pr_batch.fetch_heads(ctx, [{"number": 1, "info": {"number": 1}}])
+        self.assertIsNone(bulk.call_args.kwargs["base_branch"])
+        self.assertEqual(ctx.base_sha, "base")
+
+    def test_reused_prs_skip_logs_and_are_archived(self) -> None:
+        ctx = _context(self.tmp.name)
+        ctx.archive = mock.Mock()
+        result = {"info": {"number": 1}, "file": "pr-1.txt", "file_with_logs": None}
+        ctx.reused[1] = result
+        state = {
+            "number": 1,
+            "info": {"number": 1, "title": "t"},
+            "artifacts": {"messages": [], "checks_with_logs": []},
+        }
+        with mock.patch.object(pr_batch, "attach_failed_check_logs") as attach:
+            pr_batch.fetch_check_logs(ctx, state)
+        attach.assert_not_called()
+        self.assertIs(pr_batch.render_state(ctx, state)["result"], result)
+        ctx.archive.add_output.assert_called_once_with("pr-1.txt")
+
+
+if __name__ == "__main__":
+    unittest.main()
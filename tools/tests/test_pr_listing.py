@@ -0,0 +1,100 @@
+import json
+import unittest
+from pathlib import Path
+import sys
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+def _listing(numbers, has_next=False, cursor=None):
+    return {
+        "data": {
+            "repository": {
+                "pullRequests": {
+                    "pageInfo": {"hasNextPage": has_next, "endCursor": cursor},
+                    "nodes": [{"number": number, "state": "OPEN"} for number in numbers],
+                }
+            }
+        }
+    }
+
+
+class TestShouldListSelection(unittest.TestCase):
+    def test_dense_ranges_are_listed(self) -> None:
+        self.assertTrue(pr_batch.should_list_selection(list(range(1, 2001))))
+
+    def test_small_or_sparse_selections_are_probed(self) -> None:
+        self.assertFalse(pr_batch.should_list_selection([5, 6, 7]))
+        self.assertFalse(pr_batch.should_list_selection(list(range(1, 30)) + [40000]))
+
+
+class TestBuildPrListQuery(unittest.TestCase):
+    def test_connection_filters_state_and_labels(self) -> None:
+        query = pr_batch.build_pr_list_query(
+            "o", "r", "DESC", after="c2", state="merged", labels=["bug", "ui"]
+        )
+        self.assertIn("pullRequests(first: 100, after: \"c2\"", query)
+        self.assertIn("orderBy: {field: CREATED_AT, direction: DESC}", query)
+        self.assertIn("states: [MERGED]", query)
+        self.assertIn('labels: ["bug", "ui"]', query)
+
+    def test_author_and_dates_use_search(self) -> None:
+        query = pr_batch.build_pr_list_query(
+            "o", "r", "ASC", state="closed", labels=["bug"], author="octo",
+            created_since="2024-01-01",
+        )
+        self.assertIn("search(query: ", query)
+        search_terms = json.loads(query.split("search(query: ", 1)[1].split(", type:")[0])
+        self.assertEqual(
+            search_terms,
+            'repo:o/r is:pr sort:created-asc is:closed is:unmerged label:"bug" '
+            "author:octo created:2024-01-01..*",
+        )
+
+
+class TestListPullRequests(unittest.TestCase):
+    def test_walks_newest_first_and_stops_below_window(self) -> None:
+        responses = [
+            _listing([120]),
+            _listing([120, 118, 117], has_next=True, cursor="a"),
+            _listing([115, 112, 100], has_next=True, cursor="b"),
+        ]
+        queries = []
+
+        def fake_graphql(query):
+            queries.append(query)
+            return responses.pop(0)
+
+        with mock.patch.object(pr_batch, "run_graphql_query", side_effect=fake_graphql):
+            listed = pr_batch.list_pull_requests(110, 118, repo=("o", "r"))
+
+        self.assertEqual([node["number"] for node in listed], [112, 115, 117, 118])
+        self.assertEqual(len(queries), 3)
+        self.assertIn("direction: DESC", queries[1])
+        self.assertIn('after: "a"', queries[2])
+
+    def test_old_windows_are_walked_oldest_first(self) -> None:
+        responses = [_listing([5000]), _listing([1, 2, 4, 9], has_next=True, cursor="a")]
+        queries = []
+
+        def fake_graphql(query):
+            queries.append(query)
+            return responses.pop(0)
+
+        with mock.patch.object(pr_batch, "run_graphql_query", side_effect=fake_graphql):
+            listed = pr_batch.list_pull_requests(1, 5, repo=("o", "r"))
+
+        self.assertEqual([node["number"] for node in listed], [1, 2, 4])
+        self.assertIn("direction: ASC", queries[1])
+        self.assertEqual(len(queries), 2)
+
+    def test_empty_repository(self) -> None:
+        with mock.patch.object(pr_batch, "run_graphql_query", return_value=_listing([])):
+            self.assertEqual(pr_batch.list_pull_requests(1, 10, repo=("o", "r")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+PR_INFO = {"number": 4, "title": "Title", "branch": "feature", "body": "Body"}
+
+
+class TestRenderPrVariants(unittest.TestCase):
+    def test_single_diff_feeds_both_variants(self) -> None:
+        def fake_stream(cmd, dest, indent=""):
+            dest.write("diff --git a/x b/x\n+line\n")
+            return 22
+
+        with tempfile.TemporaryDirectory() as tmp:
+            log_path = Path(tmp, "run.log")
+            log_path.write_text("boom\n")
+            plain = Path(tmp, "plain.txt")
+            with_logs = Path(tmp, "logs.txt")
+            check = {"name": "ci", "conclusion": "failure"}
+            check_with_logs = dict(check, logFile=str(log_path))
+
+            with mock.patch.object(pr_batch, "stream_command", side_effect=fake_stream) as stream:
+                written = pr_batch.render_pr_variants(
+                    PR_INFO,
+                    ["x"],
+                    [{"author": "a", "body": "hi"}],
+                    [(str(plain), [check], False), (str(with_logs), [check_with_logs], True)],
+                )
+
+            self.assertTrue(written)
+            self.assertEqual(stream.call_count, 1)
+            plain_text = plain.read_text()
+            logs_text = with_logs.read_text()
+            self.assertEqual(plain_text, logs_text.replace("    Logs:\n    boom\n", ""))
+            self.assertIn("+line\n", logs_text)
+            self.assertIn("    Logs:\n    boom\n", logs_text)
+            self.assertNotIn("Logs:", plain_text)
+
+    def test_single_variant_matches_run_big_picture(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(pr_batch, "stream_command", return_value=0):
+            rendered = Path(tmp, "rendered.txt")
+            legacy = Path(tmp, "legacy.txt")
+            pr_batch.render_pr_variants(PR_INFO, ["x"], [], [(str(rendered), [], False)])
+            pr_batch.run_big_picture(PR_INFO, ["x"], [], [], str(legacy))
+            self.assertEqual(rendered.read_text(), legacy.read_text())
+
+    def test_header_names_the_pr_branch_when_diffing_a_private_ref(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(pr_batch, "stream_command", return_value=0) as stream:
+            output = Path(tmp, "out.txt")
+            pr_batch.render_pr_variants(
+                PR_INFO, ["x"], [], [(str(output), [], False)], local_branch="refs/pr-batch/4"
+            )
+            self.assertIn("# Branch: feature\n", output.read_text())
+        self.assertIn("refs/pr-batch/4", stream.call_args.args[0])
+
+    def test_no_files_renders_nothing(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp, "out.txt")
+            self.assertFalse(
+                pr_batch.render_pr_variants(PR_INFO, [], [], [(str(output), [], False)])
+            )
+            self.assertFalse(output.exists())
+
+
+class TestTouchedFilesVariants(unittest.TestCase):
+    def test_extra_output_reuses_file_section(self) -> None:
+        def fake_stream(spec, dest, max_bytes=None, header=""):
+            dest.write(header + "content\n")
+            return "ok", 8
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(
+                    pr_batch.GitBlobReader, "stream_blob", autospec=True,
+                    side_effect=lambda self, *args: fake_stream(*args),
+                ) as stream:
+            plain = Path(tmp, "plain.txt")
+            with_logs = Path(tmp, "logs.txt")
+            pr_batch.create_touched_files_compilation(
+                {"a.js", "b.js"}, "main", "1", "1", [1], str(plain),
+                extra_outputs=[(str(with_logs), True)],
+            )
+
+            self.assertEqual(stream.call_count, 2)
+            self.assertTrue(with_logs.read_text().startswith("# Touched Files (with logs)"))
+            self.assertEqual(
+                plain.read_text().split("# File: ", 1)[1],
+                with_logs.read_text().split("# File: ", 1)[1],
+            )
+
+if __name__ == "__main__":
+    unittest.main()
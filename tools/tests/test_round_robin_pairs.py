@@ -0,0 +1,68 @@
+import unittest
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+def _processed(number, files):
+    return {"info": {"number": number}, "files": files, "local_branch": f"pr-{number}"}
+
+
+PROCESSED = [
+    _processed(1, ["a.js", "b.js"]),
+    _processed(2, ["a.js", "b.js", "c.js"]),
+    _processed(3, ["c.js"]),
+    _processed(4, ["d.js"]),
+]
+
+
+class TestFileOverlapIndex(unittest.TestCase):
+    def test_index_maps_files_to_prs(self) -> None:
+        index = pr_batch.build_file_overlap_index(PROCESSED)
+        self.assertEqual(index["a.js"], [1, 2])
+        self.assertEqual(index["d.js"], [4])
+
+    def test_pair_overlap_counts(self) -> None:
+        counts = pr_batch.count_pair_overlaps(pr_batch.build_file_overlap_index(PROCESSED))
+        self.assertEqual(counts, {(1, 2): 2, (2, 3): 1})
+
+
+class TestSelectRoundRobinPairs(unittest.TestCase):
+    def test_all_pairs(self) -> None:
+        self.assertEqual(len(pr_batch.select_round_robin_pairs(PROCESSED)), 6)
+
+    def test_overlapping_pairs(self) -> None:
+        self.assertEqual(
+            pr_batch.select_round_robin_pairs(PROCESSED, mode="overlapping"), [(1, 2), (2, 3)]
+        )
+
+    def test_top_k_pairs(self) -> None:
+        self.assertEqual(
+            pr_batch.select_round_robin_pairs(PROCESSED, mode="top", top_k=1), [(1, 2), (2, 3)]
+        )
+
+    def test_explicit_pairs_skip_unprocessed(self) -> None:
+        pairs = pr_batch.select_round_robin_pairs(
+            PROCESSED, mode="pairs", explicit_pairs=[(3, 4), (1, 9)]
+        )
+        self.assertEqual(pairs, [(3, 4)])
+
+    def test_none(self) -> None:
+        self.assertEqual(pr_batch.select_round_robin_pairs(PROCESSED, mode="none"), [])
+
+
+class TestParsePrPairs(unittest.TestCase):
+    def test_parses_and_normalizes(self) -> None:
+        self.assertEqual(pr_batch.parse_pr_pairs("15:12, #12:#18,12:15"), [(12, 15), (12, 18)])
+
+    def test_rejects_bad_pairs(self) -> None:
+        for text in ("12", "12:12", "a:1", "1:2:3"):
+            with self.assertRaises(pr_batch.SelectionParseError):
+                pr_batch.parse_pr_pairs(text)
+
+
+if __name__ == "__main__":
+    unittest.main()
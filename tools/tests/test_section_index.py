@@ -0,0 +1,102 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+PR_INFO = {"number": 9, "title": "Täst", "branch": "feature", "body": "Body"}
+DIFF = (
+    "diff --git a/src/a b.py b/src/a b.py\n+one\n"
+    "diff --git a/ünï.txt b/ünï.txt\n+two\n"
+)
+
+
+def _fake_stream(cmd, dest, indent=""):
+    dest.write(DIFF)
+    return len(DIFF)
+
+
+class TestSectionIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.plain = str(self.tmp / "pr-9-implementation.txt")
+        self.logs = str(self.tmp / "pr-9-implementation-with-logs.txt")
+        log_path = self.tmp / "run.log"
+        log_path.write_text("boom\n")
+        check = {"name": "ci", "conclusion": "failure"}
+        with mock.patch.object(pr_batch, "stream_command", side_effect=_fake_stream):
+            pr_batch.render_pr_variants(
+                PR_INFO,
+                ["src/a b.py", "ünï.txt"],
+                [{"author": "a", "body": "hi"}],
+                [(self.plain, [check], False), (self.logs, [dict(check, logFile=str(log_path))], True)],
+            )
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_per_pr_index_covers_each_section(self) -> None:
+        records = pr_batch.load_section_index(self.logs)
+        self.assertEqual(
+            [(r["section"], r["path"]) for r in records],
+            [
+                ("header", None),
+                ("diff", "src/a b.py"),
+                ("diff", "ünï.txt"),
+                ("checks", None),
+                ("comments", None),
+            ],
+        )
+        with pr_batch.CompilationReader(self.logs) as reader:
+            self.assertEqual(reader.read(reader.find(path="ünï.txt")[0]), "diff --git a/ünï.txt b/ünï.txt\n+two\n")
+            self.assertIn("Logs:\n    boom", reader.read(reader.find(section="checks")[0]))
+            self.assertTrue(reader.read(reader.find(section="comments")[0]).endswith("    hi\n\n"))
+
+    def test_master_and_mirror_indexes_are_shifted(self) -> None:
+        touched = str(self.tmp / "touched.txt")
+        master = str(self.tmp / "master.txt")
+
+        def fake_blob(reader, spec, dest, max_bytes=None, header=""):
+            dest.write(header + "base content\n")
+            return "ok", 13
+
+        with mock.patch.object(pr_batch.GitBlobReader, "stream_blob", autospec=True,
+                               side_effect=fake_blob):
+            pr_batch.create_touched_files_compilation(
+                {"src/a b.py"}, "main", "9", "9", [9], touched
+            )
+        pr_batch.create_master_comparison(
+            [(PR_INFO, self.plain)], "9", "9", [9], master, mirror_outputs=[touched]
+        )
+
+        with pr_batch.CompilationReader(master) as reader:
+            pr_section = reader.read(reader.find(section="pr")[0])
+            self.assertEqual(pr_section, Path(self.plain).read_text())
+            self.assertEqual(
+                reader.read(reader.find(pr=9, path="src/a b.py")[0]),
+                "diff --git a/src/a b.py b/src/a b.py\n+one\n",
+            )
+
+        with pr_batch.CompilationReader(touched) as reader:
+            file_section = reader.read(reader.find(section="file")[0])
+            self.assertTrue(file_section.startswith("=" * 80 + "\n# File: src/a b.py\n"))
+            self.assertIn("base content\n", file_section)
+            self.assertTrue(reader.read(reader.find(section="header")[0]).startswith("# PR #9: Täst"))
+            self.assertEqual(len(reader.find(pr=9)), 6)
+
+    def test_reader_without_index_or_content(self) -> None:
+        empty = self.tmp / "empty.txt"
+        empty.write_text("")
+        with pr_batch.CompilationReader(str(empty)) as reader:
+            self.assertEqual(reader.records, [])
+            self.assertEqual(reader.read({"offset": 0, "length": 4}), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
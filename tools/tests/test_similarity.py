@@ -0,0 +1,106 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+def _diff(path: str, lines) -> str:
+    body = "".join(f"+{line}\n" for line in lines)
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -0,0 +1 @@\n{body}"
+
+
+BASE_LINES = [f"value_{idx} = compute({idx}, scale * {idx})" for idx in range(40)]
+
+
+class TestDiffShingles(unittest.TestCase):
+    def test_ignores_headers_and_context(self) -> None:
+        diff = _diff("a.py", ["x = 1"]) + " unchanged context\n"
+        renamed = _diff("b.py", ["x = 1"])
+        self.assertEqual(pr_batch.diff_shingles(diff), pr_batch.diff_shingles(renamed))
+
+    def test_added_and_removed_lines_differ(self) -> None:
+        self.assertNotEqual(
+            pr_batch.diff_shingles("+x = compute(1)\n"), pr_batch.diff_shingles("-x = compute(1)\n")
+        )
+        self.assertEqual(pr_batch.diff_shingles("diff --git a/x b/x\n"), set())
+
+
+class TestMinHash(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sets = [
+            pr_batch.diff_shingles(_diff("a.py", BASE_LINES)),
+            pr_batch.diff_shingles(_diff("b.py", BASE_LINES[:36] + ["tweak = 1"] * 4)),
+            pr_batch.diff_shingles(_diff("c.py", [f"other {idx}" for idx in range(40)])),
+            set(),
+        ]
+
+    def test_estimates_track_true_jaccard(self) -> None:
+        matrix = pr_batch.estimate_jaccard_matrix(pr_batch.minhash_signatures(self.sets, 256))
+        true = len(self.sets[0] & self.sets[1]) / len(self.sets[0] | self.sets[1])
+        self.assertAlmostEqual(matrix[0][1], true, delta=0.1)
+        self.assertLess(matrix[0][2], 0.1)
+        self.assertEqual([row[3] for row in matrix], [0.0, 0.0, 0.0, 1.0])
+        self.assertEqual([matrix[idx][idx] for idx in range(4)], [1.0] * 4)
+
+    @unittest.skipIf(pr_batch.np is None, "NumPy is not installed")
+    def test_pure_python_fallback_matches_numpy(self) -> None:
+        vectorized = pr_batch.minhash_signatures(self.sets, 64)
+        with mock.patch.object(pr_batch, "np", None):
+            fallback = pr_batch.minhash_signatures(self.sets, 64)
+            fallback_matrix = pr_batch.estimate_jaccard_matrix(fallback)
+        self.assertEqual(vectorized, fallback)
+        self.assertEqual(pr_batch.estimate_jaccard_matrix(vectorized), fallback_matrix)
+
+    def test_clusters_are_connected_components(self) -> None:
+        matrix = [
+            [1.0, 0.8, 0.1, 0.0],
+            [0.8, 1.0, 0.6, 0.0],
+            [0.1, 0.6, 1.0, 0.0],
+            [0.0, 0.0, 0.0, 1.0],
+        ]
+        self.assertEqual(pr_batch.similarity_clusters([3, 5, 9, 12], matrix, 0.5), [[3, 5, 9]])
+        self.assertEqual(pr_batch.similarity_clusters([3, 5, 9, 12], matrix, 0.7), [[3, 5]])
+
+
+class TestSimilarityReport(unittest.TestCase):
+    def test_reads_diffs_through_the_section_index(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            entries = []
+            for number, lines in ((7, BASE_LINES), (4, BASE_LINES), (9, ["unrelated"] * 3)):
+                output = Path(tmp, f"pr-{number}.txt")
+                header = f"# PR {number}\n"
+                diff = _diff("f.py", lines)
+                output.write_text(header + diff)
+                pr_batch.write_section_index(
+                    str(output),
+                    [
+                        pr_batch.section_record(number, None, "header", 0, len(header)),
+                        pr_batch.section_record(
+                            number, "f.py", "diff", len(header), len(header) + len(diff)
+                        ),
+                    ],
+                )
+                entries.append({"info": {"number": number}, "file": str(output)})
+
+            csv_path, json_path, clusters = pr_batch.create_similarity_report(
+                entries, tmp, "4-9", permutations=32
+            )
+            csv_lines = Path(csv_path).read_text().splitlines()
+            report = json.loads(Path(json_path).read_text())
+
+        self.assertEqual(clusters, [[4, 7]])
+        self.assertEqual(csv_lines[0], "pr,4,7,9")
+        self.assertTrue(csv_lines[1].startswith("4,1.000,1.000,"))
+        self.assertEqual(report["prs"], [4, 7, 9])
+        self.assertEqual(report["clusters"], [[4, 7]])
+        self.assertEqual(len(report["matrix"]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import io
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+class TestWriteIndented(unittest.TestCase):
+    def test_indents_across_chunk_boundaries(self) -> None:
+        text = "first line\nsecond\n\nlast"
+        for chunk_size in (1, 3, 7, 1024):
+            with mock.patch.object(pr_batch, "STREAM_CHUNK_SIZE", chunk_size):
+                dest = io.StringIO()
+                count = pr_batch.write_indented(io.StringIO(text), dest, "    ")
+            self.assertEqual(count, len(text))
+            self.assertEqual(dest.getvalue(), "    first line\n    second\n    \n    last\n")
+
+    def test_empty_source_writes_nothing(self) -> None:
+        dest = io.StringIO()
+        self.assertEqual(pr_batch.write_indented(io.StringIO(""), dest, "  "), 0)
+        self.assertEqual(dest.getvalue(), "")
+
+
+class TestStreamCommand(unittest.TestCase):
+    def test_streams_stdout(self) -> None:
+        dest = io.StringIO()
+        count = pr_batch.stream_command("printf 'a\\nb\\n'", dest, "> ")
+        self.assertEqual(count, 4)
+        self.assertEqual(dest.getvalue(), "> a\n> b\n")
+
+    def test_raises_on_failure(self) -> None:
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            pr_batch.stream_command("echo oops >&2; exit 3", io.StringIO())
+        self.assertEqual(ctx.exception.returncode, 3)
+        self.assertIn("oops", ctx.exception.stderr)
+
+
+class TestSpoolRunLog(unittest.TestCase):
+    def test_streams_into_cache_once(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = pr_batch.PrMetadataCache(str(Path(tmp) / "cache"))
+
+            def fake_stream(cmd, dest, indent=""):
+                dest.write("line one\n")
+                return 9
+
+            with mock.patch.object(pr_batch, "stream_command", side_effect=fake_stream) as stream:
+                first = pr_batch.spool_run_log("77", tmp, cache, completed=True)
+                second = pr_batch.spool_run_log("77", tmp, cache, completed=True)
+
+            self.assertEqual(stream.call_count, 1)
+            self.assertEqual(first, second)
+            self.assertEqual(first, str(cache.run_log_path("77")))
+            self.assertEqual(Path(first).read_text(), "line one\n")
+
+
+class TestAttachFailedCheckLogs(unittest.TestCase):
+    @staticmethod
+    def _check(run_id, name="ci", conclusion="FAILURE"):
+        return {
+            "name": name,
+            "status": "COMPLETED",
+            "conclusion": conclusion,
+            "detailsUrl": f"https://github.com/o/r/actions/runs/{run_id}/job/{name}",
+        }
+
+    def test_fetches_each_run_once_and_shares_the_file(self) -> None:
+        pr_one = [self._check(5, "lint"), self._check(5, "test"), self._check(6, "ok", "SUCCESS")]
+        pr_two = [self._check(5, "lint"), self._check(8, "build")]
+        commands = []
+
+        def fake_stream(cmd, dest, indent=""):
+            commands.append(cmd)
+            dest.write(f"{cmd}\n")
+            return 1
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(pr_batch, "stream_command", side_effect=fake_stream):
+            fetched = pr_batch.attach_failed_check_logs([pr_one, pr_two], tmp, jobs=2)
+
+            self.assertEqual(fetched, 2)
+            self.assertEqual(
+                sorted(commands),
+                ["gh run view 5 --log-failed", "gh run view 8 --log-failed"],
+            )
+            shared = {pr_one[0]["logFile"], pr_one[1]["logFile"], pr_two[0]["logFile"]}
+            self.assertEqual(len(shared), 1)
+            self.assertNotIn("logFile", pr_one[2])
+            self.assertEqual(Path(pr_two[1]["logFile"]).name, "8.log")
+
+    def test_falls_back_to_full_log(self) -> None:
+        def fake_stream(cmd, dest, indent=""):
+            if cmd.endswith("--log-failed"):
+                return 0
+            dest.write("full log\n")
+            return 9
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(pr_batch, "stream_command", side_effect=fake_stream):
+            path = pr_batch.spool_run_log("9", tmp)
+            self.assertEqual(Path(path).read_text(), "full log\n")
+            self.assertEqual(list(Path(tmp).iterdir()), [Path(path)])
+
+    def test_concurrent_requests_for_a_run_download_once(self) -> None:
+        commands = []
+        barrier = threading.Barrier(3, timeout=2)
+
+        def fake_stream(cmd, dest, indent=""):
+            commands.append(cmd)
+            dest.write("log\n")
+            return 4
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(pr_batch, "stream_command", side_effect=fake_stream):
+
+            def spool(_):
+                barrier.wait()
+                return pr_batch.spool_run_log("11", tmp)
+
+            paths = pr_batch.run_parallel(spool, [1, 2, 3], jobs=3)
+
+        self.assertEqual(len(set(paths)), 1)
+        self.assertEqual(commands, ["gh run view 11 --log-failed"])
+
+    def test_failed_runs_are_not_attached(self) -> None:
+        checks = [self._check(4)]
+        error = subprocess.CalledProcessError(1, "gh")
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(pr_batch, "stream_command", side_effect=error):
+            self.assertEqual(pr_batch.attach_failed_check_logs([checks], tmp), 0)
+            self.assertEqual(list(Path(tmp).iterdir()), [])
+        self.assertNotIn("logFile", checks[0])
+
+
+class TestRunBigPictureLogFile(unittest.TestCase):
+    def test_log_file_is_indented_into_output(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            log_path = Path(tmp) / "run.log"
+            log_path.write_text("step 1\nstep 2\n")
+            output = Path(tmp) / "out.txt"
+            check = {"name": "ci", "conclusion": "failure", "logFile": str(log_path)}
+
+            with mock.patch.object(pr_batch, "stream_command", return_value=0):
+                pr_batch.run_big_picture(
+                    {"number": 1, "title": "T", "branch": "b"}, ["a"], [], [check], str(output),
+                    include_logs=True,
+                )
+
+            text = output.read_text()
+            self.assertIn("# No differences found\n\n\n", text)
+            self.assertIn("    Logs:\n    step 1\n    step 2\n", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
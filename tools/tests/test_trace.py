@@ -0,0 +1,86 @@
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pr_batch_big_picture as pr_batch
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tracer = pr_batch.enable_tracing()
+
+    def tearDown(self) -> None:
+        pr_batch.disable_tracing()
+
+    def _events(self, category: str):
+        return [event for event in self.tracer.events if event["cat"] == category]
+
+    def test_run_command_records_status_and_output_size(self) -> None:
+        pr_batch.run_command("printf 'héllo'")
+        with self.assertRaises(subprocess.CalledProcessError):
+            pr_batch.run_command("exit 4")
+
+        ok, failed = self._events("command")
+        self.assertEqual(ok["name"], "printf")
+        self.assertEqual(ok["args"]["command"], "printf 'héllo'")
+        self.assertEqual(ok["args"]["exit_status"], 0)
+        self.assertEqual(ok["args"]["output_bytes"], 6)
+        self.assertEqual(failed["args"]["exit_status"], 4)
+        self.assertEqual(failed["args"]["error"], "CalledProcessError")
+
+    def test_stream_command_and_stage_spans_nest(self) -> None:
+        with pr_batch.trace_span("render PRs", prs=2) as span, \
+                tempfile.TemporaryFile("w+") as dest:
+            span["extra"] = "x"
+            pr_batch.stream_command("printf 'abc'", dest)
+
+        stage = self._events("stage")[0]
+        command = self._events("command")[0]
+        self.assertEqual(stage["args"], {"prs": 2, "extra": "x"})
+        self.assertEqual(command["args"]["output_chars"], 3)
+        self.assertGreaterEqual(command["ts"], stage["ts"])
+        self.assertLessEqual(command["ts"] + command["dur"], stage["ts"] + stage["dur"] + 1)
+
+    def test_write_emits_chrome_trace_json(self) -> None:
+        worker = threading.Thread(target=pr_batch.run_command, args=("true",), name="worker-1")
+        worker.start()
+        worker.join()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp, "trace.json")
+            self.tracer.write(str(path))
+            data = json.loads(path.read_text())
+
+        phases = {event["ph"] for event in data["traceEvents"]}
+        self.assertEqual(phases, {"M", "X"})
+        names = [e["args"]["name"] for e in data["traceEvents"] if e["ph"] == "M"]
+        self.assertIn("worker-1", names)
+
+    def test_summary_lists_slowest_first(self) -> None:
+        pr_batch.run_command("sleep 0.05")
+        pr_batch.run_command("true")
+        lines = self.tracer.summary_lines(top=1)
+        self.assertEqual(len(lines), 1)
+        self.assertIn("sleep 0.05", lines[0])
+
+    def test_span_names_use_subcommands(self) -> None:
+        self.assertEqual(pr_batch._command_span_name("gh run view 5 --log"), "gh run view")
+        self.assertEqual(pr_batch._command_span_name("git diff refs/a refs/b"), "git diff")
+        self.assertEqual(pr_batch._command_span_name("git fetch --filter=blob:none o"), "git fetch")
+
+
+class TestTracingDisabled(unittest.TestCase):
+    def test_trace_span_is_a_no_op(self) -> None:
+        pr_batch.disable_tracing()
+        with pr_batch.trace_span("stage", prs=1) as span:
+            span["ok"] = True
+        self.assertEqual(pr_batch.run_command("printf hi"), "hi")
+
+
+if __name__ == "__main__":
+    unittest.main()